@@ -0,0 +1,122 @@
+"""
+Per-connection compression: bytes per event and CPU per event, with and without zlib.
+
+Builds events from a pool of reporters (one RSA or Ed25519 key each, random signatures)
+and pushes them through the sender path of one connection: frames are encoded, grouped
+into writes of --batch events (one events_batch frame, or back-to-back event frames with
+--batch 1), optionally compressed by the connection's Deflater, then split again by a
+FrameBuffer on the receiving side and decoded. The stream shares its zlib window across
+writes, so keys of reporters seen recently cost only a back-reference.
+
+Usage: python benchmarks/bench_compression.py [--events 5000] [--reporters 1,10,100] [--batch 1,32] [--level 6]
+"""
+import argparse
+import base64
+import os
+import random
+import tempfile
+import time
+
+# Keep benchmark keys/DB away from the real ~/.cyphermesh
+os.environ.setdefault("CYPHER_DATA_DIR", tempfile.mkdtemp(prefix="cyphermesh-bench-"))
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
+
+from cyphermesh.core.protocol import (
+    encode_message, decode_message, Deflater, FrameBuffer, ENCODING_JSON, ENCODING_MSGPACK
+)
+from cyphermesh.crypto import scheme_for_key
+from cyphermesh.models import ThreatEvent
+
+
+def make_reporters(key_type, count):
+    reporters = []
+    for _ in range(count):
+        key = ed25519.Ed25519PrivateKey.generate() if key_type == "ed25519" else \
+            rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        sig_size = 64 if key_type == "ed25519" else 256
+        reporters.append((pem, scheme_for_key(key), sig_size))
+    return reporters
+
+
+def make_events(reporters, count, rng):
+    events = []
+    for i in range(count):
+        pem, scheme, sig_size = rng.choice(reporters)
+        events.append(ThreatEvent(
+            id=os.urandom(32).hex(),
+            source_ip=f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}",
+            threat_type=rng.choice(("port_scan", "brute_force", "malware")),
+            severity=rng.choice(("low", "medium", "high")),
+            timestamp=f"2025-04-16 14:{i // 60 % 60:02d}:{i % 60:02d}",
+            reporter_pubkey=pem,
+            # Signatures are incompressible: random bytes of the real size
+            signature=base64.b64encode(os.urandom(sig_size)).decode(),
+            sig_scheme=scheme,
+        ).to_json())
+    return events
+
+
+def run(payloads, encoding, batch, level):
+    """Sender + receiver of one connection; returns (bytes/event, send us/event, recv us/event)."""
+    deflater = Deflater(level) if level is not None else None
+    start = time.perf_counter()
+    writes = []
+    for i in range(0, len(payloads), batch):
+        group = payloads[i:i + batch]
+        if batch == 1:
+            data = encode_message("event", group[0], encoding=encoding)
+        else:
+            data = encode_message("events_batch", {"events": group}, encoding=encoding)
+        writes.append(deflater.wrap(data) if deflater else data)
+    send_us = (time.perf_counter() - start) / len(payloads) * 1e6
+
+    start = time.perf_counter()
+    buffer = FrameBuffer()
+    received = 0
+    for data in writes:
+        buffer.feed(data)
+        while True:
+            body = buffer.next_frame()
+            if body is None:
+                break
+            message = decode_message(body)
+            received += len(message["payload"]["events"]) if batch > 1 else 1
+    recv_us = (time.perf_counter() - start) / len(payloads) * 1e6
+
+    assert received == len(payloads)
+    return sum(len(w) for w in writes) / len(payloads), send_us, recv_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--reporters", default="1,10,100", help="distinct reporter keys in the stream")
+    parser.add_argument("--batch", default="1,32", help="events per write (1 = one event frame per write)")
+    parser.add_argument("--level", type=int, default=6, help="zlib level")
+    parser.add_argument("--key-type", default="rsa", choices=("rsa", "ed25519"))
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print(f"{'reporters':>9} {'batch':>5} {'encoding':<8} {'zlib':<4} {'B/event':>8} {'send us':>8} "
+          f"{'recv us':>8} {'vs raw':>7}")
+    for n in (int(x) for x in args.reporters.split(",")):
+        payloads = make_events(make_reporters(args.key_type, n), args.events, rng)
+        for batch in (int(x) for x in args.batch.split(",")):
+            for encoding in (ENCODING_JSON, ENCODING_MSGPACK):
+                raw = None
+                for level in (None, args.level):
+                    size, send_us, recv_us = run(payloads, encoding, batch, level)
+                    raw = raw or size
+                    label = "on" if level is not None else "off"
+                    print(f"{n:>9} {batch:>5} {encoding:<8} {label:<4} {size:>8.0f} {send_us:>8.1f} "
+                          f"{recv_us:>8.1f} {size / raw:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Queries per second: one fresh SQLite connection per query vs the pooled, pre-tuned connections.
+
+Usage: python benchmarks/bench_db.py [--rows 20000] [--queries 20000] [--threads 4]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Keep benchmark keys/DB away from the real ~/.cyphermesh
+os.environ.setdefault("CYPHER_DATA_DIR", tempfile.mkdtemp(prefix="cyphermesh-bench-"))
+
+from cyphermesh.config import DB_PATH
+from cyphermesh.db.core import init_db, db_cursor
+
+
+def fresh_connection_lookup(event_id):
+    """What every db_cursor call used to do: connect, query, close."""
+    conn = sqlite3.connect(str(DB_PATH), timeout=30.0)
+    conn.row_factory = sqlite3.Row
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM events WHERE id = ?", (event_id,))
+        return cur.fetchone() is not None
+    finally:
+        conn.close()
+
+
+def pooled_lookup(event_id):
+    with db_cursor() as cur:
+        cur.execute("SELECT 1 FROM events WHERE id = ?", (event_id,))
+        return cur.fetchone() is not None
+
+
+def populate(rows):
+    with db_cursor(commit=True) as cur:
+        cur.executemany(
+            "INSERT OR IGNORE INTO events (id, source_ip, threat_type, severity, timestamp, "
+            "reporter_pubkey, signature, valid_signature) VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+            [(f"{i:064x}", f"10.0.{i // 256 % 256}.{i % 256}", "scan", "high",
+              "2025-04-16 14:30:00", "pk", "sig") for i in range(rows)]
+        )
+
+
+def run(lookup, rows, queries, threads):
+    per_thread = queries // threads
+
+    def worker(offset):
+        for i in range(per_thread):
+            lookup(f"{(offset + i * 7919) % (rows * 2):064x}")
+
+    workers = [threading.Thread(target=worker, args=(t * 104729,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    init_db()
+    populate(args.rows)
+
+    before = run(fresh_connection_lookup, args.rows, args.queries, args.threads)
+    after = run(pooled_lookup, args.rows, args.queries, args.threads)
+    print(f"rows={args.rows} queries={args.queries} threads={args.threads}")
+    print(f"  connection per query: {before:10.0f} queries/s")
+    print(f"  pooled connections:   {after:10.0f} queries/s  ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
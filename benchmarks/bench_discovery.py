@@ -0,0 +1,145 @@
+"""
+LAN discovery cost per round: UDP packets and connect attempts, legacy vs current.
+
+Runs N discovery endpoints in one process on localhost, each with its own listener on a
+shared UDP port and its own sender socket, like real nodes. Two rounds per size:
+
+- join: N-1 nodes are already connected, one new node broadcasts a PING;
+- cold: all N nodes start isolated at the same time and ping until someone answers.
+
+"legacy" replays the old behavior (broadcast PONG to every PING, connect on every PING and
+PONG); "current" uses cyphermesh.core.discovery.Discovery (unicast jittered PONG, only the
+pinger connects, per-source rate limit, seen cache). No TCP connection is opened: connect
+attempts are only counted.
+
+Usage: python benchmarks/bench_discovery.py [--nodes 2,5,10,20,40] [--port 29999] [--window 1.5]
+"""
+import argparse
+import json
+import select
+import time
+import uuid
+
+from cyphermesh.core.discovery import Discovery, make_listener, make_sender
+
+
+class Endpoint:
+    """One simulated node: listener + sender sockets and traffic counters."""
+
+    def __init__(self, port, tcp_port, legacy, jitter_s):
+        self.port = port
+        self.node_id = str(uuid.uuid4())
+        self.tcp_port = tcp_port
+        self.legacy = legacy
+        self.listener = make_listener(port)
+        self.sender = make_sender()
+        self.alone = True
+        self.sent = 0
+        self.received = 0
+        self.connects = 0
+        self.targets = set()
+        self.discovery = Discovery(
+            self.node_id, tcp_port, send=self._send, on_peer=self._connect,
+            reply_jitter_s=jitter_s, backoff_min_s=0.5,
+        )
+
+    def _send(self, data, addr):
+        self.sender.sendto(data, addr or ("<broadcast>", self.port))
+        self.sent += 1
+
+    def _connect(self, host, port):
+        self.connects += 1
+        self.targets.add(port)
+        self.alone = False
+
+    def _legacy_message(self, msg_type):
+        return json.dumps({"type": msg_type, "node_id": self.node_id, "tcp_port": self.tcp_port}).encode()
+
+    def ping(self):
+        if self.legacy:
+            self._send(self._legacy_message("PING"), None)
+        else:
+            self.discovery.ping()
+
+    def poll(self):
+        if not self.legacy:
+            self.discovery.poll(alone=self.alone)
+
+    def handle(self, data, addr):
+        message = json.loads(data.decode())
+        if message.get("node_id") == self.node_id:
+            return
+        self.received += 1
+        if not self.legacy:
+            self.discovery.on_datagram(data, addr)
+            return
+        # Old Node._udp_listener_loop: broadcast PONG to a PING, connect on both
+        if message.get("type") == "PING":
+            self._send(self._legacy_message("PONG"), None)
+        self._connect(addr[0], message.get("tcp_port"))
+
+    def close(self):
+        self.listener.close()
+        self.sender.close()
+
+
+def run_round(endpoints, window):
+    sockets = {}
+    for ep in endpoints:
+        sockets[ep.listener] = ep
+        sockets[ep.sender] = ep
+    deadline = time.monotonic() + window
+    while time.monotonic() < deadline:
+        for ep in endpoints:
+            ep.poll()
+        readable, _, _ = select.select(list(sockets), [], [], 0.01)
+        for sock in readable:
+            data, addr = sock.recvfrom(1024)
+            sockets[sock].handle(data, addr)
+
+
+def measure(n, mode, scenario, args):
+    endpoints = [Endpoint(args.port, 30000 + i, mode == "legacy", args.jitter_ms / 1000) for i in range(n)]
+    try:
+        if scenario == "join":
+            for ep in endpoints[:-1]:
+                ep.alone = False
+            pingers = endpoints[-1:]
+        else:
+            pingers = endpoints
+        # Legacy nodes ping once at startup; current ones ping from poll() while isolated
+        if mode == "legacy":
+            for ep in pingers:
+                ep.ping()
+        run_round(endpoints, args.window)
+        targets = set().union(*(ep.targets for ep in endpoints))
+        return {
+            "sent": sum(ep.sent for ep in endpoints),
+            "received": sum(ep.received for ep in endpoints),
+            "connects": sum(ep.connects for ep in endpoints),
+            "isolated": sum(1 for ep in pingers if not ep.connects and ep.tcp_port not in targets),
+        }
+    finally:
+        for ep in endpoints:
+            ep.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", default="2,5,10,20,40")
+    parser.add_argument("--port", type=int, default=29999, help="UDP port shared by the listeners")
+    parser.add_argument("--window", type=float, default=1.5, help="seconds measured per round")
+    parser.add_argument("--jitter-ms", type=float, default=200.0, help="PONG reply jitter (current)")
+    args = parser.parse_args()
+
+    print(f"{'round':>5} {'nodes':>5} {'mode':>8} {'sent':>6} {'recv':>7} {'connects':>8} {'isolated':>8}")
+    for scenario in ("join", "cold"):
+        for n in (int(x) for x in args.nodes.split(",")):
+            for mode in ("legacy", "current"):
+                r = measure(n, mode, scenario, args)
+                print(f"{scenario:>5} {n:>5} {mode:>8} {r['sent']:>6} {r['received']:>7} "
+                      f"{r['connects']:>8} {r['isolated']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Bounded fanout on a sampled overlay: coverage, traffic and latency per fanout value.
+
+Spins up N in-process nodes (see simnet.py) whose active views are filled by the peer
+sampling overlay up to --degree links, then pushes events with each fanout value in turn
+(0 = every active peer) and reports how many nodes got every event and at what cost.
+
+Usage: python benchmarks/bench_fanout.py [--nodes 40] [--degree 8] [--events 200] [--fanouts 1,2,3,4,6,0]
+"""
+import argparse
+
+import simnet
+from cyphermesh.core.overlay import PeerViews
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=40)
+    parser.add_argument("--degree", type=int, default=8, help="target degree of the active view")
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--interval-ms", type=float, default=2.0, help="delay between injected events")
+    parser.add_argument("--base-port", type=int, default=23000)
+    parser.add_argument("--fanouts", default="1,2,3,4,6,0")
+    args = parser.parse_args()
+
+    def factory(port):
+        node = simnet.SimNode(port)
+        node.views = PeerViews(target_degree=args.degree, passive_size=args.nodes)
+        return node
+
+    print(f"{'fanout':>6} {'nodes':>5} {'links':>5} {'avg deg':>7} {'coverage':>8} {'B/event':>8} "
+          f"{'writes':>7} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7}")
+    for run, fanout in enumerate(int(f) for f in args.fanouts.split(",")):
+        events = simnet.make_events(args.events)
+        net = simnet.SimNetwork(args.nodes, base_port=args.base_port + run * args.nodes,
+                                node_factory=factory)
+        try:
+            net.start_overlay()
+            degree = sum(len(node.peers) for node in net.nodes) / len(net.nodes)
+            for node in net.nodes:
+                node.fanout = fanout
+            net.publish(events, interval=args.interval_ms / 1000)
+            net.wait_delivery(events, timeout=10.0)
+            r = net.report(events)
+        finally:
+            net.stop()
+        label = str(fanout) if fanout else "all"
+        print(f"{label:>6} {r['nodes']:>5} {r['links']:>5} {degree:>7.1f} {r['coverage']:>8.1%} "
+              f"{r['bytes_per_event']:>8.0f} {r['writes']:>7} {r['latency_ms_p50']:>7.1f} "
+              f"{r['latency_ms_p95']:>7.1f} {r['latency_ms_max']:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Framed TCP reader throughput: per-frame recv with `data +=` vs the buffered FrameReader.
+
+Frames are pushed through a local socketpair by a writer thread; the reader only
+extracts the bodies (no decoding), so the numbers isolate the framing cost.
+
+Usage: python benchmarks/bench_framing.py [--small 200000] [--large 200] [--large-size 1048576]
+"""
+import argparse
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+# Keep benchmark keys/DB away from the real ~/.cyphermesh
+os.environ.setdefault("CYPHER_DATA_DIR", tempfile.mkdtemp(prefix="cyphermesh-bench-"))
+
+from cyphermesh.core.protocol import FrameReader, HEADER_FORMAT, HEADER_SIZE
+
+
+def legacy_read_n_bytes(sock, n):
+    """The reader used before FrameReader: one recv per chunk, bytes concatenation."""
+    data = b''
+    while len(data) < n:
+        packet = sock.recv(n - len(data))
+        if not packet:
+            return None
+        data += packet
+    return data
+
+
+def legacy_read_frame(sock):
+    header = legacy_read_n_bytes(sock, HEADER_SIZE)
+    if not header:
+        return None
+    return legacy_read_n_bytes(sock, struct.unpack(HEADER_FORMAT, header)[0])
+
+
+def run(read_frame_factory, frame, count):
+    a, b = socket.socketpair()
+    a.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+    b.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    # Several frames per sendall, like a peer sending a burst
+    per_write = max(1, 65536 // len(frame))
+    chunk = frame * per_write
+
+    def writer():
+        sent = 0
+        while sent < count:
+            n = min(per_write, count - sent)
+            a.sendall(chunk if n == per_write else frame * n)
+            sent += n
+        a.shutdown(socket.SHUT_WR)
+
+    read_frame = read_frame_factory(b)
+    t = threading.Thread(target=writer)
+    start = time.perf_counter()
+    t.start()
+    received = 0
+    while read_frame() is not None:
+        received += 1
+    elapsed = time.perf_counter() - start
+    t.join()
+    a.close()
+    b.close()
+    assert received == count, (received, count)
+    return count / elapsed, count * len(frame) / elapsed / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--small", type=int, default=200_000, help="number of small frames")
+    parser.add_argument("--small-size", type=int, default=600, help="small frame body size (bytes)")
+    parser.add_argument("--large", type=int, default=200, help="number of large frames")
+    parser.add_argument("--large-size", type=int, default=1024 * 1024, help="large frame body size (bytes)")
+    args = parser.parse_args()
+
+    readers = [
+        ("legacy recv", lambda sock: (lambda: legacy_read_frame(sock))),
+        ("FrameReader", lambda sock: FrameReader(sock, max_frame_size=max(args.large_size, args.small_size)).read_frame),
+    ]
+
+    print(f"{'frames':<7} {'reader':<12} {'frames/s':>12} {'MB/s':>9}")
+    for label, count, size in (("small", args.small, args.small_size), ("large", args.large, args.large_size)):
+        frame = struct.pack(HEADER_FORMAT, size) + os.urandom(size)
+        for name, factory in readers:
+            rate, mbps = run(factory, frame, count)
+            print(f"{label:<7} {name:<12} {rate:>12.0f} {mbps:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
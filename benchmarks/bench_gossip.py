@@ -0,0 +1,45 @@
+"""
+Push vs inventory (inv/getdata) gossip: bandwidth and propagation latency on a simulated mesh.
+
+Spins up N in-process nodes on localhost (see simnet.py), wires a random topology,
+injects events at random nodes and measures total bytes written and the time for
+each event to reach every node.
+
+Usage: python benchmarks/bench_gossip.py [--nodes 20] [--degree 4] [--events 200] [--interval-ms 2]
+"""
+import argparse
+
+import simnet
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--degree", type=int, default=4)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--interval-ms", type=float, default=2.0, help="delay between injected events")
+    parser.add_argument("--base-port", type=int, default=21000)
+    parser.add_argument("--modes", default="push,inv")
+    args = parser.parse_args()
+
+    events = simnet.make_events(args.events)
+
+    print(f"{'mode':<5} {'nodes':>5} {'links':>5} {'coverage':>8} {'KB total':>9} {'B/event':>8} "
+          f"{'writes':>7} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7}")
+    for run, mode in enumerate(args.modes.split(",")):
+        net = simnet.SimNetwork(args.nodes, args.degree, gossip_mode=mode,
+                                base_port=args.base_port + run * args.nodes)
+        try:
+            net.start()
+            net.publish(events, interval=args.interval_ms / 1000)
+            net.wait_delivery(events)
+            r = net.report(events)
+        finally:
+            net.stop()
+        print(f"{mode:<5} {r['nodes']:>5} {r['links']:>5} {r['coverage']:>8.1%} {r['bytes'] / 1024:>9.0f} "
+              f"{r['bytes_per_event']:>8.0f} {r['writes']:>7} {r['latency_ms_p50']:>7.1f} "
+              f"{r['latency_ms_p95']:>7.1f} {r['latency_ms_max']:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Event queries on a synthetic multi-million-row DB: filters, keyset pagination and aggregates.
+
+Builds (once, then reused via --db-dir) a database with --rows events over --days days:
+a skewed source IP distribution (a hot pool of scanners inside 10.0.0.0/8 plus random
+public addresses), a few threat types and severities, 32 Ed25519 reporters. Then times every
+cyphermesh.db.query entry point and prints the SQLite plan it used. Two baselines show what
+the API replaces: counting the top IPs of the last hour in Python, and OFFSET pagination.
+
+Usage: python benchmarks/bench_query.py [--rows 2000000] [--days 30] [--db-dir DIR] [--repeat 5]
+"""
+import argparse
+import base64
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--rows", type=int, default=2_000_000)
+parser.add_argument("--days", type=int, default=30)
+parser.add_argument("--db-dir", help="data directory to build or reuse (default: a new temp dir)")
+parser.add_argument("--repeat", type=int, default=5, help="runs per query (median is reported)")
+args = parser.parse_args()
+
+# Keep the synthetic DB away from the real ~/.cyphermesh
+os.environ["CYPHER_DATA_DIR"] = args.db_dir or tempfile.mkdtemp(prefix="cyphermesh-bench-")
+
+from cyphermesh.config import DB_PATH
+from cyphermesh.db.core import init_db, db_cursor, get_db_connection, ip_key
+from cyphermesh.db.events import INSERT_EVENT_SQL
+from cyphermesh.db.query import (
+    EventFilter, query_events, count_events, top_source_ips, top_values, counts_by_bucket, EVENT_COLUMNS
+)
+
+THREAT_TYPES = ("port_scan", "brute_force", "malware", "phishing", "ddos", "sqli", "xss", "botnet")
+SEVERITIES = ("low", "medium", "high")
+NOW = datetime(2025, 4, 16, 12, 0, 0)
+
+
+def make_reporters(rng, count=32):
+    # Same length as an Ed25519 SubjectPublicKeyInfo PEM
+    return [
+        "-----BEGIN PUBLIC KEY-----\n" + base64.b64encode(rng.randbytes(44)).decode() + "\n-----END PUBLIC KEY-----\n"
+        for _ in range(count)
+    ]
+
+
+def build(rows, days):
+    rng = random.Random(7)
+    reporters = make_reporters(rng)
+    hot = [f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(5000)]
+    span = days * 86400
+    start = NOW - timedelta(seconds=span)
+    conn = get_db_connection()
+    conn.execute("PRAGMA synchronous=OFF")
+    chunk = 50_000
+    started = time.perf_counter()
+    # Timestamps in arrival order, like a node receiving events
+    offsets = sorted(rng.randrange(span) for _ in range(rows))
+    for base in range(0, rows, chunk):
+        batch = []
+        for offset in offsets[base:base + chunk]:
+            if rng.random() < 0.7:
+                ip = rng.choice(hot)
+            else:
+                ip = f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}"
+            received = start + timedelta(seconds=offset)
+            batch.append((
+                os.urandom(32).hex(), ip, rng.choice(THREAT_TYPES), rng.choice(SEVERITIES),
+                received.strftime("%Y-%m-%d %H:%M:%S"),
+                rng.choice(reporters), base64.b64encode(os.urandom(64)).decode(), 1, ip_key(ip),
+                received.timestamp(),
+            ))
+        conn.executemany(INSERT_EVENT_SQL, batch)
+        conn.commit()
+        print(f"\r  inserted {min(base + chunk, rows):,}/{rows:,}", end="", flush=True)
+    conn.execute("ANALYZE")
+    conn.close()
+    print(f"\r  built {rows:,} rows in {time.perf_counter() - started:.0f}s, "
+          f"{os.path.getsize(DB_PATH) / 2**20:.0f} MiB")
+
+
+def timed(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def plan(sql, params):
+    with db_cursor() as cur:
+        cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return "; ".join(row[3] for row in cur.fetchall())
+
+
+def size_of(result):
+    if hasattr(result, "events"):
+        return len(result.events)
+    return result if isinstance(result, int) else len(result)
+
+
+def main():
+    init_db()
+    with db_cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM events")
+        existing = cur.fetchone()[0]
+    if existing < args.rows:
+        print(f"Building synthetic DB in {DB_PATH.parent} ...")
+        build(args.rows - existing, args.days)
+    with db_cursor() as cur:
+        cur.execute("SELECT source_ip FROM events WHERE source_ip LIKE '10.%' GROUP BY source_ip "
+                    "ORDER BY COUNT(*) DESC LIMIT 1")
+        hot_ip = cur.fetchone()[0]
+        cur.execute("SELECT reporter_pubkey FROM events LIMIT 1")
+        reporter = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*), MAX(timestamp) FROM events")
+        total, last = cur.fetchone()
+    end = datetime.strptime(last, "%Y-%m-%d %H:%M:%S")
+    hour_ago = (end - timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+    day_ago = (end - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    print(f"{total:,} events, hot IP {hot_ip}, last event {last}\n")
+
+    deep_cursor = None
+    page = query_events(limit=100)
+    for _ in range(999):
+        page = query_events(limit=100, cursor=page.cursor)
+    deep_cursor = page.cursor
+
+    scenarios = [
+        ("latest 100", lambda: query_events(limit=100), "", []),
+        ("page 1000 (keyset)", lambda: query_events(limit=100, cursor=deep_cursor),
+         "(received_at, rowid) < (?, ?)", [NOW.timestamp(), 0]),
+        ("ip, all time", lambda: query_events(EventFilter(source_ip=hot_ip), limit=100),
+         "ip_key = ?", [ip_key(hot_ip)]),
+        ("ip, last hour", lambda: query_events(EventFilter(source_ip=hot_ip, since=hour_ago)),
+         "ip_key = ? AND timestamp >= ?", [ip_key(hot_ip), hour_ago]),
+        ("cidr /16, last day", lambda: query_events(EventFilter(source_ip=hot_ip + "/16", since=day_ago)),
+         "ip_key BETWEEN ? AND ? AND timestamp >= ?", [b"", b"", day_ago]),
+        ("type+severity, day", lambda: query_events(EventFilter(threat_type="ddos", severity="high",
+                                                                since=day_ago)),
+         "threat_type IN (?) AND severity IN (?) AND timestamp >= ?", ["ddos", "high", day_ago]),
+        ("reporter, last day", lambda: query_events(EventFilter(reporter=reporter, since=day_ago)),
+         "reporter_pubkey = ? AND timestamp >= ?", [reporter, day_ago]),
+        ("count ip", lambda: count_events(EventFilter(source_ip=hot_ip)), None, None),
+        ("count last day", lambda: count_events(EventFilter(since=day_ago)), None, None),
+        ("top ips, last hour", lambda: top_source_ips(EventFilter(since=hour_ago)), None, None),
+        ("top ips, last day", lambda: top_source_ips(EventFilter(since=day_ago)), None, None),
+        ("top types, cidr /8", lambda: top_values("threat_type", EventFilter(source_ip="10.0.0.0/8",
+                                                                            since=day_ago)), None, None),
+        ("hourly by type, day", lambda: counts_by_bucket(EventFilter(since=day_ago), "hour", "threat_type"),
+         None, None),
+        ("daily counts, all", lambda: counts_by_bucket(bucket="day"), None, None),
+    ]
+
+    def python_top_ips():
+        with db_cursor() as cur:
+            cur.execute("SELECT * FROM events WHERE timestamp >= ?", (hour_ago,))
+            return Counter(row["source_ip"] for row in cur.fetchall()).most_common(10)
+
+    def offset_page():
+        with db_cursor() as cur:
+            cur.execute(f"SELECT {EVENT_COLUMNS} FROM events ORDER BY received_at DESC LIMIT 100 OFFSET 99900")
+            return cur.fetchall()
+
+    baselines = [
+        ("baseline: top ips hour in Python", python_top_ips),
+        ("baseline: page 1000 via OFFSET", offset_page),
+    ]
+
+    print(f"{'query':<34} {'ms':>9} {'rows':>8}  plan")
+    for name, fn, where, params in scenarios:
+        ms, result = timed(fn, args.repeat)
+        if where is not None:
+            sql = f"SELECT * FROM events WHERE {where or '1'} ORDER BY received_at DESC, rowid DESC LIMIT 100"
+            shown = plan(sql, params)
+        else:
+            shown = ""
+        print(f"{name:<34} {ms:>9.2f} {size_of(result):>8}  {shown}")
+    for name, fn in baselines:
+        ms, result = timed(fn, args.repeat)
+        print(f"{name:<34} {ms:>9.2f} {size_of(result):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Signature verification throughput with and without the parsed public key cache.
+
+Usage: python benchmarks/bench_verify.py [--events 2000] [--reporters 5]
+"""
+import argparse
+import base64
+import os
+import tempfile
+import time
+
+# Keep benchmark keys/DB away from the real ~/.cyphermesh
+os.environ.setdefault("CYPHER_DATA_DIR", tempfile.mkdtemp(prefix="cyphermesh-bench-"))
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from cyphermesh.crypto import PublicKeyCache, verify_signature, _PSS_PADDING, _PSS_HASH
+
+
+def make_reporters(count):
+    reporters = []
+    for _ in range(count):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        reporters.append((key, pem))
+    return reporters
+
+
+def make_events(reporters, count):
+    events = []
+    for i in range(count):
+        key, pem = reporters[i % len(reporters)]
+        data = f'{{"id": "{i}", "source_ip": "10.0.{i // 256 % 256}.{i % 256}"}}'
+        signature = base64.b64encode(key.sign(data.encode(), _PSS_PADDING, _PSS_HASH)).decode()
+        events.append((data, signature, pem))
+    return events
+
+
+def run(events, key_cache):
+    start = time.perf_counter()
+    for data, signature, pem in events:
+        assert verify_signature(data, signature, pem, key_cache=key_cache)
+    return len(events) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--reporters", type=int, default=5)
+    args = parser.parse_args()
+
+    reporters = make_reporters(args.reporters)
+    events = make_events(reporters, args.events)
+
+    uncached = run(events, key_cache=None)
+    cache = PublicKeyCache(max_size=1024)
+    cached = run(events, key_cache=cache)
+
+    print(f"events={args.events} reporters={args.reporters}")
+    print(f"  without cache: {uncached:10.0f} events/s")
+    print(f"  with cache:    {cached:10.0f} events/s  ({cached / uncached:.2f}x, {cache.stats()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Wire encodings: bytes on the wire and encode/decode time per event frame.
+
+Compares the JSON envelope with the binary msgpack frames, using the C msgpack
+extension when installed and the pure-Python codec otherwise (both are measured
+when the extension is available).
+
+Usage: python benchmarks/bench_wire.py [--events 20000]
+"""
+import argparse
+import base64
+import os
+import tempfile
+import time
+
+# Keep benchmark keys/DB away from the real ~/.cyphermesh
+os.environ.setdefault("CYPHER_DATA_DIR", tempfile.mkdtemp(prefix="cyphermesh-bench-"))
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
+
+from cyphermesh.core import codec
+from cyphermesh.core.protocol import encode_message, decode_message, HEADER_SIZE, ENCODING_JSON, ENCODING_MSGPACK
+from cyphermesh.crypto import scheme_for_key, _sign_raw
+from cyphermesh.models import ThreatEvent
+
+
+def make_events(key_type, count):
+    key = ed25519.Ed25519PrivateKey.generate() if key_type == "ed25519" else \
+        rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    # Sign once and reuse the signature: only the size matters here
+    signature = base64.b64encode(_sign_raw(key, b"bench")).decode()
+    return [
+        ThreatEvent(
+            id=f"{i:064x}",
+            source_ip=f"10.0.{i // 256 % 256}.{i % 256}",
+            threat_type="port_scan",
+            severity="high",
+            timestamp="2025-04-16 14:30:00",
+            reporter_pubkey=pem,
+            signature=signature,
+            sig_scheme=scheme_for_key(key),
+        ).to_json()
+        for i in range(count)
+    ]
+
+
+def bench(payloads, encoding):
+    start = time.perf_counter()
+    frames = [encode_message("event", p, msg_id=p["id"], encoding=encoding) for p in payloads]
+    encode_us = (time.perf_counter() - start) / len(payloads) * 1e6
+
+    start = time.perf_counter()
+    for frame in frames:
+        message = decode_message(frame[HEADER_SIZE:])
+    decode_us = (time.perf_counter() - start) / len(payloads) * 1e6
+
+    assert message["payload"] == payloads[-1]
+    return sum(len(f) for f in frames) / len(frames), encode_us, decode_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    variants = [("json", ENCODING_JSON, codec._msgpack)]
+    if codec._msgpack is not None:
+        variants.append(("msgpack (C)", ENCODING_MSGPACK, codec._msgpack))
+    variants.append(("msgpack (py)", ENCODING_MSGPACK, None))
+
+    print(f"{'key':<8} {'encoding':<13} {'frame B':>8} {'enc us':>8} {'dec us':>8}")
+    for key_type in ("rsa", "ed25519"):
+        payloads = make_events(key_type, args.events)
+        baseline = None
+        for label, encoding, backend in variants:
+            saved, codec._msgpack = codec._msgpack, backend
+            try:
+                size, enc_us, dec_us = bench(payloads, encoding)
+            finally:
+                codec._msgpack = saved
+            baseline = baseline or size
+            print(f"{key_type:<8} {label:<13} {size:>8.0f} {enc_us:>8.2f} {dec_us:>8.2f}"
+                  f"  ({size / baseline:.0%} of JSON)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+In-process mesh simulation on localhost, shared by the gossip benchmarks.
+
+Each SimNode is a real threaded Node (TCP framing, handshake, batching, verification)
+with the SQLite writer replaced by an in-memory store, so many nodes can live in one
+process without sharing a database. Discovery is skipped: the harness either wires a
+random topology explicitly or seeds every passive view and lets the overlay pick peers.
+"""
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+# Keep benchmark keys/DB away from the real ~/.cyphermesh; one verify worker per node
+os.environ.setdefault("CYPHER_DATA_DIR", tempfile.mkdtemp(prefix="cyphermesh-bench-"))
+os.environ.setdefault("CYPHER_VERIFY_WORKERS", "1")
+
+import logging
+
+from cyphermesh.core.node import Node
+from cyphermesh.db import init_db
+from cyphermesh.models import ThreatEvent
+
+logging.getLogger("cyphermesh").setLevel(logging.WARNING)
+
+
+class MemoryWriter:
+    """Stand-in for EventWriter: keeps valid events in a dict."""
+
+    def __init__(self):
+        self.events = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        pass
+
+    def stop(self, timeout=None):
+        pass
+
+    def flush(self, timeout=None):
+        return True
+
+    def save_event(self, event):
+        if event.valid_signature:
+            with self._lock:
+                self.events[event.id] = event
+
+    def update_reputation(self, pubkey, delta):
+        pass
+
+    def save_reputations(self, rows):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return {"events": len(self.events)}
+
+
+class SimNode(Node):
+    """Node with in-memory storage and per-node traffic/latency counters."""
+
+    def __init__(self, port, gossip_mode="push"):
+        super().__init__("127.0.0.1", port)
+        self.logger.setLevel(logging.WARNING)
+        self.gossip_mode = gossip_mode
+        self.writer = MemoryWriter()
+        self.arrivals = {}
+        self.bytes_sent = 0
+        self.writes = 0
+        self._counter_lock = threading.Lock()
+
+    # --- storage overrides ---
+
+    def _init_services(self):
+        if self.batcher:
+            self.batcher.start()
+        self.verifier.start()
+
+    def _event_exists(self, event_id):
+        return event_id in self.writer.events
+
+    def _load_event_payloads(self, event_ids):
+        events = self.writer.events
+        return [events[i].to_json() for i in event_ids if i in events]
+
+    # --- instrumentation ---
+
+    def _send_frame(self, peer, frame):
+        with self._counter_lock:
+            self.bytes_sent += len(frame)
+            self.writes += 1
+        super()._send_frame(peer, frame)
+
+    def _on_event_verified(self, event, is_valid, sender_socket=None):
+        if is_valid:
+            self.arrivals.setdefault(event.id, time.perf_counter())
+        super()._on_event_verified(event, is_valid, sender_socket)
+
+    def publish(self, event):
+        self.arrivals[event.id] = time.perf_counter()
+        self.broadcast_event(event)
+
+    def start_background(self):
+        self.running = True
+        self._init_services()
+        threading.Thread(target=self._listen_incoming, daemon=True).start()
+
+    def handshakes_done(self):
+        return all(info.state == "ready" for info in self.peers.infos())
+
+
+def random_topology(n, degree, rng):
+    """Connected random graph: a ring plus random chords up to ~degree links per node."""
+    edges = {(i, (i + 1) % n) if i < (i + 1) % n else ((i + 1) % n, i) for i in range(n)}
+    target = max(len(edges), n * degree // 2)
+    attempts = 0
+    while len(edges) < target and attempts < target * 20:
+        a, b = rng.sample(range(n), 2)
+        edges.add((min(a, b), max(a, b)))
+        attempts += 1
+    return sorted(edges)
+
+
+def make_events(count):
+    """Events signed with the benchmark node key (created in the throw-away data dir)."""
+    return [ThreatEvent.create_new(f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}", "port_scan", "high")
+            for i in range(count)]
+
+
+class SimNetwork:
+    def __init__(self, n, degree=4, gossip_mode="push", base_port=21000, seed=1,
+                 node_factory=None):
+        init_db()
+        self.rng = random.Random(seed)
+        factory = node_factory or (lambda port: SimNode(port, gossip_mode))
+        self.nodes = [factory(base_port + i) for i in range(n)]
+        self.edges = random_topology(n, degree, self.rng)
+
+    def start(self, timeout=30.0):
+        for node in self.nodes:
+            node.start_background()
+        time.sleep(0.2)
+        for a, b in self.edges:
+            self.nodes[a].connect_to_peer("127.0.0.1", self.nodes[b].port)
+        self._wait_handshakes(timeout)
+
+    def start_overlay(self, timeout=30.0):
+        """Let each node fill its active view from a passive view holding every other node."""
+        for node in self.nodes:
+            node.start_background()
+        time.sleep(0.2)
+        for node in self.nodes:
+            for other in self.nodes:
+                if other is not node:
+                    node.views.add_passive(("127.0.0.1", other.port))
+        for node in self.nodes:
+            node._refill_active_view()
+        self._wait_handshakes(timeout)
+        self.edges = [None] * (sum(len(node.peers) for node in self.nodes) // 2)
+
+    def _wait_handshakes(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if all(node.handshakes_done() for node in self.nodes):
+                return
+            time.sleep(0.05)
+        raise RuntimeError("handshakes did not complete")
+
+    def publish(self, events, interval=0.0):
+        """Inject each event at a random node, optionally spaced by `interval` seconds."""
+        for event in events:
+            origin = self.rng.choice(self.nodes)
+            origin.publish(ThreatEvent.from_dict(event.to_json()))
+            if interval:
+                time.sleep(interval)
+
+    def wait_delivery(self, events, timeout=60.0, settle=0.5):
+        """Wait until every node has every event (or timeout), then let traffic settle."""
+        ids = [e.id for e in events]
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if all(all(i in node.arrivals for i in ids) for node in self.nodes):
+                break
+            time.sleep(0.05)
+        time.sleep(settle)
+
+    def report(self, events):
+        ids = [e.id for e in events]
+        origins = {}
+        for node in self.nodes:
+            for i in ids:
+                t = node.arrivals.get(i)
+                if t is not None and (i not in origins or t < origins[i]):
+                    origins[i] = t
+        latencies, delivered = [], 0
+        for node in self.nodes:
+            for i in ids:
+                t = node.arrivals.get(i)
+                if t is None:
+                    continue
+                delivered += 1
+                if t > origins[i]:
+                    latencies.append((t - origins[i]) * 1000)
+        latencies.sort()
+        total_bytes = sum(node.bytes_sent for node in self.nodes)
+        pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+        return {
+            "nodes": len(self.nodes),
+            "links": len(self.edges),
+            "coverage": delivered / (len(ids) * len(self.nodes)),
+            "bytes": total_bytes,
+            "bytes_per_event": total_bytes / len(ids),
+            "writes": sum(node.writes for node in self.nodes),
+            "latency_ms_mean": statistics.fmean(latencies) if latencies else 0.0,
+            "latency_ms_p50": pct(0.5),
+            "latency_ms_p95": pct(0.95),
+            "latency_ms_max": latencies[-1] if latencies else 0.0,
+        }
+
+    def stop(self):
+        for node in self.nodes:
+            node.stop()
@@ -13,11 +13,17 @@ setup(
         "cryptography",
         "flask"
     ],
+    extras_require={
+        # Faster C codec for binary frames (a pure-Python fallback is bundled)
+        "msgpack": ["msgpack"],
+    },
     entry_points={
         "console_scripts": [
             "cyphermesh-run-peer = cyphermesh.cli.run_peer:main",
             "cyphermesh-reset = cyphermesh.cli.reset:main",
             "cyphermesh-add-peer = cyphermesh.cli.add_peer:main",
+            "cyphermesh-ingest = cyphermesh.cli.ingest:main",
+            "cyphermesh-vacuum = cyphermesh.cli.vacuum:main",
         ]
     },
     author="Massimo Fedrigo",
@@ -0,0 +1,279 @@
+import argparse
+import csv
+import ipaddress
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, TextIO
+
+from cyphermesh.config import CONTROL_SOCKET
+from cyphermesh.core.control import ControlClient, ControlError, control_available
+from cyphermesh.crypto import get_identity
+from cyphermesh.db.core import init_db
+from cyphermesh.db.events import save_events
+from cyphermesh.logger import logger
+from cyphermesh.models import ThreatEvent
+
+# Campi riconosciuti, in ordine di priorità: formato nativo, Suricata (eve.json),
+# Zeek (log JSON, chiavi con il punto) e fail2ban/script vari. I campi annidati
+# si indicano con il punto ("alert.category").
+SOURCE_IP_FIELDS = ("source_ip", "src_ip", "id.orig_h", "ip", "src")
+THREAT_TYPE_FIELDS = ("threat_type", "alert.category", "alert.signature", "note", "jail", "event_type")
+SEVERITY_FIELDS = ("severity", "alert.severity", "priority")
+TIMESTAMP_FIELDS = ("timestamp", "ts", "time")
+
+# Severità numerica in stile Suricata (1 = più grave)
+NUMERIC_SEVERITY = {1: "high", 2: "medium", 3: "low"}
+
+# Formati di data accettati oltre all'ISO 8601 di datetime.fromisoformat
+TIMESTAMP_FORMATS = ("%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%d %H:%M:%S,%f")
+
+EVENT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _field(record: dict, names: Iterable[str]):
+    """Primo campo presente del record (chiave letterale, poi percorso annidato)."""
+    for name in names:
+        value = record.get(name)
+        if value is None and "." in name:
+            value = record
+            for part in name.split("."):
+                value = value.get(part) if isinstance(value, dict) else None
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def parse_timestamp(value) -> Optional[str]:
+    """Data del record nel formato degli eventi (ora locale), None se non interpretabile."""
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace(".", "", 1).isdigit()):
+        try:
+            return datetime.fromtimestamp(float(value)).strftime(EVENT_TIMESTAMP_FORMAT)
+        except (OverflowError, OSError, ValueError):
+            return None
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        parsed = None
+        for fmt in TIMESTAMP_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+    if parsed is None:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.strftime(EVENT_TIMESTAMP_FORMAT)
+
+
+def _severity(value, default: str) -> str:
+    if value is None:
+        return default
+    if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+        return NUMERIC_SEVERITY.get(int(value), default)
+    return str(value).lower()
+
+
+def iter_records(stream: TextIO, fmt: str = "auto") -> Iterator[Optional[dict]]:
+    """
+    Record del flusso, uno alla volta (niente caricamento in memoria).
+    Le righe JSON non valide diventano None, così il chiamante le può contare.
+    """
+    first = stream.readline()
+    while first and not first.strip():
+        first = stream.readline()
+    if not first:
+        return
+    if fmt == "auto":
+        fmt = "jsonl" if first.lstrip().startswith("{") else "csv"
+    lines = itertools.chain([first], stream)
+    if fmt == "csv":
+        yield from csv.DictReader(lines)
+        return
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        yield record if isinstance(record, dict) else None
+
+
+def record_to_event(record: Optional[dict], pubkey: str, default_type: str,
+                    default_severity: str) -> Optional[ThreatEvent]:
+    """Evento non firmato per un record, None se manca un IP sorgente valido."""
+    if not record:
+        return None
+    source_ip = _field(record, SOURCE_IP_FIELDS)
+    try:
+        source_ip = str(ipaddress.ip_address(str(source_ip).strip()))
+    except ValueError:
+        return None
+    threat_type = _field(record, THREAT_TYPE_FIELDS) or default_type
+    severity = _severity(_field(record, SEVERITY_FIELDS), default_severity)
+    timestamp = parse_timestamp(_field(record, TIMESTAMP_FIELDS))
+    return ThreatEvent.build(source_ip, str(threat_type), severity,
+                             timestamp=timestamp, reporter_pubkey=pubkey)
+
+
+def _sign_batch(payloads: List[str]) -> List[str]:
+    """Firma un batch con la chiave del nodo. Funzione di modulo: gira anche nei processi worker."""
+    return get_identity().sign_many(payloads)
+
+
+class Ingest:
+    """
+    Pipeline di ingest: record -> eventi a batch -> firma (in parallelo su processi se
+    workers > 1, con al più 2 batch per worker in volo). `signed_batches` restituisce
+    un batch di eventi firmati alla volta, nell'ordine di lettura.
+    """
+
+    def __init__(self, batch_size: int = 500, workers: int = 1,
+                 default_type: str = "unknown", default_severity: str = "medium"):
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.default_type = default_type
+        self.default_severity = default_severity
+        self.identity = get_identity()
+
+        self.records = 0
+        self.skipped = 0
+        self.events = 0
+
+    def signed_batches(self, records: Iterable[Optional[dict]]) -> Iterator[List[ThreatEvent]]:
+        pubkey, scheme = self.identity.public_pem, self.identity.scheme
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        ) if self.workers > 1 else None
+        in_flight: deque = deque()
+        try:
+            for events in self._event_batches(records, pubkey):
+                payloads = [event.get_canonical_payload() for event in events]
+                if executor is None:
+                    yield self._attach(events, self.identity.sign_many(payloads), scheme)
+                    continue
+                in_flight.append((events, executor.submit(_sign_batch, payloads)))
+                if len(in_flight) >= self.workers * 2:
+                    events, future = in_flight.popleft()
+                    yield self._attach(events, future.result(), scheme)
+            while in_flight:
+                events, future = in_flight.popleft()
+                yield self._attach(events, future.result(), scheme)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def _event_batches(self, records: Iterable[Optional[dict]], pubkey: str) -> Iterator[List[ThreatEvent]]:
+        batch: List[ThreatEvent] = []
+        for record in records:
+            self.records += 1
+            event = record_to_event(record, pubkey, self.default_type, self.default_severity)
+            if event is None:
+                self.skipped += 1
+                continue
+            batch.append(event)
+            if len(batch) >= self.batch_size:
+                self.events += len(batch)
+                yield batch
+                batch = []
+        if batch:
+            self.events += len(batch)
+            yield batch
+
+    @staticmethod
+    def _attach(events: List[ThreatEvent], signatures: List[str], scheme: str) -> List[ThreatEvent]:
+        for event, signature in zip(events, signatures):
+            event.signature = signature
+            event.sig_scheme = scheme
+            event.valid_signature = True
+        return events
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="cyphermesh-ingest",
+        description="Importa rilevazioni locali (JSONL o CSV, es. Suricata/Zeek/fail2ban), "
+                    "le firma a blocchi e le consegna al nodo in esecuzione"
+    )
+    parser.add_argument("input", nargs="?", default="-", help="File da leggere ('-' = stdin, default)")
+    parser.add_argument("--format", choices=("auto", "jsonl", "csv"), default="auto",
+                        help="Formato del flusso (auto: JSONL se la prima riga inizia con '{')")
+    parser.add_argument("--batch-size", type=int, default=500, help="Eventi per firma/transazione/richiesta")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processi di firma (1 = firma nel processo corrente)")
+    parser.add_argument("--threat-type", default="unknown", help="Tipo per i record che non lo indicano")
+    parser.add_argument("--severity", default="medium", help="Severità per i record che non la indicano")
+    parser.add_argument("--socket", default=CONTROL_SOCKET, help="Socket di controllo del nodo")
+    parser.add_argument("--offline", action="store_true",
+                        help="Non contattare il nodo: salva solo nel DB (la rete li riceve con l'anti-entropy)")
+    args = parser.parse_args()
+
+    ingest = Ingest(batch_size=args.batch_size, workers=args.workers,
+                    default_type=args.threat_type, default_severity=args.severity)
+
+    client = None
+    if not args.offline and control_available(args.socket):
+        try:
+            client = ControlClient(args.socket)
+        except OSError as e:
+            logger.warning(f"[INGEST] Nodo non raggiungibile su {args.socket} ({e}): salvo solo nel DB")
+    if client is None:
+        init_db()
+
+    stream = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    totals = {"accepted": 0, "duplicates": 0, "rejected": 0}
+    started = time.monotonic()
+    exit_code = 0
+    try:
+        batches = ingest.signed_batches(iter_records(stream, args.format))
+        if client is not None:
+            # Il nodo salva con il suo writer (group commit) e propaga; richieste in pipelining
+            requests = (("submit", {"events": [e.to_json() for e in batch]}) for batch in batches)
+            for reply in client.pipeline(requests):
+                for key in totals:
+                    totals[key] += reply.get(key, 0)
+        else:
+            # Niente nodo: una transazione per batch (INSERT OR IGNORE scarta i duplicati)
+            for batch in batches:
+                save_events(batch)
+                totals["accepted"] += len(batch)
+    except (ControlError, OSError) as e:
+        logger.error(f"[INGEST] Interrotto: {e}")
+        exit_code = 1
+    except KeyboardInterrupt:
+        exit_code = 130
+    finally:
+        if client is not None:
+            client.close()
+        if stream is not sys.stdin:
+            stream.close()
+
+    elapsed = time.monotonic() - started
+    rate = ingest.events / elapsed if elapsed > 0 else 0.0
+    target = "nodo" if client is not None else "DB"
+    logger.info(
+        f"[INGEST] {ingest.records} record, {ingest.events} eventi ({ingest.skipped} scartati) "
+        f"in {elapsed:.2f}s: {rate:,.0f} eventi/s -> {target}: {totals['accepted']} accettati, "
+        f"{totals['duplicates']} duplicati, {totals['rejected']} rifiutati"
+    )
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,34 @@
 import shutil
-from pathlib import Path
 import argparse
 from cyphermesh.logger import logger
+from cyphermesh.config import BASE_DIR, PRIVATE_KEY_PATH, PUBLIC_KEY_PATH
+from cyphermesh.crypto import KEY_TYPES, generate_keys
 
-CONFIG_DIR = Path.home() / ".cyphermesh"
+CONFIG_DIR = BASE_DIR
+
+
+def _backup_keys():
+    """Rinomina le chiavi correnti in *.pem.bak prima di sostituirle."""
+    for key_path in (PRIVATE_KEY_PATH, PUBLIC_KEY_PATH):
+        if key_path.exists():
+            key_path.replace(key_path.with_name(key_path.name + ".bak"))
 
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--config", action="store_true", help="Rimuovi solo config")
     p.add_argument("--db",     action="store_true", help="Rimuovi solo DB")
+    p.add_argument("--keys",   action="store_true",
+                   help="Rimuovi le chiavi (rigenerate all'avvio con CYPHER_KEY_TYPE)")
+    p.add_argument("--key-type", choices=sorted(KEY_TYPES),
+                   help="Rigenera subito le chiavi con lo schema indicato (le vecchie restano in *.pem.bak). "
+                        "La reputazione è legata alla chiave pubblica e riparte da zero.")
     p.add_argument("--all",    action="store_true", help="Rimuovi tutto")
     args = p.parse_args()
 
     if args.all:
         shutil.rmtree(CONFIG_DIR, ignore_errors=True)
-        logger.info("Tutto ~/.cyphermesh rimosso")
+        logger.info(f"Tutto {CONFIG_DIR} rimosso")
         return
 
     if args.db:
@@ -29,8 +42,16 @@ def main():
             if f.exists(): f.unlink()
         logger.info("File di configurazione rimossi")
 
-    if not (args.all or args.db or args.config):
-        logger.error("Specifica almeno --all, --config o --db")
+    if args.key_type:
+        _backup_keys()
+        generate_keys(args.key_type)
+        logger.info(f"Chiavi rigenerate ({args.key_type}), backup in *.pem.bak")
+    elif args.keys:
+        _backup_keys()
+        logger.info("Chiavi rimosse (backup in *.pem.bak)")
+
+    if not (args.all or args.db or args.config or args.keys or args.key_type):
+        logger.error("Specifica almeno --all, --config, --db, --keys o --key-type")
 
 
 if __name__ == "__main__":
@@ -1,7 +1,13 @@
 import sys
 import argparse
 from cyphermesh.core.node import Node
-from cyphermesh.config import resolve_node_identity
+from cyphermesh.core.async_node import AsyncNode
+from cyphermesh.config import resolve_node_identity, NODE_ENGINE
+
+ENGINES = {
+    "threads": Node,
+    "asyncio": AsyncNode,
+}
 
 
 def main():
@@ -9,7 +15,12 @@ def main():
         prog="cyphermesh-run-peer",
         description="Run a P2P node (Zero-Conf mode)"
     )
-    # Opzionale: lasciamo solo la possibilità di stampare la versione o help
+    parser.add_argument(
+        "--engine",
+        choices=sorted(ENGINES),
+        default=NODE_ENGINE if NODE_ENGINE in ENGINES else "threads",
+        help="Node implementation (default: CYPHER_ENGINE or 'threads')"
+    )
     args = parser.parse_args()
 
     # 1. Config resolution (Environment variables or Default)
@@ -18,7 +29,7 @@ def main():
 
     # 2. Core start
     # Niente più bootstrap_mode o seed_ip
-    node = Node(ip=ip, port=port)
+    node = ENGINES[args.engine](ip=ip, port=port)
 
     try:
         node.start()
@@ -0,0 +1,35 @@
+import argparse
+from cyphermesh.logger import logger
+from cyphermesh.config import DB_PATH
+from cyphermesh.db.core import get_db_connection
+from cyphermesh.db.migrations import database_bytes, enable_incremental_vacuum
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Riscrive il database con auto_vacuum incrementale, così la retention "
+                    "restituisce lo spazio al filesystem. Da lanciare a nodo fermo: blocca il DB "
+                    "per tutta la durata e serve spazio libero pari alla sua dimensione."
+    )
+    p.parse_args()
+
+    if not DB_PATH.exists():
+        logger.error(f"Database non trovato: {DB_PATH}")
+        return
+
+    conn = get_db_connection()
+    try:
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if mode == 2:
+            logger.info("auto_vacuum incrementale già attivo, niente da fare")
+            return
+        before = database_bytes(conn)
+        logger.info(f"VACUUM di {DB_PATH} ({before / 2**20:.0f} MiB) in corso...")
+        enable_incremental_vacuum(conn)
+        logger.info(f"Fatto: {before / 2**20:.0f} -> {database_bytes(conn) / 2**20:.0f} MiB, auto_vacuum incrementale")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,136 @@ PRIVATE_KEY_PATH = KEY_DIR / "private_key.pem"
 PUBLIC_KEY_PATH = KEY_DIR / "public_key.pem"
 DB_PATH = BASE_DIR / "cyphermesh.db"
 PEER_CONFIG_PATH = BASE_DIR / "peer_config.json"
+ARCHIVE_DB_PATH = BASE_DIR / "archive.db"
+
+# Node implementation: "threads" (one thread per peer) or "asyncio" (single event loop)
+NODE_ENGINE = os.environ.get("CYPHER_ENGINE", "threads")
+
+# Seen-event cache in front of the events table (duplicate checks without DB hits)
+SEEN_CACHE_SIZE = int(os.environ.get("CYPHER_SEEN_CACHE_SIZE", 100_000))
+SEEN_BLOOM_CAPACITY = int(os.environ.get("CYPHER_SEEN_BLOOM_CAPACITY", 1_000_000))  # 0 disables the Bloom filter
+SEEN_BLOOM_FP_RATE = float(os.environ.get("CYPHER_SEEN_BLOOM_FP_RATE", 0.001))
+
+# Signature verification stage: "thread" or "process" pool, batched and order-preserving
+VERIFY_MODE = os.environ.get("CYPHER_VERIFY_MODE", "thread")
+VERIFY_WORKERS = int(os.environ.get("CYPHER_VERIFY_WORKERS", os.cpu_count() or 2))
+VERIFY_BATCH_SIZE = int(os.environ.get("CYPHER_VERIFY_BATCH_SIZE", 64))
+VERIFY_QUEUE_SIZE = int(os.environ.get("CYPHER_VERIFY_QUEUE_SIZE", 10_000))
+
+# SQLite connections: bounded pool of long-lived connections, PRAGMAs applied once per connection
+DB_POOL_SIZE = int(os.environ.get("CYPHER_DB_POOL_SIZE", 8))
+DB_POOL_TIMEOUT_S = float(os.environ.get("CYPHER_DB_POOL_TIMEOUT_S", 30))  # wait for a free connection, then fail
+DB_STATEMENT_CACHE = int(os.environ.get("CYPHER_DB_STATEMENT_CACHE", 256))  # prepared statements per connection
+DB_SYNCHRONOUS = os.environ.get("CYPHER_DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE = int(os.environ.get("CYPHER_DB_CACHE_SIZE", -16_000))  # negative = KiB
+DB_MMAP_SIZE = int(os.environ.get("CYPHER_DB_MMAP_SIZE", 256 * 1024 * 1024))
+DB_TEMP_STORE = os.environ.get("CYPHER_DB_TEMP_STORE", "MEMORY")
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("CYPHER_DB_BUSY_TIMEOUT_MS", 30_000))
+
+# Single-writer persistence: group commit every N rows or M milliseconds.
+# DB_DURABILITY maps to PRAGMA synchronous on the writer connection: "off", "normal" or "full".
+DB_WRITE_BATCH_SIZE = int(os.environ.get("CYPHER_DB_WRITE_BATCH_SIZE", 500))
+DB_WRITE_INTERVAL_MS = int(os.environ.get("CYPHER_DB_WRITE_INTERVAL_MS", 50))
+DB_WRITE_QUEUE_SIZE = int(os.environ.get("CYPHER_DB_WRITE_QUEUE_SIZE", 100_000))
+DB_DURABILITY = os.environ.get("CYPHER_DB_DURABILITY", "normal")
+
+# Event retention: events older than the TTL are deleted (or moved to archive.db) by a
+# background job, followed by an incremental vacuum. EVENT_TTL_DAYS = 0 keeps everything.
+EVENT_TTL_DAYS = float(os.environ.get("CYPHER_EVENT_TTL_DAYS", 0))
+RETENTION_MODE = os.environ.get("CYPHER_RETENTION_MODE", "delete")  # "delete" or "archive"
+RETENTION_INTERVAL_S = float(os.environ.get("CYPHER_RETENTION_INTERVAL_S", 3600))
+RETENTION_BATCH_SIZE = int(os.environ.get("CYPHER_RETENTION_BATCH_SIZE", 5000))
+RETENTION_VACUUM_PAGES = int(os.environ.get("CYPHER_RETENTION_VACUUM_PAGES", 1000))
+
+# Signature scheme for newly generated keys: "rsa" (RSA-2048 PSS) or "ed25519"
+KEY_TYPE = os.environ.get("CYPHER_KEY_TYPE", "rsa")
+
+# Preferred wire encoding, offered in the handshake: "msgpack" (compact binary frames,
+# JSON fallback for peers that do not support it) or "json" to disable binary frames
+WIRE_ENCODING = os.environ.get("CYPHER_WIRE_ENCODING", "msgpack")
+# Per-connection stream compression, offered in the handshake: "zlib" or "none".
+# Used only when both peers support it; the level trades CPU for bytes (1-9).
+WIRE_COMPRESSION = os.environ.get("CYPHER_WIRE_COMPRESSION", "zlib")
+WIRE_COMPRESSION_LEVEL = int(os.environ.get("CYPHER_WIRE_COMPRESSION_LEVEL", 6))
+
+# TCP framing: frames announcing a larger body are rejected and the peer is dropped.
+# Each connection reads into a reusable buffer of RECV_BUFFER_SIZE bytes (grown up to the max frame).
+MAX_FRAME_SIZE = int(os.environ.get("CYPHER_MAX_FRAME_SIZE", 4 * 1024 * 1024))
+RECV_BUFFER_SIZE = int(os.environ.get("CYPHER_RECV_BUFFER_SIZE", 64 * 1024))
+
+# Outbound gossip coalescing: events for the same peer are buffered for up to
+# GOSSIP_LINGER_MS (or until the event/byte threshold) and sent with a single write,
+# as one events_batch frame when the peer supports it. GOSSIP_LINGER_MS = 0 disables it.
+GOSSIP_LINGER_MS = float(os.environ.get("CYPHER_GOSSIP_LINGER_MS", 5))
+GOSSIP_BATCH_MAX_EVENTS = int(os.environ.get("CYPHER_GOSSIP_BATCH_MAX_EVENTS", 256))
+GOSSIP_BATCH_MAX_BYTES = int(os.environ.get("CYPHER_GOSSIP_BATCH_MAX_BYTES", 256 * 1024))
+
+# Gossip mode: "push" forwards full events to every peer; "inv" only announces event IDs
+# and peers pull the bodies they miss with getdata (push is kept for peers without "inv").
+GOSSIP_MODE = os.environ.get("CYPHER_GOSSIP_MODE", "push")
+INV_CACHE_SIZE = int(os.environ.get("CYPHER_INV_CACHE_SIZE", 10_000))  # event bodies kept to serve getdata
+INV_REQUEST_TIMEOUT_S = float(os.environ.get("CYPHER_INV_REQUEST_TIMEOUT_S", 5))
+
+# Peer sampling overlay: outgoing connections stop at PEER_TARGET_DEGREE (incoming ones are
+# refused above PEER_MAX_DEGREE, 0 = 2x target); other known addresses wait in a passive view
+# of PEER_PASSIVE_SIZE entries and replace active peers that drop. Every heartbeat a sample of
+# PEER_SHUFFLE_SIZE addresses is exchanged with a random peer.
+PEER_TARGET_DEGREE = int(os.environ.get("CYPHER_PEER_TARGET_DEGREE", 8))
+PEER_MAX_DEGREE = int(os.environ.get("CYPHER_PEER_MAX_DEGREE", 0))
+PEER_PASSIVE_SIZE = int(os.environ.get("CYPHER_PEER_PASSIVE_SIZE", 64))
+PEER_SHUFFLE_SIZE = int(os.environ.get("CYPHER_PEER_SHUFFLE_SIZE", 8))
+# Peers each event is forwarded to (random subset of the active view); 0 = all of them
+GOSSIP_FANOUT = int(os.environ.get("CYPHER_GOSSIP_FANOUT", 0))
+
+# Per-peer outbound queues: frames wait in a bounded queue (frames and bytes) drained by a
+# writer per peer, so one slow peer cannot stall gossip to the others. When a queue is full,
+# PEER_OVERFLOW_POLICY "drop" discards the new frame, "disconnect" evicts the slow peer.
+PEER_SEND_QUEUE_SIZE = int(os.environ.get("CYPHER_PEER_SEND_QUEUE_SIZE", 1000))
+PEER_SEND_QUEUE_BYTES = int(os.environ.get("CYPHER_PEER_SEND_QUEUE_BYTES", 8 * 1024 * 1024))
+PEER_OVERFLOW_POLICY = os.environ.get("CYPHER_PEER_OVERFLOW_POLICY", "drop")
+
+# Anti-entropy on connect: peers exchange hourly digests (event count + hash of the IDs) over
+# the last SYNC_WINDOW_DAYS and pull only the events they miss. Bodies are streamed in chunks
+# of SYNC_CHUNK_EVENTS, capped at SYNC_RATE_BYTES per second across all peers so the bulk
+# transfer does not starve live gossip, and at SYNC_PEER_RATE_BYTES per second for any single
+# peer. SYNC_WINDOW_DAYS = 0 disables it.
+SYNC_WINDOW_DAYS = float(os.environ.get("CYPHER_SYNC_WINDOW_DAYS", 7))
+SYNC_CHUNK_EVENTS = int(os.environ.get("CYPHER_SYNC_CHUNK_EVENTS", 100))
+SYNC_RATE_BYTES = int(os.environ.get("CYPHER_SYNC_RATE_BYTES", 256 * 1024))
+SYNC_PEER_RATE_BYTES = int(os.environ.get("CYPHER_SYNC_PEER_RATE_BYTES", 128 * 1024))
+
+# LAN discovery: PING is broadcast while the node has no peers, repeated with exponential
+# backoff (jittered, up to DISCOVERY_BACKOFF_MAX_S). Replies are unicast PONGs delayed by a
+# random 0..DISCOVERY_REPLY_JITTER_MS; each source address may send DISCOVERY_SOURCE_RATE
+# packets per second, the rest is dropped.
+DISCOVERY_REPLY_JITTER_MS = float(os.environ.get("CYPHER_DISCOVERY_REPLY_JITTER_MS", 200))
+DISCOVERY_BACKOFF_MAX_S = float(os.environ.get("CYPHER_DISCOVERY_BACKOFF_MAX_S", 300))
+DISCOVERY_SOURCE_RATE = float(os.environ.get("CYPHER_DISCOVERY_SOURCE_RATE", 2))
+
+# Admission control before signature verification: token buckets per remote IP, per peer
+# connection and per reporter key (events/s and burst). Excess events are dropped; 0 disables a limit.
+ADMISSION_IP_RATE = float(os.environ.get("CYPHER_ADMISSION_IP_RATE", 2000))
+ADMISSION_IP_BURST = float(os.environ.get("CYPHER_ADMISSION_IP_BURST", 10_000))
+ADMISSION_PEER_RATE = float(os.environ.get("CYPHER_ADMISSION_PEER_RATE", 1000))
+ADMISSION_PEER_BURST = float(os.environ.get("CYPHER_ADMISSION_PEER_BURST", 5000))
+ADMISSION_REPORTER_RATE = float(os.environ.get("CYPHER_ADMISSION_REPORTER_RATE", 100))
+ADMISSION_REPORTER_BURST = float(os.environ.get("CYPHER_ADMISSION_REPORTER_BURST", 1000))
+
+# Reporter reputation is kept in memory and written behind to SQLite every
+# REPUTATION_FLUSH_INTERVAL_S. With REPUTATION_HALF_LIFE_HOURS > 0 scores decay toward zero
+# (halving every half-life), so old misbehaviour fades; 0 keeps scores forever.
+# At most REPUTATION_MAX_REPORTERS keys stay in memory (LRU); scores that decayed to zero and the
+# least recently used keys are dropped once written, and reloaded from SQLite on their next update.
+REPUTATION_HALF_LIFE_HOURS = float(os.environ.get("CYPHER_REPUTATION_HALF_LIFE_HOURS", 0))
+REPUTATION_FLUSH_INTERVAL_S = float(os.environ.get("CYPHER_REPUTATION_FLUSH_INTERVAL_S", 5))
+REPUTATION_MAX_REPORTERS = int(os.environ.get("CYPHER_REPUTATION_MAX_REPORTERS", 100_000))
+
+# Parsed reporter public keys kept in memory (LRU, keyed by PEM fingerprint)
+PUBKEY_CACHE_SIZE = int(os.environ.get("CYPHER_PUBKEY_CACHE_SIZE", 1024))
+
+# Local control socket (Unix domain, owner-only) through which other processes on this host,
+# e.g. cyphermesh-ingest, hand signed events to the running node. Empty or "none" disables it.
+CONTROL_SOCKET = os.environ.get("CYPHER_CONTROL_SOCKET", str(BASE_DIR / "control.sock"))
 
 # Create base folder if it does not exist
 try:
@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from cyphermesh.core.ratelimit import TokenBucket
+
+# Chiavi (reporter, peer, IP) tenute in memoria per dimensione; oltre si scartano le meno recenti
+MAX_KEYS = 100_000
+
+
+class _KeyedBuckets:
+    """Un token bucket per chiave, in un LRU limitato. Rate 0 = nessun limite."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max(1, max_keys)
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def allow(self, key: Hashable) -> bool:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, burst=self.burst)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+        if bucket.try_consume():
+            return True
+        with self._lock:
+            self.dropped += 1
+        return False
+
+    def forget(self, key: Hashable):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionControl:
+    """
+    Controllo di ammissione degli eventi in arrivo, prima della verifica della firma e
+    del salvataggio: un token bucket per IP remoto, uno per connessione e uno per chiave
+    del reporter. Gli eventi oltre il limite vengono scartati subito, così un flood
+    (anche con chiavi sempre nuove) costa una lookup in memoria invece di una verifica RSA.
+    I controlli vanno dal più largo al più stretto: IP, connessione, reporter.
+    I frame inv/getdata (che riempiono le richieste in sospeso o leggono dal DB) passano
+    da admit_frame: un token a frame dai bucket di IP e connessione.
+    """
+
+    def __init__(self, reporter_rate: float = 0, reporter_burst: float = 0,
+                 peer_rate: float = 0, peer_burst: float = 0,
+                 ip_rate: float = 0, ip_burst: float = 0, max_keys: int = MAX_KEYS):
+        self.by_ip = _KeyedBuckets(ip_rate, ip_burst, max_keys)
+        self.by_peer = _KeyedBuckets(peer_rate, peer_burst, max_keys)
+        self.by_reporter = _KeyedBuckets(reporter_rate, reporter_burst, max_keys)
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.frames_admitted = 0
+
+    def admit(self, reporter: str, peer: Any = None, ip: Optional[str] = None) -> bool:
+        """True se l'evento può proseguire verso la verifica."""
+        if self.by_ip.enabled and ip is not None and not self.by_ip.allow(ip):
+            return False
+        if self.by_peer.enabled and peer is not None and not self.by_peer.allow(peer):
+            return False
+        if self.by_reporter.enabled and not self.by_reporter.allow(reporter):
+            return False
+        with self._lock:
+            self.admitted += 1
+        return True
+
+    def admit_frame(self, peer: Any = None, ip: Optional[str] = None) -> bool:
+        """True se un frame inv/getdata del peer può essere elaborato."""
+        if self.by_ip.enabled and ip is not None and not self.by_ip.allow(ip):
+            return False
+        if self.by_peer.enabled and peer is not None and not self.by_peer.allow(peer):
+            return False
+        with self._lock:
+            self.frames_admitted += 1
+        return True
+
+    def forget_peer(self, peer: Any):
+        """Connessione chiusa: il suo bucket non serve più (quello del suo IP resta)."""
+        self.by_peer.forget(peer)
+
+    def stats(self) -> dict:
+        with self._lock:
+            admitted, frames_admitted = self.admitted, self.frames_admitted
+        return {
+            "admitted": admitted,
+            "frames_admitted": frames_admitted,
+            "dropped_ip": self.by_ip.dropped,
+            "dropped_peer": self.by_peer.dropped,
+            "dropped_reporter": self.by_reporter.dropped,
+            "tracked_ips": len(self.by_ip),
+            "tracked_peers": len(self.by_peer),
+            "tracked_reporters": len(self.by_reporter),
+        }
@@ -0,0 +1,469 @@
+import asyncio
+import socket
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from cyphermesh.models import ThreatEvent
+from cyphermesh.core.node import Node, REFILL_MIN_INTERVAL_S
+from cyphermesh.core.discovery import make_listener, make_sender, UDP_BROADCAST_PORT
+from cyphermesh.core.protocol import (
+    encode_message, decode_message, FrameSet, FrameBuffer, FrameTooLargeError, Deflater, FEATURE_SYNC
+)
+from cyphermesh.core.outbound import MAX_WRITE_BYTES
+from cyphermesh.config import MAX_FRAME_SIZE, RECV_BUFFER_SIZE
+from cyphermesh.config import PEER_SEND_QUEUE_SIZE, PEER_SEND_QUEUE_BYTES
+from cyphermesh.core.sync import SyncOrigin
+from cyphermesh.core.peer_table import PeerInfo
+
+
+class _AsyncPeer:
+    """Connessione TCP gestita dall'event loop, con la propria coda di scrittura."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        # Oltre PEER_SEND_QUEUE_SIZE frame (o PEER_SEND_QUEUE_BYTES) i frame nuovi vengono
+        # scartati: un peer lento non rallenta il gossip verso tutti gli altri
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=PEER_SEND_QUEUE_SIZE)
+        self.queued_bytes = 0
+        self.addr: Optional[Tuple[str, int]] = writer.get_extra_info("peername")
+        self.writer_task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.stall_s = 0.0        # Tempo totale passato in drain() (finestra TCP piena)
+        self.max_stall_ms = 0.0
+        self.writes = 0
+        self.deflater: Optional[Deflater] = None   # Compressione negoziata nell'handshake
+
+    def enqueue(self, frame: bytes) -> bool:
+        """Accoda un frame già codificato. Se la coda è piena il frame viene scartato (False)."""
+        if self.queue.qsize() and self.queued_bytes + len(frame) > PEER_SEND_QUEUE_BYTES:
+            self.dropped += 1
+            return False
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.queued_bytes += len(frame)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "queue_frames": self.queue.qsize(),
+            "queue_bytes": self.queued_bytes,
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "writes": self.writes,
+            "dropped": self.dropped,
+            "stall_ms": round(self.stall_s * 1000, 1),
+            "max_stall_ms": round(self.max_stall_ms, 1),
+            "compression": self.deflater.stats() if self.deflater else None,
+        }
+
+    def close(self):
+        if self.writer_task:
+            self.writer_task.cancel()
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class _DiscoveryProtocol(asyncio.DatagramProtocol):
+    """Riceve i pacchetti UDP di discovery e li passa al nodo."""
+
+    def __init__(self, node: "AsyncNode"):
+        self.node = node
+
+    def datagram_received(self, data: bytes, addr):
+        self.node.discovery.on_datagram(data, addr)
+
+
+class AsyncNode(Node):
+    """
+    Variante del Node basata su asyncio.
+    Accept TCP, letture framed, discovery UDP e heartbeat girano tutti su un solo event loop;
+    ogni peer ha una coda di scrittura dedicata, così un peer lento non blocca gli altri.
+    Il formato sul filo è lo stesso di Node: le due implementazioni possono parlarsi.
+    """
+
+    def __init__(self, ip: str, port: int):
+        super().__init__(ip, port)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._udp_transport = None
+        self._refill_pending = False
+        self._last_refill = 0.0
+
+    def start(self):
+        """Avvia l'event loop e blocca fino a stop()."""
+        try:
+            asyncio.run(self._main())
+        except KeyboardInterrupt:
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        if self.loop and self._stop_event and not self.loop.is_closed():
+            try:
+                self.loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass
+        self.logger.info("Nodo arrestato.")
+
+    def connect_to_peer(self, target_host: str, target_port: int):
+        """Thread-safe: pianifica la connessione sull'event loop."""
+        if not self.loop:
+            return
+        if self._on_loop_thread():
+            self._spawn(self._connect(target_host, target_port))
+        else:
+            asyncio.run_coroutine_threadsafe(self._connect(target_host, target_port), self.loop)
+
+    # --- EVENT LOOP ---
+
+    async def _main(self):
+        self.running = True
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        await self.loop.run_in_executor(None, self._init_services)
+
+        # 1. Server TCP
+        server = await asyncio.start_server(self._on_incoming, "0.0.0.0", self.port)
+        self.logger.info(f"Nodo (asyncio) attivo su TCP {self.ip}:{self.port}")
+
+        # 2. Discovery UDP: un socket in ascolto e uno riutilizzabile per PING e PONG
+        listener, _ = await self.loop.create_datagram_endpoint(
+            lambda: _DiscoveryProtocol(self), sock=self._nonblocking(make_listener(UDP_BROADCAST_PORT))
+        )
+        self._udp_transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: _DiscoveryProtocol(self), sock=self._nonblocking(make_sender())
+        )
+        self.logger.info(f"UDP Discovery in ascolto su porta {UDP_BROADCAST_PORT}")
+        self._spawn(self._discovery_loop())
+
+        # 3. Heartbeat (e ritrasmissione dei getdata scaduti)
+        self._spawn(self._heartbeat())
+        self._spawn(self._inv_retry())
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            self.running = False
+            server.close()
+            listener.close()
+            self._udp_transport.close()
+            for peer in list(self.peers):
+                peer.close()
+            for task in list(self._tasks):
+                task.cancel()
+            await self.loop.run_in_executor(None, self._flush_peer_table)
+            await self.loop.run_in_executor(None, self._stop_services)
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """Crea un task mantenendone un riferimento finché non termina."""
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # --- TCP ---
+
+    async def _on_incoming(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if not self.views.accept_incoming(len(self.peers)):
+            writer.close()
+            return
+        peer = self._register_peer(reader, writer, "in")
+        await self._read_loop(peer)
+
+    async def _connect(self, target_host: str, target_port: int):
+        """Tenta di stabilire una connessione TCP con un peer scoperto."""
+        if not target_port:
+            return
+        addr = (target_host, target_port)
+        if addr in self.own_addrs:
+            return
+        if self.views.is_active(addr) or self.peers.find(addr):
+            return
+        # Le connessioni in corso contano già nel grado
+        if not self.views.has_room(len(self.peers) + self.peers.connecting_count()):
+            self.views.add_passive(addr)
+            return
+
+        if not self.peers.reserve(addr):
+            return
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(target_host, target_port), timeout=5.0
+            )
+        except Exception:
+            # Silenziamo errori comuni durante la discovery per pulizia log
+            self.views.remove_passive(addr)
+            return
+        finally:
+            self.peers.release(addr)
+
+        peer = self._register_peer(reader, writer, "out", listen_addr=addr)
+        self.views.mark_active(addr)
+        self.logger.info(f"🔗 Connesso a peer: {target_host}:{target_port}")
+        self._spawn(self._read_loop(peer))
+
+    def _register_peer(self, reader, writer, direction: str, listen_addr=None) -> _AsyncPeer:
+        peer = _AsyncPeer(reader, writer)
+        peer.writer_task = self._spawn(self._write_loop(peer))
+        self.peers.add(PeerInfo(conn=peer, addr=peer.addr, direction=direction, listen_addr=listen_addr))
+        # Handshake in JSON: i nodi che non lo conoscono lo ignorano
+        peer.enqueue(encode_message("handshake", self._handshake_payload()))
+        return peer
+
+    async def _read_loop(self, peer: _AsyncPeer):
+        """
+        Legge dal peer a blocchi e smista tutti i frame completi arrivati con ogni lettura.
+        Il lavoro bloccante (verifica, DB) dei frame di una lettura va all'executor in un solo
+        job, in ordine di arrivo, e la lettura successiva aspetta che finisca: se il
+        VerificationPool è pieno il job resta fermo in submit e il peer smette di essere letto
+        (backpressure via TCP), invece di accumulare task senza limite.
+        """
+        buffer = FrameBuffer(max_frame_size=MAX_FRAME_SIZE, buffer_size=RECV_BUFFER_SIZE)
+        info = self.peers.get(peer)
+        try:
+            while self.running:
+                data = await peer.reader.read(RECV_BUFFER_SIZE)
+                if not data:
+                    break
+                buffer.feed(data)
+
+                jobs = []
+                while True:
+                    body = buffer.next_frame()
+                    if body is None:
+                        break
+                    message = decode_message(body)
+                    if message is None:
+                        return
+                    if info is not None:
+                        info.last_seen = time.time()
+                        info.frames_in += 1
+                    job = self._blocking_job(peer, message)
+                    if job is not None:
+                        jobs.append(job)
+                        continue
+                    # I frame gestiti sul loop restano in ordine dopo quelli già letti
+                    if jobs:
+                        await self.loop.run_in_executor(None, self._run_jobs, jobs)
+                        jobs = []
+                    self._dispatch(peer, message)
+                if jobs:
+                    await self.loop.run_in_executor(None, self._run_jobs, jobs)
+        except FrameTooLargeError as e:
+            self.logger.warning(f"Peer {peer.addr} disconnesso: {e}")
+        except (asyncio.CancelledError, ConnectionError, OSError):
+            pass
+        finally:
+            self._remove_peer(peer)
+
+    def _blocking_job(self, peer: _AsyncPeer, message: dict):
+        """(funzione, argomenti) per i frame che toccano verifica o DB, None per gli altri."""
+        msg_type = message.get("type")
+        payload = message.get("payload")
+        info = self.peers.get(peer)
+        if msg_type == "event":
+            if info is not None:
+                info.events_in += 1
+            return self._handle_threat_event, (payload, peer)
+        if msg_type == "events_batch":
+            events = payload.get("events") if isinstance(payload, dict) else None
+            if info is not None and isinstance(events, list):
+                info.events_in += len(events)
+            return self._handle_threat_events, (events or [], peer)
+        if msg_type in ("inv", "getdata"):
+            # Entrambi possono interrogare il DB
+            ids = payload.get("ids") if isinstance(payload, dict) else None
+            return (self._on_inv if msg_type == "inv" else self._on_getdata), (peer, ids or [])
+        if msg_type == "sync_events" and FEATURE_SYNC in self._peer_features(peer):
+            events = payload.get("events") if isinstance(payload, dict) else None
+            return self._handle_threat_events, (events or [], SyncOrigin(peer))
+        return None
+
+    def _run_jobs(self, jobs):
+        """Esegue nell'executor, in ordine, i job di una lettura."""
+        for func, args in jobs:
+            try:
+                func(*args)
+            except Exception as e:
+                self.logger.error(f"Errore processamento frame: {e}")
+
+    def _dispatch(self, peer: _AsyncPeer, message: dict):
+        """Frame leggeri, gestiti direttamente sul loop."""
+        msg_type = message.get("type")
+        if msg_type in ("sync_digest", "sync_ids", "sync_pull"):
+            # Il lavoro (DB, limite di banda) gira sul thread dell'anti-entropy
+            self._on_sync_frame(peer, msg_type, message.get("payload"))
+        elif msg_type == "handshake":
+            self._on_handshake(peer, message.get("payload"))
+        elif msg_type == "peers":
+            self._on_peers(peer, message.get("payload"))
+        elif msg_type == "HELLO":
+            self._on_hello(peer, message.get("payload"))
+
+    async def _write_loop(self, peer: _AsyncPeer):
+        """
+        Svuota la coda del peer. drain() applica backpressure solo a questo peer.
+        I frame già in coda partono insieme (e compressi insieme, se negoziato).
+        """
+        try:
+            while True:
+                chunk = [await peer.queue.get()]
+                size = len(chunk[0])
+                while not peer.queue.empty() and size < MAX_WRITE_BYTES:
+                    chunk.append(peer.queue.get_nowait())
+                    size += len(chunk[-1])
+                peer.queued_bytes -= size
+                data = chunk[0] if len(chunk) == 1 else b"".join(chunk)
+                if peer.deflater is not None:
+                    data = peer.deflater.wrap(data)
+                peer.writer.write(data)
+                started = time.monotonic()
+                await peer.writer.drain()
+                stalled = time.monotonic() - started
+                peer.frames_sent += len(chunk)
+                peer.writes += 1
+                peer.bytes_sent += len(data)
+                peer.stall_s += stalled
+                peer.max_stall_ms = max(peer.max_stall_ms, stalled * 1000)
+        except (ConnectionError, OSError):
+            self._remove_peer(peer)
+        except asyncio.CancelledError:
+            pass
+
+    def _remove_peer(self, peer: _AsyncPeer):
+        info = self.peers.remove(peer)
+        if self.batcher:
+            self.batcher.discard(peer)
+        peer.close()
+        if info is not None:
+            self._on_peer_removed(info)
+
+    def _enable_compression(self, info: PeerInfo):
+        info.conn.deflater = Deflater(self.compression_level)
+
+    def _schedule_refill(self):
+        """
+        connect_to_peer qui pianifica solo la connessione sul loop, non blocca. Le richieste
+        si fondono in un refill solo, al più uno ogni REFILL_MIN_INTERVAL_S.
+        """
+        if not self.loop or self.loop.is_closed():
+            return
+        if not self._on_loop_thread():
+            self.loop.call_soon_threadsafe(self._schedule_refill)
+            return
+        if self._refill_pending:
+            return
+        self._refill_pending = True
+        delay = max(0.0, self._last_refill + REFILL_MIN_INTERVAL_S - time.monotonic())
+        self.loop.call_later(delay, self._run_refill)
+
+    def _run_refill(self):
+        self._refill_pending = False
+        self._last_refill = time.monotonic()
+        if self.running:
+            self._refill_active_view()
+
+    def _send_frame(self, peer: _AsyncPeer, frame: bytes):
+        """Thread-safe: accoda il frame sulla coda di scrittura del peer."""
+        if self._on_loop_thread():
+            self._enqueue(peer, frame)
+        elif self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._enqueue, peer, frame)
+
+    def _enqueue(self, peer: _AsyncPeer, frame: bytes):
+        if not peer.enqueue(frame) and peer in self.peers:
+            self._on_send_overflow(peer)
+
+    def _peer_send_stats(self) -> Dict[str, dict]:
+        stats = {}
+        for info in self.peers.infos():
+            label = f"{info.addr[0]}:{info.addr[1]}" if info.addr else f"peer-{id(info.conn):x}"
+            stats[label] = info.conn.stats()
+        return stats
+
+    def _gossip_event(self, event: ThreatEvent, exclude_sock: _AsyncPeer = None):
+        """
+        Invia l'evento a tutti i peer TRANNE quello da cui l'abbiamo ricevuto.
+        Può essere chiamato dai thread dell'executor: l'accodamento avviene sul loop.
+        """
+        if self.batcher or self.gossip_mode == "inv":
+            # Batcher e annunci inv passano per _send_batch/_send_frame
+            super()._gossip_event(event, exclude_sock)
+            return
+        payload = event.to_json()
+        self.inventory.remember(event.id, payload)
+        frames = FrameSet("event", payload, msg_id=event.id)
+        # La codifica avviene qui (thread dell'executor), una volta per encoding in uso
+        for encoding in {info.encoding for info in self.peers.infos()}:
+            frames.get(encoding)
+        if self._on_loop_thread():
+            self._enqueue_all(frames, exclude_sock)
+        elif self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._enqueue_all, frames, exclude_sock)
+
+    def _enqueue_all(self, frames: FrameSet, exclude: _AsyncPeer = None):
+        for peer in self._gossip_targets(exclude):
+            self._enqueue(peer, frames.get(self._peer_encoding(peer)))
+
+    async def _heartbeat(self):
+        while self.running:
+            await asyncio.sleep(30)
+            self.logger.debug(f"Metriche: {self.get_metrics()}")
+            await self.loop.run_in_executor(None, self._flush_peer_table)
+            self._check_seen_bloom()
+
+            # Se siamo soli ci pensa la discovery UDP (PING con backoff)
+            if not self.peers:
+                continue
+
+            # Keep-alive a tutti i peer, non solo al fanout del gossip (con ping per l'RTT)
+            hello = FrameSet("HELLO", {"ping": time.monotonic()})
+            for peer in list(self.peers):
+                self._enqueue(peer, hello.get(self._peer_encoding(peer)))
+
+            self._shuffle_peers()
+            self._refill_active_view()
+
+    async def _inv_retry(self):
+        while self.running:
+            await asyncio.sleep(max(0.5, self.inventory.request_timeout / 2))
+            try:
+                self._retry_inv_requests()
+            except Exception as e:
+                self.logger.error(f"Errore ritrasmissione getdata: {e}")
+
+    # --- UDP DISCOVERY ---
+
+    @staticmethod
+    def _nonblocking(udp_sock: socket.socket) -> socket.socket:
+        udp_sock.setblocking(False)
+        return udp_sock
+
+    async def _discovery_loop(self):
+        """Risposte in attesa e PING con backoff, finché il nodo è attivo."""
+        while self.running:
+            timeout = self.discovery.poll(alone=not self.peers)
+            await asyncio.sleep(min(timeout, 1.0))
+
+    def _send_udp(self, data: bytes, addr=None):
+        if self._udp_transport:
+            self._udp_transport.sendto(data, addr or ('<broadcast>', UDP_BROADCAST_PORT))
+
+    def _on_lan_peer(self, host: str, port: int):
+        # La connect è già asincrona: niente thread
+        self._on_peer_discovered(host, port)
@@ -0,0 +1,133 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from cyphermesh.core.protocol import FrameSet
+from cyphermesh.logger import logger
+
+
+def estimate_size(payload: dict) -> int:
+    """Stima economica dei byte di un evento sul filo, senza serializzarlo."""
+    return 64 + sum(len(v) for v in payload.values() if isinstance(v, str))
+
+
+class OutboundBatcher:
+    """
+    Buffer di uscita per peer: gli eventi destinati allo stesso peer si accumulano per
+    al massimo `linger_ms` millisecondi, o fino a `max_events` / `max_bytes`, e poi
+    partono insieme con una sola scrittura (`send(peer, frames)`).
+    Il nodo decide come spedire il gruppo: un frame events_batch o i frame concatenati.
+    """
+
+    def __init__(self, send: Callable[[Any, List[FrameSet]], None], linger_ms: float = 5,
+                 max_events: int = 256, max_bytes: int = 256 * 1024):
+        self.send = send
+        self.linger = max(0.0, linger_ms) / 1000
+        self.max_events = max(1, max_events)
+        self.max_bytes = max(1, max_bytes)
+
+        self._pending: Dict[Any, List[FrameSet]] = {}
+        self._sizes: Dict[Any, int] = {}
+        self._deadlines: Dict[Any, float] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        self.batches = 0
+        self.events = 0
+        self.full_flushes = 0   # Partiti per soglia (eventi o byte) invece che per linger
+        self.errors = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="gossip-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Spedisce quello che è ancora in buffer e ferma il thread."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._thread = None
+        self._flush(list(self._pending))
+
+    def add(self, peer, frames: FrameSet, size: int):
+        """Accoda un messaggio per il peer; se il buffer supera le soglie parte subito."""
+        with self._cond:
+            pending = self._pending.get(peer)
+            if pending is None:
+                pending = self._pending[peer] = []
+                self._sizes[peer] = 0
+                self._deadlines[peer] = time.monotonic() + self.linger
+                self._cond.notify()
+            pending.append(frames)
+            self._sizes[peer] += size
+            full = len(pending) >= self.max_events or self._sizes[peer] >= self.max_bytes
+            if full:
+                self.full_flushes += 1
+                batch = self._take(peer)
+        if full:
+            self._deliver(peer, batch)
+
+    def discard(self, peer):
+        """Dimentica il buffer di un peer disconnesso."""
+        with self._cond:
+            self._take(peer)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "linger_ms": self.linger * 1000,
+                "pending_peers": len(self._pending),
+                "pending_events": sum(len(p) for p in self._pending.values()),
+                "batches": self.batches,
+                "events": self.events,
+                "avg_batch": round(self.events / self.batches, 2) if self.batches else 0.0,
+                "full_flushes": self.full_flushes,
+                "errors": self.errors,
+            }
+
+    # --- INTERNI ---
+
+    def _take(self, peer) -> List[FrameSet]:
+        """Da chiamare con il lock preso."""
+        self._sizes.pop(peer, None)
+        self._deadlines.pop(peer, None)
+        return self._pending.pop(peer, [])
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                now = time.monotonic()
+                due = [peer for peer, deadline in self._deadlines.items() if deadline <= now]
+                if not due:
+                    timeout = min(self._deadlines.values()) - now if self._deadlines else None
+                    self._cond.wait(timeout)
+                    continue
+            self._flush(due)
+
+    def _flush(self, peers):
+        for peer in peers:
+            with self._cond:
+                batch = self._take(peer)
+            if batch:
+                self._deliver(peer, batch)
+
+    def _deliver(self, peer, batch: List[FrameSet]):
+        try:
+            self.send(peer, batch)
+        except Exception as e:
+            with self._cond:
+                self.errors += 1
+            logger.debug(f"[GOSSIP BATCH] invio fallito: {e}")
+            return
+        with self._cond:
+            self.batches += 1
+            self.events += len(batch)
@@ -0,0 +1,303 @@
+"""
+Codec binario compatto per i frame (sottoinsieme di MessagePack).
+
+Se il pacchetto `msgpack` è installato (pip install cyphermesh[msgpack]) viene usata
+la sua implementazione in C; altrimenti l'encoder/decoder puro Python qui sotto,
+compatibile sul filo per i tipi che usiamo: None, bool, int, float, str, bytes, list, dict.
+"""
+import base64
+import struct
+from functools import lru_cache
+from typing import Any, Optional
+
+try:
+    import msgpack as _msgpack
+except ImportError:  # dipendenza opzionale
+    _msgpack = None
+
+
+# --- ENCODER PURO PYTHON ---
+
+def _pack(obj: Any, out: bytearray):
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True:
+        out.append(0xC3)
+    elif obj is False:
+        out.append(0xC2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -0x20 <= obj < 0:
+            out.append(obj & 0xFF)
+        elif 0 <= obj <= 0xFFFFFFFF:
+            out += struct.pack(">BI", 0xCE, obj) if obj > 0xFFFF else (
+                struct.pack(">BH", 0xCD, obj) if obj > 0xFF else struct.pack(">BB", 0xCC, obj))
+        elif 0 <= obj <= 0xFFFFFFFFFFFFFFFF:
+            out += struct.pack(">BQ", 0xCF, obj)
+        elif -0x80 <= obj < 0:
+            out += struct.pack(">Bb", 0xD0, obj)
+        elif -0x8000 <= obj < 0:
+            out += struct.pack(">Bh", 0xD1, obj)
+        elif -0x80000000 <= obj < 0:
+            out += struct.pack(">Bi", 0xD2, obj)
+        elif -0x8000000000000000 <= obj < 0:
+            out += struct.pack(">Bq", 0xD3, obj)
+        else:
+            raise ValueError("Intero fuori range per msgpack")
+    elif isinstance(obj, float):
+        out += struct.pack(">Bd", 0xCB, obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        n = len(data)
+        if n < 32:
+            out.append(0xA0 | n)
+        elif n <= 0xFF:
+            out += struct.pack(">BB", 0xD9, n)
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xDA, n)
+        else:
+            out += struct.pack(">BI", 0xDB, n)
+        out += data
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        n = len(obj)
+        if n <= 0xFF:
+            out += struct.pack(">BB", 0xC4, n)
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xC5, n)
+        else:
+            out += struct.pack(">BI", 0xC6, n)
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        n = len(obj)
+        if n < 16:
+            out.append(0x90 | n)
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xDC, n)
+        else:
+            out += struct.pack(">BI", 0xDD, n)
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        n = len(obj)
+        if n < 16:
+            out.append(0x80 | n)
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xDE, n)
+        else:
+            out += struct.pack(">BI", 0xDF, n)
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    else:
+        raise TypeError(f"Tipo non serializzabile: {type(obj).__name__}")
+
+
+# --- DECODER PURO PYTHON ---
+
+class _Reader:
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def take(self, n: int) -> memoryview:
+        end = self.pos + n
+        if end > len(self.data):
+            raise ValueError("Frame msgpack troncato")
+        chunk = self.data[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def unpack(self, fmt: str, size: int):
+        return struct.unpack(fmt, self.take(size))[0]
+
+
+def _unpack(r: _Reader) -> Any:
+    b = r.take(1)[0]
+    if b < 0x80:
+        return b
+    if b >= 0xE0:
+        return b - 0x100
+    if 0xA0 <= b <= 0xBF:
+        return str(r.take(b & 0x1F), "utf-8")
+    if 0x90 <= b <= 0x9F:
+        return [_unpack(r) for _ in range(b & 0x0F)]
+    if 0x80 <= b <= 0x8F:
+        return _unpack_map(r, b & 0x0F)
+    if b == 0xC0:
+        return None
+    if b == 0xC2:
+        return False
+    if b == 0xC3:
+        return True
+    if b == 0xCC:
+        return r.unpack(">B", 1)
+    if b == 0xCD:
+        return r.unpack(">H", 2)
+    if b == 0xCE:
+        return r.unpack(">I", 4)
+    if b == 0xCF:
+        return r.unpack(">Q", 8)
+    if b == 0xD0:
+        return r.unpack(">b", 1)
+    if b == 0xD1:
+        return r.unpack(">h", 2)
+    if b == 0xD2:
+        return r.unpack(">i", 4)
+    if b == 0xD3:
+        return r.unpack(">q", 8)
+    if b == 0xCA:
+        return r.unpack(">f", 4)
+    if b == 0xCB:
+        return r.unpack(">d", 8)
+    if b in (0xD9, 0xDA, 0xDB):
+        n = r.unpack({0xD9: ">B", 0xDA: ">H", 0xDB: ">I"}[b], {0xD9: 1, 0xDA: 2, 0xDB: 4}[b])
+        return str(r.take(n), "utf-8")
+    if b in (0xC4, 0xC5, 0xC6):
+        n = r.unpack({0xC4: ">B", 0xC5: ">H", 0xC6: ">I"}[b], {0xC4: 1, 0xC5: 2, 0xC6: 4}[b])
+        return bytes(r.take(n))
+    if b in (0xDC, 0xDD):
+        n = r.unpack(">H", 2) if b == 0xDC else r.unpack(">I", 4)
+        return [_unpack(r) for _ in range(n)]
+    if b in (0xDE, 0xDF):
+        n = r.unpack(">H", 2) if b == 0xDE else r.unpack(">I", 4)
+        return _unpack_map(r, n)
+    raise ValueError(f"Tipo msgpack non supportato: 0x{b:02x}")
+
+
+def _unpack_map(r: _Reader, n: int) -> dict:
+    result = {}
+    for _ in range(n):
+        key = _unpack(r)
+        result[key] = _unpack(r)
+    return result
+
+
+def packb(obj: Any) -> bytes:
+    if _msgpack is not None:
+        return _msgpack.packb(obj, use_bin_type=True)
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+def unpackb(data: bytes) -> Any:
+    if _msgpack is not None:
+        return _msgpack.unpackb(data, raw=False, strict_map_key=False)
+    r = _Reader(data)
+    obj = _unpack(r)
+    if r.pos != len(r.data):
+        raise ValueError("Byte in eccesso dopo l'oggetto msgpack")
+    return obj
+
+
+# --- COMPATTAZIONE DEGLI EVENTI ---
+# Sul canale binario firma, chiave e ID viaggiano come byte grezzi invece che come
+# testo base64/PEM/hex. La conversione avviene solo se è reversibile al byte
+# (la stringa PEM fa parte del payload firmato e deve tornare identica).
+
+_PEM_HEADER = "-----BEGIN PUBLIC KEY-----\n"
+_PEM_FOOTER = "-----END PUBLIC KEY-----\n"
+
+# I reporter sono pochi rispetto agli eventi: le conversioni di chiave si fanno una volta sola
+_KEY_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=_KEY_CACHE_SIZE)
+def _der_to_pem(der: bytes) -> str:
+    b64 = base64.b64encode(der).decode()
+    lines = [b64[i:i + 64] for i in range(0, len(b64), 64)]
+    return _PEM_HEADER + "\n".join(lines) + "\n" + _PEM_FOOTER
+
+
+@lru_cache(maxsize=_KEY_CACHE_SIZE)
+def _pem_to_der(pem: str) -> Optional[bytes]:
+    if not (pem.startswith(_PEM_HEADER) and pem.endswith(_PEM_FOOTER)):
+        return None
+    try:
+        der = base64.b64decode(pem[len(_PEM_HEADER):-len(_PEM_FOOTER)], validate=False)
+    except Exception:
+        return None
+    return der if _der_to_pem(der) == pem else None
+
+
+def _b64_to_raw(value: str) -> Optional[bytes]:
+    try:
+        raw = base64.b64decode(value, validate=True)
+    except Exception:
+        return None
+    return raw if base64.b64encode(raw).decode() == value else None
+
+
+def _hex_to_raw(value: str) -> Optional[bytes]:
+    try:
+        raw = bytes.fromhex(value)
+    except ValueError:
+        return None
+    return raw if raw.hex() == value else None
+
+
+def compact_id(value):
+    """ID esadecimale (es. sha256 degli eventi) -> byte grezzi; gli altri ID restano invariati."""
+    raw = _hex_to_raw(value) if isinstance(value, str) else None
+    return value if raw is None else raw
+
+
+def expand_id(value):
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def compact_event(event: dict) -> dict:
+    """Sostituisce signature, reporter_pubkey e id con byte grezzi quando reversibile."""
+    out = dict(event)
+    for field, convert in (("signature", _b64_to_raw), ("reporter_pubkey", _pem_to_der), ("id", _hex_to_raw)):
+        value = out.get(field)
+        if isinstance(value, str):
+            raw = convert(value)
+            if raw is not None:
+                out[field] = raw
+    return out
+
+
+def expand_event(event: dict) -> dict:
+    """Inverso di compact_event: i campi bytes tornano alla forma testuale originale."""
+    out = dict(event)
+    if isinstance(out.get("signature"), bytes):
+        out["signature"] = base64.b64encode(out["signature"]).decode()
+    if isinstance(out.get("reporter_pubkey"), bytes):
+        out["reporter_pubkey"] = _der_to_pem(out["reporter_pubkey"])
+    if "id" in out:
+        out["id"] = expand_id(out["id"])
+    return out
+
+
+def compact_batch(payload: dict) -> dict:
+    """compact_event applicato a ogni evento di un payload events_batch."""
+    events = payload.get("events")
+    if not isinstance(events, list):
+        return payload
+    return {**payload, "events": [compact_event(e) if isinstance(e, dict) else e for e in events]}
+
+
+def expand_batch(payload: dict) -> dict:
+    events = payload.get("events")
+    if not isinstance(events, list):
+        return payload
+    return {**payload, "events": [expand_event(e) if isinstance(e, dict) else e for e in events]}
+
+
+def compact_ids(payload: dict) -> dict:
+    """Payload inv/getdata: gli ID esadecimali viaggiano come byte grezzi."""
+    ids = payload.get("ids")
+    if not isinstance(ids, list):
+        return payload
+    return {**payload, "ids": [compact_id(i) for i in ids]}
+
+
+def expand_ids(payload: dict) -> dict:
+    ids = payload.get("ids")
+    if not isinstance(ids, list):
+        return payload
+    return {**payload, "ids": [expand_id(i) for i in ids]}
@@ -0,0 +1,218 @@
+import os
+import socket
+import threading
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from cyphermesh.core.protocol import FrameReader, FrameTooLargeError, decode_message, encode_message
+from cyphermesh.config import MAX_FRAME_SIZE
+from cyphermesh.logger import logger
+
+# Richieste inviate senza aspettare la risposta (ControlClient.pipeline). Limitate perché
+# le risposte non lette non riempiano i buffer del socket (client e server bloccati in send)
+PIPELINE_WINDOW = 64
+
+# Handler di un tipo di richiesta: payload -> payload della risposta
+Handler = Callable[[dict], dict]
+
+
+class ControlError(Exception):
+    """Il nodo ha risposto con un errore, o la connessione di controllo si è chiusa."""
+
+
+def control_available(path) -> bool:
+    """True se la piattaforma ha i socket Unix e il percorso è configurato."""
+    return hasattr(socket, "AF_UNIX") and bool(path) and str(path).lower() != "none"
+
+
+class ControlServer:
+    """
+    Socket Unix locale (permessi 0600) per i processi sulla stessa macchina, es.
+    cyphermesh-ingest. Stesso framing della rete (header di lunghezza + JSON), un thread
+    per client. Le richieste vengono eseguite in ordine di arrivo e ogni risposta
+    ("ok" o "error") riporta l'id della richiesta: un client può mandarne molte di fila
+    senza aspettare (pipelining), e le risposte già pronte partono con una sola scrittura.
+    """
+
+    def __init__(self, path, handlers: Dict[str, Handler], max_frame_size: int = MAX_FRAME_SIZE):
+        self.path = str(path)
+        self.handlers = handlers
+        self.max_frame_size = max_frame_size
+        self._sock: Optional[socket.socket] = None
+        self._clients = set()
+        self._lock = threading.Lock()
+
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+
+    def start(self):
+        if self._sock is not None:
+            return
+        self._remove_stale_socket()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Il socket nasce già accessibile solo al proprietario (come le chiavi)
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        sock.listen(16)
+        self._sock = sock
+        threading.Thread(target=self._accept_loop, name="control-accept", daemon=True).start()
+        logger.info(f"[CONTROL] In ascolto su {self.path}")
+
+    def stop(self):
+        sock, self._sock = self._sock, None
+        if sock is None:
+            return
+        try:
+            # shutdown sveglia il thread fermo in accept() (la sola close non basta su Linux)
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            sock.close()
+        except OSError:
+            pass
+        with self._lock:
+            clients = list(self._clients)
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "path": self.path,
+                "clients": len(self._clients),
+                "connections": self.connections,
+                "requests": self.requests,
+                "errors": self.errors,
+            }
+
+    # --- INTERNI ---
+
+    def _remove_stale_socket(self):
+        """Un socket rimasto da un nodo terminato male si rimuove; uno in uso no."""
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)
+        else:
+            raise RuntimeError(f"Socket di controllo già in uso: {self.path}")
+        finally:
+            probe.close()
+
+    def _accept_loop(self):
+        while self._sock is not None:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            with self._lock:
+                self._clients.add(conn)
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), name="control-client", daemon=True).start()
+
+    def _serve(self, conn: socket.socket):
+        reader = FrameReader(conn, max_frame_size=self.max_frame_size)
+        try:
+            while True:
+                body = reader.read_frame()
+                if body is None:
+                    break
+                replies = [self._reply(body)]
+                # Le richieste già nel buffer (pipelining) si rispondono con una sola sendall
+                body = reader.next_frame()
+                while body is not None:
+                    replies.append(self._reply(body))
+                    body = reader.next_frame()
+                conn.sendall(b"".join(replies))
+        except (FrameTooLargeError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._clients.discard(conn)
+            conn.close()
+
+    def _reply(self, body) -> bytes:
+        message = decode_message(body)
+        message = message if isinstance(message, dict) else None
+        msg_id = message.get("id") if message else None
+        handler = self.handlers.get(message.get("type")) if message else None
+        with self._lock:
+            self.requests += 1
+        try:
+            if handler is None:
+                raise ControlError(f"richiesta non valida: {message.get('type') if message else None}")
+            payload = message.get("payload")
+            return encode_message("ok", handler(payload if isinstance(payload, dict) else {}), msg_id=msg_id)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            return encode_message("error", {"error": str(e)}, msg_id=msg_id)
+
+
+class ControlClient:
+    """
+    Client del socket di controllo di un nodo in esecuzione (bloccante, un solo thread).
+    `call` manda una richiesta e aspetta la risposta; `pipeline` ne tiene in volo fino a
+    `window` alla volta e restituisce le risposte nello stesso ordine.
+    """
+
+    def __init__(self, path, timeout: Optional[float] = 30.0):
+        self.path = str(path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(self.path)
+        except OSError:
+            self._sock.close()
+            raise
+        self._reader = FrameReader(self._sock)
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def call(self, msg_type: str, payload: dict = None) -> dict:
+        return next(self.pipeline([(msg_type, payload)]))
+
+    def pipeline(self, requests: Iterable[Tuple[str, Optional[dict]]],
+                 window: int = PIPELINE_WINDOW) -> Iterator[dict]:
+        """Invia le richieste senza aspettare le singole risposte (al più `window` in volo)."""
+        in_flight = 0
+        for msg_type, payload in requests:
+            self._sock.sendall(encode_message(msg_type, payload))
+            in_flight += 1
+            if in_flight >= max(1, window):
+                in_flight -= 1
+                yield self._receive()
+        while in_flight:
+            in_flight -= 1
+            yield self._receive()
+
+    def _receive(self) -> dict:
+        body = self._reader.read_frame()
+        message = decode_message(body) if body is not None else None
+        if not isinstance(message, dict):
+            raise ControlError("connessione di controllo chiusa")
+        payload = message.get("payload") or {}
+        if message.get("type") != "ok":
+            raise ControlError(payload.get("error", "errore sconosciuto"))
+        return payload
+
@@ -0,0 +1,234 @@
+import heapq
+import json
+import random
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cyphermesh.core.overlay import Addr
+from cyphermesh.core.ratelimit import TokenBucket
+
+UDP_BROADCAST_PORT = 9999
+
+# Un node_id già visto non fa partire un'altra connessione per SEEN_TTL_S secondi
+SEEN_TTL_S = 60.0
+# Sorgenti tenute in memoria per il rate limit (oltre si scartano quelle più vecchie)
+MAX_SOURCES = 4096
+
+
+def make_listener(port: int = UDP_BROADCAST_PORT) -> socket.socket:
+    """Socket in ascolto sulla porta di discovery, condivisibile tra più processi sullo stesso host."""
+    udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        # Su alcuni OS (Linux/Mac) serve SO_REUSEPORT per far ascoltare più processi sulla stessa porta
+        udp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    except AttributeError:
+        pass
+    udp_sock.bind(('', port))
+    return udp_sock
+
+
+def make_sender() -> socket.socket:
+    """
+    Socket su porta effimera, aperto una volta sola: manda i PING in broadcast e i PONG
+    in unicast, e riceve i PONG di risposta ai propri PING (sulla porta condivisa un
+    unicast arriverebbe a uno solo dei processi in ascolto).
+    """
+    udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    udp_sock.bind(('', 0))
+    return udp_sock
+
+
+class Discovery:
+    """
+    Discovery UDP sulla LAN, senza tempeste di PONG.
+
+    - Il PING parte in broadcast; chi lo riceve risponde con un PONG unicast all'indirizzo
+      di origine, dopo un ritardo casuale (fino a `reply_jitter_s`), invece di un broadcast
+      che ogni nodo trasformerebbe in una connessione: N nodi non fanno più N² tentativi.
+    - Solo chi ha mandato il PING si connette (ai PONG); chi riceve un PING si annota
+      l'indirizzo come candidato (`on_seen`).
+    - Finché il nodo è isolato il PING si ripete con backoff esponenziale e jitter.
+    - Ogni sorgente (ip, porta) ha un token bucket (`source_rate` pacchetti/s); i node_id
+      già visti negli ultimi SEEN_TTL_S secondi non fanno ripartire la connessione.
+
+    Nessun I/O diretto: il nodo passa i datagrammi a `on_datagram()` e chiama `poll()`,
+    che invia risposte e PING scaduti tramite `send(data, addr)` (addr None = broadcast).
+    I nodi che non annunciano `unicast` nel PING ricevono un PONG in broadcast, come prima.
+    """
+
+    def __init__(self, node_id: str, tcp_port: int, send: Callable[[bytes, Optional[Addr]], None],
+                 on_peer: Callable[[str, int], None], on_seen: Callable[[str, int], None] = None,
+                 reply_jitter_s: float = 0.2, backoff_min_s: float = 2.0, backoff_max_s: float = 300.0,
+                 source_rate: float = 2.0, source_burst: float = 5.0, seen_ttl_s: float = SEEN_TTL_S,
+                 rng: Optional[random.Random] = None):
+        self.node_id = node_id
+        self.tcp_port = tcp_port
+        self.send = send
+        self.on_peer = on_peer
+        self.on_seen = on_seen or (lambda host, port: None)
+        self.reply_jitter_s = max(0.0, reply_jitter_s)
+        self.backoff_min_s = max(0.1, backoff_min_s)
+        self.backoff_max_s = max(self.backoff_min_s, backoff_max_s)
+        self.source_rate = source_rate
+        self.source_burst = source_burst
+        self.seen_ttl_s = seen_ttl_s
+        self.rng = rng or random.Random()
+
+        self._lock = threading.Lock()
+        self._sources: Dict[Addr, TokenBucket] = {}
+        self._seen: Dict[Tuple[str, str], float] = {}
+        self._replies: List[Tuple[float, int, Addr, bool]] = []
+        self._reply_seq = 0
+        self._attempt = 0
+        self._next_ping = time.monotonic()
+
+        self.pings_sent = 0
+        self.pongs_sent = 0
+        self.received = 0
+        self.rate_limited = 0
+        self.seen_skipped = 0
+        self.peers_found = 0
+        self.errors = 0
+
+    # --- ricezione ---
+
+    def on_datagram(self, data: bytes, addr: Addr):
+        try:
+            message = json.loads(data.decode())
+        except Exception:
+            return
+        if not isinstance(message, dict):
+            return
+        node_id = message.get("node_id")
+        tcp_port = message.get("tcp_port")
+        # Ignora i propri messaggi (echo) e quelli malformati
+        if node_id == self.node_id or not isinstance(node_id, str):
+            return
+        if not isinstance(tcp_port, int) or not 0 < tcp_port < 65536:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            self.received += 1
+            if not self._allow(addr):
+                self.rate_limited += 1
+                return
+
+            msg_type = message.get("type")
+            if msg_type not in ("PING", "PONG"):
+                return
+            if msg_type == "PING":
+                # Risposta (unicast se il mittente la sa ricevere) dopo un ritardo casuale
+                unicast = bool(message.get("unicast"))
+                due = now + self.rng.uniform(0, self.reply_jitter_s)
+                self._reply_seq += 1
+                heapq.heappush(self._replies, (due, self._reply_seq, addr, unicast))
+            fresh = self._mark_seen((node_id, msg_type), now)
+            if fresh and msg_type == "PONG":
+                self.peers_found += 1
+            if not fresh:
+                self.seen_skipped += 1
+
+        if fresh:
+            if msg_type == "PONG":
+                self.on_peer(addr[0], tcp_port)
+            else:
+                self.on_seen(addr[0], tcp_port)
+
+    def _allow(self, source: Addr) -> bool:
+        """Da chiamare con il lock preso."""
+        bucket = self._sources.get(source)
+        if bucket is None:
+            if len(self._sources) >= MAX_SOURCES:
+                self._sources.pop(next(iter(self._sources)))
+            bucket = self._sources[source] = TokenBucket(self.source_rate, burst=self.source_burst)
+        return bucket.try_consume()
+
+    def _mark_seen(self, key: Tuple[str, str], now: float) -> bool:
+        """True se (node_id, tipo) non era stato visto negli ultimi seen_ttl_s secondi."""
+        if len(self._seen) > MAX_SOURCES:
+            self._seen = {k: t for k, t in self._seen.items() if t > now}
+        if self._seen.get(key, 0) > now:
+            return False
+        self._seen[key] = now + self.seen_ttl_s
+        return True
+
+    # --- invio ---
+
+    def _message(self, msg_type: str) -> bytes:
+        message = {"type": msg_type, "node_id": self.node_id, "tcp_port": self.tcp_port}
+        if msg_type == "PING":
+            message["unicast"] = True
+        return json.dumps(message).encode()
+
+    def _send(self, data: bytes, addr: Optional[Addr]) -> bool:
+        try:
+            self.send(data, addr)
+            return True
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            return False
+
+    def ping(self):
+        """PING in broadcast subito (avvio, o su richiesta)."""
+        if self._send(self._message("PING"), None):
+            with self._lock:
+                self.pings_sent += 1
+
+    def poll(self, alone: bool) -> float:
+        """
+        Invia i PONG in attesa e, se il nodo è isolato, il PING quando scade il backoff.
+        Restituisce i secondi che mancano alla prossima scadenza.
+        """
+        now = time.monotonic()
+        due: List[Tuple[Addr, bool]] = []
+        with self._lock:
+            while self._replies and self._replies[0][0] <= now:
+                _, _, addr, unicast = heapq.heappop(self._replies)
+                due.append((addr, unicast))
+        if due:
+            pong = self._message("PONG")
+            for addr, unicast in due:
+                if self._send(pong, addr if unicast else None):
+                    with self._lock:
+                        self.pongs_sent += 1
+
+        with self._lock:
+            if not alone:
+                # Connessi: il prossimo giro di PING (se restiamo soli) riparte dal backoff minimo
+                self._attempt = 0
+                self._next_ping = now + self.backoff_min_s
+                send_ping = False
+            else:
+                send_ping = now >= self._next_ping
+                if send_ping:
+                    delay = min(self.backoff_max_s, self.backoff_min_s * 2 ** self._attempt)
+                    self._attempt = min(self._attempt + 1, 32)
+                    self._next_ping = now + self.rng.uniform(delay / 2, delay)
+        if send_ping:
+            self.ping()
+
+        with self._lock:
+            deadlines = [self._next_ping] if alone else []
+            if self._replies:
+                deadlines.append(self._replies[0][0])
+        return max(0.0, min(deadlines) - now) if deadlines else self.backoff_min_s
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pings_sent": self.pings_sent,
+                "pongs_sent": self.pongs_sent,
+                "received": self.received,
+                "rate_limited": self.rate_limited,
+                "seen_skipped": self.seen_skipped,
+                "peers_found": self.peers_found,
+                "pending_replies": len(self._replies),
+                "backoff_attempt": self._attempt,
+                "errors": self.errors,
+            }
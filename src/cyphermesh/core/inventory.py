@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# Peer alternativi ricordati per ogni ID in richiesta, oltre a quello a cui l'abbiamo chiesto
+MAX_ANNOUNCERS = 4
+
+
+class _Request:
+    """Un ID chiesto con getdata: a chi, fino a quando, e chi altro ce l'ha annunciato."""
+
+    __slots__ = ("peer", "deadline", "announcers")
+
+    def __init__(self, peer: Any, deadline: float):
+        self.peer = peer
+        self.deadline = deadline
+        self.announcers: List[Any] = []
+
+
+class Inventory:
+    """
+    Stato del gossip annuncio/richiesta (inv/getdata):
+
+    - i body degli eventi accettati di recente, per servire i getdata senza toccare il DB;
+    - gli ID già chiesti a un peer e non ancora arrivati, così lo stesso evento annunciato
+      da più vicini viene richiesto una volta sola. Gli altri vicini che lo annunciano
+      (al massimo MAX_ANNOUNCERS) restano in lista: se il getdata non ha risposta entro
+      `request_timeout`, `due` lo ripassa al prossimo. Le richieste in sospeso sono al
+      massimo `max_pending`: oltre, gli ID nuovi si ignorano (li recupera l'anti-entropy).
+    """
+
+    def __init__(self, size: int = 10_000, request_timeout: float = 5.0, max_pending: int = 0):
+        self.size = max(1, size)
+        self.request_timeout = request_timeout
+        self.max_pending = max(1, max_pending or size)
+        self._bodies: "OrderedDict[str, dict]" = OrderedDict()
+        self._requested: Dict[str, _Request] = {}
+        self._lock = threading.Lock()
+
+        self.announced = 0    # ID ricevuti negli inv
+        self.requested = 0    # ID chiesti con getdata
+        self.retried = 0      # ID richiesti di nuovo a un altro peer dopo il timeout
+        self.dropped = 0      # ID ignorati perché le richieste in sospeso erano al limite
+        self.served = 0       # Body inviati in risposta ai getdata
+        self.served_from_db = 0
+
+    def remember(self, event_id: str, payload: dict):
+        with self._lock:
+            self._bodies[event_id] = payload
+            self._bodies.move_to_end(event_id)
+            if len(self._bodies) > self.size:
+                self._bodies.popitem(last=False)
+
+    def lookup(self, event_ids: Iterable[str]) -> Tuple[List[dict], List[str]]:
+        """Restituisce (body trovati in memoria, ID mancanti)."""
+        found, missing = [], []
+        with self._lock:
+            for event_id in event_ids:
+                payload = self._bodies.get(event_id)
+                if payload is None:
+                    missing.append(event_id)
+                else:
+                    found.append(payload)
+        return found, missing
+
+    def want(self, peer: Any, event_ids: Iterable[str], is_known: Callable[[str], bool]) -> List[str]:
+        """
+        Filtra gli ID annunciati da `peer`: restano quelli sconosciuti e non già in richiesta,
+        che vengono segnati come chiesti a lui. Per gli ID già in richiesta a un altro peer,
+        `peer` finisce tra gli annunciatori da provare se quella richiesta scade.
+        """
+        now = time.monotonic()
+        candidates = []
+        with self._lock:
+            for event_id in event_ids:
+                self.announced += 1
+                request = self._requested.get(event_id)
+                if request is not None:
+                    if request.deadline > now:
+                        if (request.peer is not peer and peer not in request.announcers
+                                and len(request.announcers) < MAX_ANNOUNCERS):
+                            request.announcers.append(peer)
+                        continue
+                    # Richiesta scaduta: la rifacciamo a chi l'ha appena annunciato
+                    request.peer = peer
+                    request.deadline = now + self.request_timeout
+                else:
+                    if len(self._requested) >= self.max_pending:
+                        self._expire(now)
+                        if len(self._requested) >= self.max_pending:
+                            self.dropped += 1
+                            continue
+                    # Prenotato subito: un altro peer che annuncia lo stesso ID non lo richiede
+                    self._requested[event_id] = _Request(peer, now + self.request_timeout)
+                candidates.append(event_id)
+
+        # La verifica sullo store (cache/DB) avviene fuori dal lock
+        wanted, known = [], []
+        for event_id in candidates:
+            (known if is_known(event_id) else wanted).append(event_id)
+
+        with self._lock:
+            for event_id in known:
+                self._requested.pop(event_id, None)
+            self.requested += len(wanted)
+        return wanted
+
+    def due(self, is_alive: Callable[[Any], bool]) -> List[Tuple[Any, List[str]]]:
+        """
+        Richieste scadute senza risposta: ciascuna passa al prossimo annunciatore ancora
+        connesso. Restituisce [(peer, ID da richiedergli)]; gli ID senza alternative si dimenticano.
+        """
+        now = time.monotonic()
+        retries: Dict[Any, List[str]] = {}
+        with self._lock:
+            for event_id, request in list(self._requested.items()):
+                if request.deadline > now:
+                    continue
+                peer = None
+                while request.announcers:
+                    candidate = request.announcers.pop(0)
+                    if is_alive(candidate):
+                        peer = candidate
+                        break
+                if peer is None:
+                    del self._requested[event_id]
+                    continue
+                request.peer = peer
+                request.deadline = now + self.request_timeout
+                retries.setdefault(peer, []).append(event_id)
+                self.retried += 1
+        return list(retries.items())
+
+    def received(self, event_id: str):
+        with self._lock:
+            self._requested.pop(event_id, None)
+
+    def record_served(self, from_memory: int, from_db: int):
+        with self._lock:
+            self.served += from_memory + from_db
+            self.served_from_db += from_db
+
+    def _expire(self, now: float):
+        """Da chiamare con il lock preso: dimentica le richieste scadute senza alternative."""
+        for event_id in [i for i, r in self._requested.items() if r.deadline <= now and not r.announcers]:
+            del self._requested[event_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "bodies": len(self._bodies),
+                "pending_requests": len(self._requested),
+                "announced": self.announced,
+                "requested": self.requested,
+                "retried": self.retried,
+                "dropped": self.dropped,
+                "served": self.served,
+                "served_from_db": self.served_from_db,
+            }
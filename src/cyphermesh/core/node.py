@@ -1,22 +1,89 @@
+import ipaddress
+import select
 import socket
 import threading
 import logging
+import random
 import time
-import json
 import uuid
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set
 
 # Importiamo il modello
-from cyphermesh.models import ThreatEvent
+from cyphermesh.models import ThreatEvent, valid_timestamp
 # Importiamo le funzioni robuste per il framing TCP
-from cyphermesh.core.protocol import send_message, receive_message
+from cyphermesh.core.protocol import FrameReader, FrameTooLargeError
+from cyphermesh.config import MAX_FRAME_SIZE, RECV_BUFFER_SIZE
+# Encoding dei frame negoziato con l'handshake (binario se il peer lo supporta)
+from cyphermesh.core.protocol import FrameSet, advertised_encodings, negotiate_encoding, ENCODING_JSON
+from cyphermesh.config import WIRE_ENCODING
+# Compressione zlib in streaming per connessione, se entrambi la annunciano
+from cyphermesh.core.protocol import Deflater, FEATURE_ZLIB
+from cyphermesh.config import WIRE_COMPRESSION, WIRE_COMPRESSION_LEVEL
+# Coalescenza del gossip in uscita (events_batch)
+from cyphermesh.core.protocol import encode_message, SUPPORTED_FEATURES, FEATURE_EVENTS_BATCH
+from cyphermesh.core.protocol import PROTOCOL_VERSION
+# Gossip annuncio/richiesta (inv/getdata)
+from cyphermesh.core.protocol import FEATURE_INV, FEATURE_SYNC, MAX_INV_IDS
+from cyphermesh.core.inventory import Inventory
+from cyphermesh.config import GOSSIP_MODE, INV_CACHE_SIZE, INV_REQUEST_TIMEOUT_S
+# Overlay a grado limitato (viste attiva/passiva) e fanout del gossip
+from cyphermesh.core.overlay import PeerViews, Addr
+from cyphermesh.config import (
+    PEER_TARGET_DEGREE, PEER_MAX_DEGREE, PEER_PASSIVE_SIZE, PEER_SHUFFLE_SIZE, GOSSIP_FANOUT
+)
+from cyphermesh.core.batching import OutboundBatcher, estimate_size
+from cyphermesh.core.sync import AntiEntropy, SyncOrigin
+# Code di uscita per peer, ognuna con il proprio writer
+from cyphermesh.core.outbound import PeerWriter, OVERFLOW_POLICIES
+from cyphermesh.core.peer_table import PeerTable, PeerInfo
+from cyphermesh.config import PEER_SEND_QUEUE_SIZE, PEER_SEND_QUEUE_BYTES, PEER_OVERFLOW_POLICY
+from cyphermesh.config import SYNC_WINDOW_DAYS, SYNC_CHUNK_EVENTS, SYNC_RATE_BYTES, SYNC_PEER_RATE_BYTES
+from cyphermesh.config import GOSSIP_LINGER_MS, GOSSIP_BATCH_MAX_EVENTS, GOSSIP_BATCH_MAX_BYTES
 # Importiamo funzioni DB
-from cyphermesh.db.events import save_event, update_reputation, get_reputation
-from cyphermesh.db.peers import add_or_update_peer, remove_node
-from cyphermesh.db.core import db_cursor
+from cyphermesh.db.events import event_exists, iter_event_ids, get_event_payloads
+from cyphermesh.db.peers import save_peers, remove_node
+from cyphermesh.db.core import init_db, get_pool
+from cyphermesh.db.query import count_events
+# Scrittura su DB delegata a un unico thread con group commit
+from cyphermesh.db.writer import EventWriter
+from cyphermesh.config import DB_WRITE_BATCH_SIZE, DB_WRITE_INTERVAL_MS, DB_WRITE_QUEUE_SIZE, DB_DURABILITY
+# Limiti di ammissione prima della verifica (per IP, connessione e reporter)
+from cyphermesh.core.admission import AdmissionControl
+from cyphermesh.config import (
+    ADMISSION_IP_RATE, ADMISSION_IP_BURST, ADMISSION_PEER_RATE, ADMISSION_PEER_BURST,
+    ADMISSION_REPORTER_RATE, ADMISSION_REPORTER_BURST
+)
+# Reputazione in memoria, scritta a blocchi dal writer
+from cyphermesh.db.reputation import ReputationStore
+from cyphermesh.config import REPUTATION_HALF_LIFE_HOURS, REPUTATION_FLUSH_INTERVAL_S, REPUTATION_MAX_REPORTERS
+# Retention degli eventi vecchi
+from cyphermesh.db.retention import RetentionJob
+from cyphermesh.config import (
+    EVENT_TTL_DAYS, RETENTION_MODE, RETENTION_INTERVAL_S, RETENTION_BATCH_SIZE, RETENTION_VACUUM_PAGES
+)
+# Cache degli eventi già visti (dedup senza accessi al DB)
+from cyphermesh.core.seen import SeenEventCache
+from cyphermesh.config import SEEN_CACHE_SIZE, SEEN_BLOOM_CAPACITY, SEEN_BLOOM_FP_RATE
+# Stage di verifica firme in parallelo
+from cyphermesh.core.verifier import VerificationPool
+from cyphermesh.config import VERIFY_MODE, VERIFY_WORKERS, VERIFY_BATCH_SIZE, VERIFY_QUEUE_SIZE
+# Discovery UDP sulla rete locale (PONG unicast, backoff, rate limit per sorgente)
+from cyphermesh.core.discovery import Discovery, make_listener, make_sender, UDP_BROADCAST_PORT
+from cyphermesh.config import DISCOVERY_REPLY_JITTER_MS, DISCOVERY_BACKOFF_MAX_S, DISCOVERY_SOURCE_RATE
+# Socket di controllo locale (cyphermesh-ingest e altri processi sulla stessa macchina)
+from cyphermesh.core.control import ControlServer, control_available
+from cyphermesh.config import CONTROL_SOCKET
+from cyphermesh.crypto import get_identity
 
-# Costante per la Discovery sulla rete locale
-UDP_BROADCAST_PORT = 9999
+# "push": evento completo a tutti i peer; "inv": solo l'ID, i peer chiedono il body se manca
+GOSSIP_MODES = ("push", "inv")
+
+# Un peer onesto manda un campione di indirizzi ogni ~30s (heartbeat): i "peers" più fitti
+# dalla stessa connessione si ignorano, così un peer non decide a chi ci connettiamo
+PEERS_MIN_INTERVAL_S = 10.0
+# Pausa minima tra due refill: un candidato che accetta e chiude subito non genera un
+# ciclo stretto di riconnessioni (le richieste arrivate nel frattempo diventano un refill solo)
+REFILL_MIN_INTERVAL_S = 1.0
 
 class Node:
     def __init__(self, ip: str, port: int):
@@ -30,8 +97,136 @@ class Node:
         # ID univoco per evitare di rispondere ai propri messaggi UDP
         self.node_id = str(uuid.uuid4())
         
-        self.peers: List[socket.socket] = []
+        # Connessioni attive con il loro stato (indirizzi, encoding, writer, contatori)
+        self.peers = PeerTable()
+        # Indirizzi che portano a noi stessi (scoperti anche dall'handshake: node_id uguale al nostro)
+        self.own_addrs: Set[Addr] = {(ip, port), ("127.0.0.1", port)}
         self.running = False
+        # Refill dell'overlay su un solo thread: le richieste (peer caduti, indirizzi ricevuti)
+        # si sommano in un flag invece di aprire un thread ciascuna
+        self._refill_wanted = threading.Event()
+        self.peers_frames_ignored = 0
+
+        # Encoding annunciati nell'handshake; quello scelto per ciascun peer sta nella PeerTable
+        self.wire_encodings = advertised_encodings(WIRE_ENCODING)
+        # Funzionalità annunciate: la compressione si può spegnere (CYPHER_WIRE_COMPRESSION=none)
+        if WIRE_COMPRESSION not in ("zlib", "none"):
+            raise ValueError(f"Compressione non valida: {WIRE_COMPRESSION}")
+        self.features: Set[str] = {f for f in SUPPORTED_FEATURES
+                                   if f != FEATURE_ZLIB or WIRE_COMPRESSION == "zlib"}
+        self.compression_level = WIRE_COMPRESSION_LEVEL
+
+        # Un writer per peer: il gossip accoda e non resta mai bloccato su un peer lento
+        if PEER_OVERFLOW_POLICY not in OVERFLOW_POLICIES:
+            raise ValueError(f"Politica di overflow non valida: {PEER_OVERFLOW_POLICY}")
+        self.overflow_policy = PEER_OVERFLOW_POLICY
+
+        # Buffer di uscita per peer: gli eventi partono a gruppi (GOSSIP_LINGER_MS = 0 lo disattiva)
+        self.batcher = OutboundBatcher(
+            send=self._send_batch,
+            linger_ms=GOSSIP_LINGER_MS,
+            max_events=GOSSIP_BATCH_MAX_EVENTS,
+            max_bytes=GOSSIP_BATCH_MAX_BYTES,
+        ) if GOSSIP_LINGER_MS > 0 else None
+
+        if GOSSIP_MODE not in GOSSIP_MODES:
+            raise ValueError(f"Modalità di gossip non valida: {GOSSIP_MODE}")
+        self.gossip_mode = GOSSIP_MODE
+        # Body recenti per i getdata e ID già richiesti (serve anche in push: i peer inv ci chiedono i body)
+        self.inventory = Inventory(size=INV_CACHE_SIZE, request_timeout=INV_REQUEST_TIMEOUT_S)
+
+        # Peer sampling: niente full mesh, il grado resta vicino a PEER_TARGET_DEGREE
+        self.views = PeerViews(
+            target_degree=PEER_TARGET_DEGREE,
+            max_degree=PEER_MAX_DEGREE,
+            passive_size=PEER_PASSIVE_SIZE,
+        )
+        self.fanout = GOSSIP_FANOUT
+
+        # Discovery LAN: PING in broadcast solo quando siamo isolati, PONG unicast
+        self.discovery = Discovery(
+            node_id=self.node_id,
+            tcp_port=port,
+            send=self._send_udp,
+            on_peer=self._on_lan_peer,
+            on_seen=self._on_lan_seen,
+            reply_jitter_s=DISCOVERY_REPLY_JITTER_MS / 1000,
+            backoff_max_s=DISCOVERY_BACKOFF_MAX_S,
+            source_rate=DISCOVERY_SOURCE_RATE,
+        )
+        self._udp_sender = None
+
+        # Dedup in memoria: LRU + Bloom filter, il DB viene interrogato solo nei casi ambigui
+        self.seen_events = SeenEventCache(
+            size=SEEN_CACHE_SIZE,
+            bloom_capacity=SEEN_BLOOM_CAPACITY,
+            bloom_fp_rate=SEEN_BLOOM_FP_RATE,
+            fallback=self._event_exists,
+        )
+
+        # Writer unico: eventi e reputazione vengono scritti a blocchi in una transazione
+        self.writer = EventWriter(
+            batch_size=DB_WRITE_BATCH_SIZE,
+            flush_interval_ms=DB_WRITE_INTERVAL_MS,
+            durability=DB_DURABILITY,
+            max_queue=DB_WRITE_QUEUE_SIZE,
+            # Righe che il writer ha dovuto scartare: gli eventi tornano sconosciuti (si possono
+            # ricevere di nuovo), i punteggi tornano da scrivere
+            on_events_failed=self._on_events_not_saved,
+            on_scores_failed=lambda pubkeys: self.reputation.retry(pubkeys),
+        )
+
+        # Ammissione: i flood vengono scartati prima della verifica RSA
+        self.admission = AdmissionControl(
+            reporter_rate=ADMISSION_REPORTER_RATE,
+            reporter_burst=ADMISSION_REPORTER_BURST,
+            peer_rate=ADMISSION_PEER_RATE,
+            peer_burst=ADMISSION_PEER_BURST,
+            ip_rate=ADMISSION_IP_RATE,
+            ip_burst=ADMISSION_IP_BURST,
+        )
+
+        # Reputazione: controllo e aggiornamenti in memoria, scrittura differita sul writer
+        self.reputation = ReputationStore(
+            save=lambda rows: self.writer.save_reputations(rows),
+            half_life_s=REPUTATION_HALF_LIFE_HOURS * 3600,
+            flush_interval_s=REPUTATION_FLUSH_INTERVAL_S,
+            max_entries=REPUTATION_MAX_REPORTERS,
+        )
+
+        # Retention opzionale (EVENT_TTL_DAYS = 0 la disattiva)
+        self.retention = RetentionJob(
+            ttl_seconds=EVENT_TTL_DAYS * 86400,
+            interval_seconds=RETENTION_INTERVAL_S,
+            mode=RETENTION_MODE,
+            batch_size=RETENTION_BATCH_SIZE,
+            vacuum_pages=RETENTION_VACUUM_PAGES,
+        ) if EVENT_TTL_DAYS > 0 else None
+
+        # Anti-entropy: alla connessione recuperiamo gli eventi persi (non oltre la retention)
+        sync_window = min(SYNC_WINDOW_DAYS, EVENT_TTL_DAYS) if EVENT_TTL_DAYS > 0 else SYNC_WINDOW_DAYS
+        self.sync = AntiEntropy(
+            send=self._send_message,
+            is_connected=lambda peer: peer in self.peers,
+            window_days=sync_window,
+            chunk_events=SYNC_CHUNK_EVENTS,
+            rate_bytes=SYNC_RATE_BYTES,
+            peer_rate_bytes=SYNC_PEER_RATE_BYTES,
+        )
+
+        # Verifica firme su pool dedicato: i thread di lettura non restano bloccati
+        self.verifier = VerificationPool(
+            on_verified=self._on_event_verified,
+            on_unverified=self._on_event_unverified,
+            workers=VERIFY_WORKERS,
+            mode=VERIFY_MODE,
+            batch_size=VERIFY_BATCH_SIZE,
+            max_pending=VERIFY_QUEUE_SIZE,
+        )
+
+        # API locale per gli altri processi: invio eventi, peer, metriche (None se non disponibile)
+        self.control = ControlServer(CONTROL_SOCKET, handlers=self._control_handlers()) \
+            if control_available(CONTROL_SOCKET) else None
         
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(f"Node-{port}")
@@ -39,26 +234,24 @@ class Node:
     def start(self):
         """Avvia il nodo, i server TCP/UDP e i thread di manutenzione."""
         self.running = True
-        
+        self._init_services()
+
         # 1. Avvia Server TCP (In ascolto per connessioni stabili)
         server_thread = threading.Thread(target=self._listen_incoming, daemon=True)
         server_thread.start()
         self.logger.info(f"Nodo attivo su TCP {self.ip}:{self.port}")
 
-        # 2. Avvia UDP Discovery Listener (Ascolta "Chi c'è?")
+        # 2. Avvia UDP Discovery (Ascolta "Chi c'è?" e, finché siamo soli, lo chiede)
         udp_thread = threading.Thread(target=self._udp_listener_loop, daemon=True)
         udp_thread.start()
 
         # 3. Avvia Heartbeat Loop (Mantiene vive le connessioni TCP)
         hb_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
         hb_thread.start()
+        threading.Thread(target=self._refill_loop, name="overlay-refill", daemon=True).start()
+        threading.Thread(target=self._inv_retry_loop, name="inv-retry", daemon=True).start()
 
-        # 4. Broadcast Iniziale: "SONO QUI!"
-        # Aspettiamo un attimo che il listener sia su
-        time.sleep(2)
-        self._send_udp_broadcast(msg_type="PING")
-
-        # 5. Loop principale (mantiene vivo il processo)
+        # 4. Loop principale (mantiene vivo il processo)
         try:
             while self.running:
                 time.sleep(1)
@@ -67,39 +260,111 @@ class Node:
 
     def stop(self):
         self.running = False
-        for sock in self.peers:
+        self._refill_wanted.set()
+        for info in self.peers.infos():
+            if info.writer:
+                info.writer.close()
             try:
-                sock.close()
+                info.conn.close()
             except:
                 pass
+        self._flush_peer_table()
+        self._stop_services()
         self.logger.info("Nodo arrestato.")
 
+    def get_metrics(self) -> dict:
+        """Metriche live dei componenti del nodo (cache, verifica, ...)."""
+        return {
+            "peers": len(self.peers),
+            "peer_table": self.peers.stats(),
+            "db_pool": get_pool().stats(),
+            "send_queues": self._peer_send_stats(),
+            "encodings": self._encoding_counts(),
+            "seen_cache": self.seen_events.stats(),
+            "verifier": self.verifier.stats(),
+            "writer": self.writer.stats(),
+            "reputation": self.reputation.stats(),
+            "admission": self.admission.stats(),
+            "batcher": self.batcher.stats() if self.batcher else None,
+            "inventory": self.inventory.stats(),
+            "overlay": {**self.views.stats(), "fanout": self.fanout,
+                        "peers_frames_ignored": self.peers_frames_ignored},
+            "discovery": self.discovery.stats(),
+            "sync": self.sync.stats(),
+            "retention": self.retention.stats() if self.retention else None,
+            "control": self.control.stats() if self.control else None,
+        }
+
+    def _init_services(self):
+        """Inizializza il DB, precarica la cache degli eventi già noti e avvia writer e verifica."""
+        init_db()
+        self.writer.start()
+        try:
+            self.seen_events.warm(iter_event_ids(), rows=count_events())
+            self.logger.info(f"Cache eventi precaricata: {self.seen_events.stats()['size']} ID recenti.")
+        except Exception as e:
+            self.logger.error(f"Errore warm-up cache eventi: {e}")
+        self.reputation.start()
+        if self.batcher:
+            self.batcher.start()
+        self.verifier.start()
+        self.sync.start()
+        if self.retention:
+            self.retention.start()
+        # Per ultimo: gli eventi dal socket di controllo trovano la pipeline già avviata
+        if self.control:
+            try:
+                self.control.start()
+            except Exception as e:
+                self.logger.error(f"Socket di controllo non disponibile: {e}")
+                self.control = None
+
+    def _stop_services(self):
+        """
+        Svuota la pipeline: prima la verifica (che accoda scritture e gossip),
+        poi il buffer di uscita, la reputazione in memoria e infine il flush del writer.
+        Il socket di controllo si chiude per primo: niente nuovi eventi durante lo svuotamento.
+        """
+        if self.control:
+            self.control.stop()
+        if self.retention:
+            self.retention.stop()
+        self.sync.stop()
+        self.verifier.stop()
+        if self.batcher:
+            self.batcher.stop()
+        self.reputation.stop()
+        self.writer.stop()
+        # Ultimo: le connessioni ancora in uso (es. un thread di lettura) si chiudono al rilascio
+        get_pool().close_all()
+
     def connect_to_peer(self, target_host: str, target_port: int):
         """Tenta di stabilire una connessione TCP con un peer scoperto."""
-        # Evitiamo di connetterci a noi stessi (Localhost)
-        if target_host == "127.0.0.1" and target_port == self.port:
+        # Evitiamo di connetterci a noi stessi (Localhost, IP LAN o alias visti nell'handshake)
+        addr = (target_host, target_port)
+        if addr in self.own_addrs:
             return
-        
-        # Evitiamo di connetterci al nostro stesso IP pubblico/LAN
-        if target_host == self.ip and target_port == self.port:
+
+        # Evitiamo duplicati: lookup O(1) nella PeerTable (indirizzi remoti, di ascolto e alias)
+        if self.views.is_active(addr) or self.peers.find(addr):
             return
 
-        # Evitiamo duplicati (controllo semplice basato su socket esistenti)
-        for p in self.peers:
-            try:
-                if p.getpeername() == (target_host, target_port):
-                    return # Già connesso
-            except:
-                pass
+        # Vista attiva piena: l'indirizzo resta tra i candidati
+        if not self.views.has_room(len(self.peers) + self.peers.connecting_count()):
+            self.views.add_passive(addr)
+            return
 
+        # Un solo tentativo alla volta per indirizzo (PONG e shuffle possono arrivare insieme)
+        if not self.peers.reserve(addr):
+            return
         try:
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(5.0) # Timeout breve per la connessione
             sock.connect((target_host, target_port))
             sock.settimeout(None) # Rimettiamo in blocking mode per il loop dati
             
-            self.peers.append(sock)
-            add_or_update_peer(target_host, target_port)
+            self._add_peer(sock, "out", listen_addr=addr)
+            self.views.mark_active(addr)
             
             # Avvia il gestore dedicato per questo peer
             threading.Thread(target=self._handle_peer_connection, args=(sock,), daemon=True).start()
@@ -107,106 +372,311 @@ class Node:
             
         except Exception as e:
             # Silenziamo errori comuni durante la discovery per pulizia log
-            pass
+            self.views.remove_passive(addr)
+        finally:
+            self.peers.release(addr)
+
+    def _on_peer_discovered(self, host: str, port: int):
+        """Indirizzo scoperto (discovery o scambio tra peer): candidato, connesso se c'è posto."""
+        if not port:
+            return
+        self.views.add_passive((host, port))
+        self.connect_to_peer(host, port)
+
+    def _refill_active_view(self):
+        """Promuove candidati dalla vista passiva finché il grado è sotto il target."""
+        for _ in range(self.views.target_degree - len(self.peers)):
+            addr = self.views.pick_candidate()
+            if addr is None:
+                return
+            self.connect_to_peer(*addr)
+
+    def _schedule_refill(self):
+        """La connect può bloccare fino al timeout: il refill lo fa il thread overlay-refill."""
+        self._refill_wanted.set()
+
+    def _refill_loop(self):
+        """Un refill alla volta; le richieste arrivate nel frattempo ne producono uno solo."""
+        while self.running:
+            if not self._refill_wanted.wait(1.0):
+                continue
+            self._refill_wanted.clear()
+            if self.running:
+                self._refill_active_view()
+                time.sleep(REFILL_MIN_INTERVAL_S)
+
+    def _shuffle_peers(self):
+        """Invia a un peer a caso un campione degli indirizzi noti (e il nostro)."""
+        peers = list(self.peers)
+        if not peers:
+            return
+        peer = random.choice(peers)
+        sample = self.views.sample(PEER_SHUFFLE_SIZE) + [(self.ip, self.port)]
+        payload = {"peers": [[host, port] for host, port in sample]}
+        self._send_frame(peer, encode_message("peers", payload, encoding=self._peer_encoding(peer)))
+
+    def _on_peers(self, peer, payload):
+        """
+        Indirizzi ricevuti da un peer: finiscono nella vista passiva.
+        Al più un frame "peers" ogni PEERS_MIN_INTERVAL_S per connessione.
+        """
+        info = self.peers.get(peer)
+        now = time.monotonic()
+        if info is None or now - info.peers_at < PEERS_MIN_INTERVAL_S:
+            self.peers_frames_ignored += 1
+            return
+        info.peers_at = now
+        entries = payload.get("peers") if isinstance(payload, dict) else None
+        addrs = []
+        for entry in (entries or [])[:PEER_PASSIVE_SIZE]:
+            if (isinstance(entry, (list, tuple)) and len(entry) == 2
+                    and isinstance(entry[0], str) and isinstance(entry[1], int)):
+                addrs.append((entry[0], entry[1]))
+        self.views.merge(addrs, own_addrs=self.own_addrs)
+        if self.running and self.views.has_room(len(self.peers)):
+            self._schedule_refill()
 
     def broadcast_event(self, event: ThreatEvent):
         """API Pubblica: Invia un evento generato localmente a tutti i peer."""
-        payload = event.to_json()
         self.logger.info(f"Broadcasting evento locale {event.threat_type}...")
-        
-        for peer in list(self.peers):
-            try:
-                send_message(peer, "event", payload, msg_id=event.id)
-            except Exception:
-                self._remove_peer(peer)
-
-    # --- UDP DISCOVERY SECTION ---
+        # Salviamo l'evento locale: se ci torna indietro via gossip lo scartiamo subito
+        self.seen_events.add(event.id)
+        event.valid_signature = True
+        self.writer.save_event(event)
+        self._gossip_event(event)
 
-    def _udp_listener_loop(self):
-        """Ascolta messaggi broadcast UDP sulla porta 9999."""
-        udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        udp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        try:
-            # Su alcuni OS (Linux/Mac) serve SO_REUSEPORT per far ascoltare più processi sulla stessa porta
-            udp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-        except AttributeError:
-            pass 
-
-        udp_sock.bind(('', UDP_BROADCAST_PORT))
-        self.logger.info(f"UDP Discovery in ascolto su porta {UDP_BROADCAST_PORT}")
+    # --- CONTROL API (socket locale) ---
 
-        while self.running:
+    def submit_events(self, payloads: Iterable[dict]) -> dict:
+        """
+        Eventi generati e firmati da un altro processo locale con la chiave di questo nodo
+        (es. cyphermesh-ingest): come broadcast_event, ma a blocchi e senza log per evento.
+        Si accettano solo eventi con la nostra chiave pubblica, l'ID giusto per il contenuto
+        e una firma che verifica: un client difettoso non deve far girare firme sbagliate a
+        nome nostro (i peer penalizzerebbero la nostra chiave). I duplicati vengono contati.
+        """
+        identity = get_identity()
+        candidates, rejected = [], 0
+        for payload in payloads:
             try:
-                data, addr = udp_sock.recvfrom(1024)
-                message = json.loads(data.decode())
-                
-                # Ignora i propri messaggi (echo)
-                if message.get('node_id') == self.node_id:
-                    continue
+                event = ThreatEvent.from_dict(payload)
+            except Exception:
+                rejected += 1
+                continue
+            if (event.reporter_pubkey != identity.public_pem or event.id != event.content_id()
+                    or event.sig_scheme not in (None, identity.scheme)):
+                rejected += 1
+                continue
+            candidates.append(event)
+        # Firme con la nostra chiave: verifica in blocco (per Ed25519 ri-firma e confronto)
+        checks = identity.verify_many([e.get_canonical_payload() for e in candidates],
+                                      [e.signature for e in candidates])
+        events = [event for event, ok in zip(candidates, checks) if ok]
+        rejected += len(candidates) - len(events)
+        return self._publish_local(events, rejected)
 
-                msg_type = message.get('type')
-                remote_tcp_port = message.get('tcp_port')
-                remote_ip = addr[0] # L'IP da cui arriva il pacchetto UDP
+    def report_events(self, reports: Iterable[dict]) -> dict:
+        """
+        Rilevazioni locali non ancora firmate ({source_ip, threat_type, severity, timestamp
+        opzionale}), es. dalla dashboard: il nodo crea gli eventi e li firma in un blocco solo.
+        """
+        identity = get_identity()
+        events, rejected = [], 0
+        for report in reports:
+            fields = [report.get(k) for k in ("source_ip", "threat_type", "severity")] \
+                if isinstance(report, dict) else [None]
+            if not all(isinstance(f, str) and f for f in fields):
+                rejected += 1
+                continue
+            # Firmiamo con la nostra chiave: solo indirizzi IP veri (come cyphermesh-ingest)
+            try:
+                source_ip = str(ipaddress.ip_address(fields[0].strip()))
+            except ValueError:
+                rejected += 1
+                continue
+            timestamp = report.get("timestamp")
+            if timestamp is not None and not (isinstance(timestamp, str) and valid_timestamp(timestamp)):
+                rejected += 1
+                continue
+            events.append(ThreatEvent.build(
+                source_ip, fields[1], fields[2],
+                timestamp=timestamp,
+                reporter_pubkey=identity.public_pem,
+            ))
+        signatures = identity.sign_many([event.get_canonical_payload() for event in events])
+        for event, signature in zip(events, signatures):
+            event.signature = signature
+            event.sig_scheme = identity.scheme
+        return self._publish_local(events, rejected)
 
-                if msg_type == "PING":
-                    self.logger.debug(f"🔍 Ricevuto PING da {remote_ip}. Rispondo PONG.")
-                    # 1. Rispondi "Ci sono io!"
-                    self._send_udp_broadcast(msg_type="PONG")
-                    # 2. Prova a connetterti a lui (bidirezionale aggressivo)
-                    self.connect_to_peer(remote_ip, remote_tcp_port)
+    def _publish_local(self, events: List[ThreatEvent], rejected: int = 0) -> dict:
+        """Salva e propaga eventi locali già firmati, saltando quelli già visti."""
+        accepted = duplicates = 0
+        for event in events:
+            if self.seen_events.check_and_add(event.id):
+                duplicates += 1
+                continue
+            event.valid_signature = True
+            self.writer.save_event(event)
+            self._gossip_event(event)
+            accepted += 1
+        if accepted:
+            self.logger.info(f"Broadcasting {accepted} eventi locali dal socket di controllo...")
+        return {"accepted": accepted, "duplicates": duplicates, "rejected": rejected}
 
-                elif msg_type == "PONG":
-                    self.logger.debug(f"💡 Ricevuto PONG da {remote_ip}. Mi connetto.")
-                    self.connect_to_peer(remote_ip, remote_tcp_port)
+    def _control_handlers(self) -> dict:
+        """Richieste del socket di controllo: payload -> payload della risposta."""
+        return {
+            # Eventi firmati dal chiamante con la nostra chiave: {"events": [...]} o un evento
+            "submit": lambda payload: self.submit_events(self._control_list(payload, "events")),
+            "event": lambda payload: self.submit_events([payload]),
+            # Rilevazioni da firmare: {"reports": [...]} o una sola
+            "report": lambda payload: self.report_events(
+                self._control_list(payload, "reports") if "reports" in payload else [payload]
+            ),
+            "peers": lambda payload: self.peer_status(),
+            "metrics": lambda payload: self.get_metrics(),
+        }
 
-            except Exception as e:
-                self.logger.error(f"Errore UDP Listener: {e}")
+    @staticmethod
+    def _control_list(payload: dict, key: str) -> list:
+        items = payload.get(key)
+        if not isinstance(items, list):
+            raise ValueError(f"manca la lista '{key}'")
+        return items
 
-    def _send_udp_broadcast(self, msg_type="PING"):
-        """Invia un pacchetto JSON in broadcast sulla rete locale."""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        
-        message = {
-            "type": msg_type,
+    def peer_status(self) -> dict:
+        """Identità del nodo, connessioni attive (PeerTable) e viste dell'overlay."""
+        return {
             "node_id": self.node_id,
-            "tcp_port": self.port # Diciamo agli altri su quale porta TCP ascoltiamo
+            "addr": f"{self.ip}:{self.port}",
+            "peers": self.peers.stats(),
+            "passive": [f"{host}:{port}" for host, port in self.views.passive()],
+            "overlay": self.views.stats(),
         }
-        
+
+    # --- UDP DISCOVERY SECTION ---
+
+    def _udp_listener_loop(self):
+        """
+        Ascolta i broadcast sulla porta 9999 e i PONG sul socket di invio; tra un pacchetto
+        e l'altro la Discovery manda le risposte in attesa e, se siamo soli, il PING.
+        """
+        listener = make_listener(UDP_BROADCAST_PORT)
+        self._udp_sender = make_sender()
+        self.logger.info(f"UDP Discovery in ascolto su porta {UDP_BROADCAST_PORT}")
+        sockets = [listener, self._udp_sender]
+
         try:
-            sock.sendto(json.dumps(message).encode(), ('<broadcast>', UDP_BROADCAST_PORT))
-        except Exception as e:
-            self.logger.error(f"Errore invio UDP Broadcast: {e}")
+            while self.running:
+                timeout = self.discovery.poll(alone=not self.peers)
+                try:
+                    readable, _, _ = select.select(sockets, [], [], min(timeout, 1.0))
+                    for udp_sock in readable:
+                        data, addr = udp_sock.recvfrom(1024)
+                        self.discovery.on_datagram(data, addr)
+                except Exception as e:
+                    self.logger.error(f"Errore UDP Listener: {e}")
         finally:
-            sock.close()
+            listener.close()
+            self._udp_sender.close()
+
+    def _send_udp(self, data: bytes, addr=None):
+        """Invia un datagramma dal socket riutilizzabile (addr None = broadcast sulla LAN)."""
+        self._udp_sender.sendto(data, addr or ('<broadcast>', UDP_BROADCAST_PORT))
+
+    def _on_lan_peer(self, host: str, port: int):
+        """PONG da un nodo nuovo: la connect può bloccare, gira fuori dal thread UDP."""
+        threading.Thread(target=self._on_peer_discovered, args=(host, port), daemon=True).start()
+
+    def _on_lan_seen(self, host: str, port: int):
+        """PING da un nodo: ci connetterà lui, intanto è un candidato per la vista passiva."""
+        if (host, port) not in self.own_addrs:
+            self.views.add_passive((host, port))
 
     # --- END UDP SECTION ---
 
     def _heartbeat_loop(self):
-        """Invia messaggi HELLO o PING UDP periodicamente."""
+        """Invia periodicamente HELLO ai peer e fa la manutenzione dell'overlay."""
         while self.running:
             time.sleep(30)
-            
-            # Se siamo soli, proviamo a urlare di nuovo sulla rete UDP
+            self.logger.debug(f"Metriche: {self.get_metrics()}")
+            self._flush_peer_table()
+            self._check_seen_bloom()
+
+            # Se siamo soli ci pensa la discovery UDP (PING con backoff)
             if not self.peers:
-                self._send_udp_broadcast(msg_type="PING")
                 continue
-            
+
             # Altrimenti manteniamo vive le connessioni TCP esistenti
+            # (il "ping" torna indietro come "pong": ne ricaviamo l'RTT di ciascun peer)
+            frames = FrameSet("HELLO", {"ping": time.monotonic()})
             for peer in list(self.peers):
-                try:
-                    send_message(peer, "HELLO")
-                except Exception:
-                    self._remove_peer(peer)
+                self._send_frame(peer, frames.get(self._peer_encoding(peer)))
+
+            # Manutenzione dell'overlay: scambio di indirizzi e rimpiazzo dei peer caduti
+            self._shuffle_peers()
+            self._refill_active_view()
+
+    def _check_seen_bloom(self):
+        """Bloom filter dei duplicati saturo: lo ricostruisce dal DB in un thread a parte."""
+        if self.seen_events.bloom_saturated:
+            threading.Thread(target=self._rebuild_seen_bloom, name="bloom-rebuild", daemon=True).start()
+
+    def _rebuild_seen_bloom(self):
+        try:
+            rows = count_events()
+            self.seen_events.rebuild_bloom(iter_event_ids(), rows)
+            self.logger.info(f"Bloom filter dei duplicati ricostruito per {rows} eventi.")
+        except Exception as e:
+            self.logger.error(f"Errore ricostruzione Bloom filter: {e}")
+
+    def _on_hello(self, peer, payload):
+        """Keep-alive; risponde ai ping e misura l'RTT dai pong."""
+        if not isinstance(payload, dict):
+            return
+        if "ping" in payload:
+            self._send_message(peer, "HELLO", {"pong": payload["ping"]})
+        elif isinstance(payload.get("pong"), (int, float)):
+            info = self.peers.get(peer)
+            rtt = time.monotonic() - payload["pong"]
+            if info is not None and 0 <= rtt < 60:
+                info.rtt_ms = rtt * 1000
+
+    def _flush_peer_table(self):
+        """Scrive nella tabella peers del DB, in un solo blocco, gli indirizzi visti di recente."""
+        try:
+            save_peers(self.peers.take_dirty())
+        except Exception as e:
+            self.logger.error(f"Errore salvataggio peers: {e}")
 
     def _remove_peer(self, sock):
-        """Rimuove un socket dalla lista e lo chiude in modo sicuro."""
-        if sock in self.peers:
-            self.peers.remove(sock)
+        """Rimuove un socket dalla PeerTable e lo chiude in modo sicuro."""
+        info = self.peers.remove(sock)
+        if info is not None and info.writer:
+            info.writer.close()
+        if self.batcher:
+            self.batcher.discard(sock)
         try:
             sock.close()
         except:
             pass
+        if info is not None:
+            self._on_peer_removed(info)
+
+    def _on_peer_removed(self, info: PeerInfo):
+        """Aggiorna l'overlay dopo la chiusura di una connessione."""
+        self.admission.forget_peer(info.conn)
+        self.sync.forget_peer(info.conn)
+        addr = info.listen_addr if info.direction == "out" else None
+        if addr:
+            self.views.mark_inactive(addr)
+            # Noi stessi o alias di un nodo ancora connesso: non è un candidato
+            if addr in self.own_addrs or self.peers.find(addr):
+                self.views.remove_passive(addr)
+        # Il posto liberato va a un candidato della vista passiva
+        if self.running:
+            self._schedule_refill()
 
     def _listen_incoming(self):
         """Server TCP principale."""
@@ -218,7 +688,10 @@ class Node:
         while self.running:
             try:
                 client_sock, addr = server.accept()
-                self.peers.append(client_sock)
+                if not self.views.accept_incoming(len(self.peers)):
+                    client_sock.close()
+                    continue
+                self._add_peer(client_sock, "in")
                 # self.logger.info(f"Nuova connessione TCP da {addr}")
                 threading.Thread(target=self._handle_peer_connection, args=(client_sock,), daemon=True).start()
             except OSError:
@@ -232,76 +705,390 @@ class Node:
         except:
             pass
 
+        # Buffer di ricezione riutilizzato per tutta la vita della connessione
+        reader = FrameReader(connection, max_frame_size=MAX_FRAME_SIZE, buffer_size=RECV_BUFFER_SIZE)
+        info = self.peers.get(connection)
+
         while self.running:
             try:
                 # 1. RICEZIONE CON FRAMING (Bloccante)
-                message_wrapper = receive_message(connection)
+                message_wrapper = reader.read_message()
                 if message_wrapper is None:
                     break 
 
                 msg_type = message_wrapper.get("type")
                 payload = message_wrapper.get("payload")
+                if info is not None:
+                    info.last_seen = time.time()
+                    info.frames_in += 1
 
                 # 2. Routing messaggi
                 if msg_type == "event":
                     # Passiamo il socket per evitare l'eco nel gossip
+                    if info is not None:
+                        info.events_in += 1
                     self._handle_threat_event(payload, sender_socket=connection)
+                elif msg_type == "events_batch":
+                    events = payload.get("events") or []
+                    if info is not None:
+                        info.events_in += len(events)
+                    self._handle_threat_events(events, sender_socket=connection)
+                elif msg_type == "inv":
+                    self._on_inv(connection, payload.get("ids") or [])
+                elif msg_type == "getdata":
+                    self._on_getdata(connection, payload.get("ids") or [])
+                elif msg_type == "peers":
+                    self._on_peers(connection, payload)
+                elif msg_type == "sync_events":
+                    # Eventi recuperati dall'anti-entropy: stessa pipeline, senza rilancio
+                    if FEATURE_SYNC in self._peer_features(connection):
+                        self._handle_threat_events(payload.get("events") or [], sender_socket=SyncOrigin(connection))
+                elif msg_type in ("sync_digest", "sync_ids", "sync_pull"):
+                    self._on_sync_frame(connection, msg_type, payload)
+                elif msg_type == "handshake":
+                    self._on_handshake(connection, payload)
                 elif msg_type == "HELLO":
-                    pass # Keep-alive, non serve logica
+                    self._on_hello(connection, payload)
+            except FrameTooLargeError as e:
+                self.logger.warning(f"Peer {addr} disconnesso: {e}")
+                break
             except Exception:
                 break
         
         self._remove_peer(connection)
 
+    def _add_peer(self, sock: socket.socket, direction: str, listen_addr: Addr = None):
+        """Registra un socket connesso e il suo writer; l'handshake è il primo frame in coda."""
+        try:
+            remote = sock.getpeername()[:2]
+        except OSError:
+            remote = None
+        writer = PeerWriter(
+            sock,
+            on_error=self._remove_peer,
+            max_frames=PEER_SEND_QUEUE_SIZE,
+            max_bytes=PEER_SEND_QUEUE_BYTES,
+            name=f"peer-writer-{sock.fileno()}",
+        )
+        # Handshake: annunciamo encoding e funzionalità supportate. Va sempre in JSON;
+        # i nodi che non lo conoscono lo ignorano e restano su JSON ed eventi singoli.
+        writer.enqueue(encode_message("handshake", self._handshake_payload()))
+        self.peers.add(PeerInfo(conn=sock, addr=remote, direction=direction,
+                                listen_addr=listen_addr, writer=writer))
+        writer.start()
+
+    def _peer_send_stats(self) -> Dict[str, dict]:
+        """Profondità della coda, byte inviati e tempo di stallo per ciascun peer."""
+        stats = {}
+        for info in self.peers.infos():
+            if info.writer is None:
+                continue
+            label = f"{info.addr[0]}:{info.addr[1]}" if info.addr else f"fd-{info.conn.fileno()}"
+            stats[label] = info.writer.stats()
+        return stats
+
+    def _on_send_overflow(self, peer):
+        """Coda di uscita piena: il frame è già stato scartato, con "disconnect" salta anche il peer."""
+        if self.overflow_policy == "disconnect":
+            self.logger.warning("Peer troppo lento (coda di uscita piena): disconnesso.")
+            self._remove_peer(peer)
+
+    def _handshake_payload(self) -> dict:
+        return {
+            "node_id": self.node_id,
+            "port": self.port,
+            "version": PROTOCOL_VERSION,
+            "encodings": self.wire_encodings,
+            "features": sorted(self.features),
+        }
+
+    def _on_sync_frame(self, peer, msg_type: str, payload):
+        """
+        Frame di controllo dell'anti-entropy, solo dai peer che l'hanno negoziato nell'handshake.
+        Il digest è accettato una volta per connessione (AntiEntropy.on_digest); sync_ids e
+        sync_pull interrogano il DB e costano un token dei bucket di ammissione del peer.
+        """
+        if FEATURE_SYNC not in self._peer_features(peer):
+            return
+        if msg_type == "sync_digest":
+            self.sync.on_digest(peer, payload)
+            return
+        if not self.admission.admit_frame(peer, self._peer_ip(peer)):
+            return
+        ids = payload.get("ids") if isinstance(payload, dict) else None
+        handler = self.sync.on_ids if msg_type == "sync_ids" else self.sync.on_pull
+        handler(peer, ids or [])
+
+    def _on_handshake(self, peer, payload):
+        """
+        Identità e capacità del peer: node_id, porta di ascolto, versione, encoding e
+        funzionalità in comune. Le connessioni duplicate verso lo stesso node_id vengono chiuse.
+        """
+        if not isinstance(payload, dict):
+            payload = {}
+        info = self.peers.get(peer)
+        if info is None:
+            return
+        version = payload.get("version")
+        info.version = version if isinstance(version, int) else None
+
+        node_id = payload.get("node_id")
+        if isinstance(node_id, str):
+            if node_id == self.node_id:
+                # Ci siamo connessi a noi stessi tramite un altro indirizzo
+                if info.listen_addr:
+                    self.own_addrs.add(info.listen_addr)
+                self._remove_peer(peer)
+                return
+            port = payload.get("port")
+            listen_addr = (info.addr[0], port) if isinstance(port, int) and info.addr else None
+            existing = self.peers.set_identity(peer, node_id=node_id, listen_addr=listen_addr)
+            if existing is not None and not self._resolve_duplicate(existing, info):
+                return
+
+        encoding = negotiate_encoding(payload.get("encodings") or (), self.wire_encodings)
+        features = set(payload.get("features") or ()) & self.features
+        self._set_peer_protocol(peer, encoding, features)
+        self.logger.debug(f"Encoding negoziato con il peer: {encoding}, funzionalità: {sorted(features)}")
+        if FEATURE_SYNC in features:
+            self.sync.start_session(peer)
+
+    def _resolve_duplicate(self, existing: PeerInfo, new: PeerInfo) -> bool:
+        """
+        Due connessioni verso lo stesso nodo: ne resta una, scelta allo stesso modo da
+        entrambi i lati. Vince quella aperta dal nodo con il node_id minore; se le ha aperte
+        entrambe lo stesso nodo, è lui a chiudere la più recente (l'altro lato aspetta).
+        Restituisce False se la connessione nuova è stata chiusa.
+        """
+        preferred = min(self.node_id, new.node_id)
+
+        def initiator(info: PeerInfo) -> str:
+            return self.node_id if info.direction == "out" else info.node_id
+
+        if initiator(existing) != initiator(new):
+            drop = new if initiator(existing) == preferred else existing
+        elif initiator(new) == self.node_id:
+            drop = new if existing.connected_at <= new.connected_at else existing
+        else:
+            return True
+
+        keep = existing if drop is new else new
+        self.logger.debug(f"Connessione duplicata con {new.node_id[:8]}: chiusa.")
+        self.peers.add_alias(keep.conn, drop.listen_addr)
+        self.peers.add_alias(keep.conn, drop.addr)
+        self._remove_peer(drop.conn)
+        if drop is new:
+            return False
+        # La connessione rimasta prende il posto di quella chiusa nell'indice per node_id
+        self.peers.set_identity(keep.conn, node_id=keep.node_id)
+        return True
+
+    def _set_peer_protocol(self, peer, encoding: str, features: Set[str]):
+        info = self.peers.get(peer)
+        if info is not None:
+            info.encoding = encoding
+            info.features = features
+            info.state = "ready"
+            if FEATURE_ZLIB in features:
+                self._enable_compression(info)
+
+    def _enable_compression(self, info: PeerInfo):
+        """Il writer del peer comprime da qui in poi (lo stream zlib è per connessione)."""
+        if info.writer:
+            info.writer.set_deflater(Deflater(self.compression_level))
+
+    def _peer_encoding(self, peer) -> str:
+        info = self.peers.get(peer)
+        return info.encoding if info is not None else ENCODING_JSON
+
+    def _peer_features(self, peer) -> Set[str]:
+        info = self.peers.get(peer)
+        return info.features if info is not None else set()
+
+    def _encoding_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for peer in list(self.peers):
+            encoding = self._peer_encoding(peer)
+            counts[encoding] = counts.get(encoding, 0) + 1
+        return counts
+
+    def _handle_threat_events(self, payloads: Iterable[dict], sender_socket=None):
+        """Spacchetta un events_batch nella pipeline dei singoli eventi."""
+        for payload_dict in payloads:
+            if isinstance(payload_dict, dict):
+                self._handle_threat_event(payload_dict, sender_socket=sender_socket)
+
     def _handle_threat_event(self, payload_dict: dict, sender_socket: socket.socket = None):
         """
         Logica centrale: Deduplica -> Valida -> Salva -> Gossip.
+        Qui avvengono solo i controlli economici; la firma viene verificata dal
+        VerificationPool, che poi chiama _on_event_verified in ordine di arrivo.
         """
         try:
             event = ThreatEvent.from_dict(payload_dict)
+            self.inventory.received(event.id)
             
-            # A. DEDUPLICAZIONE: Lo conosciamo già?
-            if self._event_exists(event.id):
+            # A. DEDUPLICAZIONE: Lo conosciamo già? (cache in memoria, DB solo se necessario)
+            if self.seen_events.check_and_add(event.id):
                 return
 
-            # B. Controllo Reputazione mittente (Anti-Spam)
-            if get_reputation(event.reporter_pubkey) < -10:
+            # B. Ammissione: token bucket per IP, connessione e reporter. Li saltano solo gli
+            # eventi che abbiamo chiesto noi con sync_pull a quel peer (sync negoziato): un
+            # sync_events non richiesto passa dai bucket. Gli scartati possono tornare più tardi.
+            synced = isinstance(sender_socket, SyncOrigin)
+            peer = sender_socket.peer if synced else sender_socket
+            requested = (synced and FEATURE_SYNC in self._peer_features(peer)
+                         and self.sync.claim(peer, event.id))
+            if not requested and not self._admit(event, peer):
+                self.seen_events.forget(event.id)
                 return
 
-            # C. Validazione Crittografica
-            is_valid = event.verify()
-            
-            # D. Salvataggio
-            save_event(event)
+            # C. Controllo Reputazione mittente (Anti-Spam, in memoria)
+            if self.reputation.score(event.reporter_pubkey) < -10:
+                return
 
-            # E. Aggiornamento Reputazione e GOSSIP
+            # D. Validazione Crittografica (asincrona, su pool)
+            self.verifier.submit(event, sender_socket)
+
+        except Exception as e:
+            self.logger.error(f"Errore processamento evento: {e}")
+
+    def _admit(self, event: ThreatEvent, peer) -> bool:
+        return self.admission.admit(event.reporter_pubkey, peer, self._peer_ip(peer))
+
+    def _peer_ip(self, peer) -> Optional[str]:
+        info = self.peers.get(peer) if peer is not None else None
+        return info.addr[0] if info is not None and info.addr else None
+
+    def _on_event_verified(self, event: ThreatEvent, is_valid: bool, sender_socket=None):
+        """Seconda metà della pipeline: Salva -> Reputazione -> Gossip."""
+        try:
+            # E. Salvataggio (group commit sul writer)
+            self.writer.save_event(event)
+
+            # F. Aggiornamento Reputazione e GOSSIP
             if is_valid:
                 self.logger.info(f"✅ VALIDATO e PROPAGATO evento da {event.reporter_pubkey[:10]}...")
-                update_reputation(event.reporter_pubkey, 1)
-                # GOSSIP: Inoltra agli altri
-                self._gossip_event(event, exclude_sock=sender_socket)
+                self.reputation.apply(event.reporter_pubkey, 1)
+                # GOSSIP: Inoltra agli altri (non gli eventi recuperati con l'anti-entropy)
+                if not isinstance(sender_socket, SyncOrigin):
+                    self._gossip_event(event, exclude_sock=sender_socket)
             else:
                 self.logger.warning(f"❌ FIRMA INVALIDA da {event.reporter_pubkey[:10]}...")
-                update_reputation(event.reporter_pubkey, -3)
+                self.reputation.apply(event.reporter_pubkey, -3)
 
         except Exception as e:
             self.logger.error(f"Errore processamento evento: {e}")
 
+    def _on_event_unverified(self, event: ThreatEvent, sender_socket=None):
+        """Verifica non eseguita (worker fallito): l'evento torna sconosciuto, può ri-arrivare."""
+        self.seen_events.forget(event.id)
+
+    def _on_events_not_saved(self, events: List[ThreatEvent]):
+        for event in events:
+            self.seen_events.forget(event.id)
+
     def _event_exists(self, event_id: str) -> bool:
-        """Controlla nel DB se un evento esiste già."""
-        with db_cursor() as cur:
-            cur.execute("SELECT 1 FROM events WHERE id = ?", (event_id,))
-            return cur.fetchone() is not None
+        """Controlla nel DB se un evento esiste già (fallback della cache)."""
+        return event_exists(event_id)
 
     def _gossip_event(self, event: ThreatEvent, exclude_sock: socket.socket = None):
         """
         Invia l'evento a tutti i peer TRANNE quello da cui l'abbiamo ricevuto.
+        Con il batcher attivo l'evento finisce nel buffer di uscita di ciascun peer.
         """
         payload = event.to_json()
-        for peer in list(self.peers):
-            if peer == exclude_sock: continue
+        self.inventory.remember(event.id, payload)
+        frames = FrameSet("event", payload, msg_id=event.id)
+        size = estimate_size(payload)
+        for peer in self._gossip_targets(exclude_sock):
+            if self.batcher:
+                self.batcher.add(peer, frames, size)
+            else:
+                self._send_batch(peer, [frames])
+
+    def _gossip_targets(self, exclude=None) -> list:
+        """Peer a cui inoltrare: tutti tranne il mittente, o `fanout` scelti a caso."""
+        targets = [p for p in list(self.peers) if p is not exclude]
+        if 0 < self.fanout < len(targets):
+            targets = random.sample(targets, self.fanout)
+        return targets
+
+    def _send_batch(self, peer, batch: List[FrameSet]):
+        """
+        Spedisce con una sola scrittura gli eventi accumulati per un peer.
+        In modalità inv (se il peer la supporta) partono solo gli ID.
+        """
+        if self.gossip_mode == "inv" and FEATURE_INV in self._peer_features(peer):
+            ids = [frames.msg_id for frames in batch]
+            self._send_frame(peer, encode_message("inv", {"ids": ids}, encoding=self._peer_encoding(peer)))
+        else:
+            self._send_events(peer, batch)
+
+    def _send_events(self, peer, batch: List[FrameSet]):
+        """
+        Body completi in una sola scrittura: un frame events_batch se il peer lo supporta,
+        altrimenti i frame singoli concatenati.
+        """
+        encoding = self._peer_encoding(peer)
+        if len(batch) > 1 and FEATURE_EVENTS_BATCH in self._peer_features(peer):
+            frame = encode_message("events_batch", {"events": [f.payload for f in batch]}, encoding=encoding)
+        else:
+            frame = b"".join(f.get(encoding) for f in batch)
+        self._send_frame(peer, frame)
+
+    def _on_inv(self, peer, ids: List[str]):
+        """
+        Un peer annuncia degli eventi: chiediamo solo quelli che non abbiamo.
+        Ogni inv costa un token dei bucket di ammissione del peer, come un evento.
+        """
+        if not self.admission.admit_frame(peer, self._peer_ip(peer)):
+            return
+        ids = [i for i in ids[:MAX_INV_IDS] if isinstance(i, str)]
+        wanted = self.inventory.want(peer, ids, self.seen_events.contains)
+        if wanted:
+            self._send_frame(peer, encode_message("getdata", {"ids": wanted}, encoding=self._peer_encoding(peer)))
+
+    def _retry_inv_requests(self):
+        """getdata scaduti senza risposta: li rifacciamo al prossimo peer che ha annunciato l'ID."""
+        for peer, ids in self.inventory.due(self.peers.__contains__):
+            for start in range(0, len(ids), MAX_INV_IDS):
+                chunk = ids[start:start + MAX_INV_IDS]
+                self._send_frame(peer, encode_message("getdata", {"ids": chunk}, encoding=self._peer_encoding(peer)))
+
+    def _inv_retry_loop(self):
+        while self.running:
+            time.sleep(max(0.5, self.inventory.request_timeout / 2))
             try:
-                send_message(peer, "event", payload, msg_id=event.id)
-            except Exception:
-                pass
+                self._retry_inv_requests()
+            except Exception as e:
+                self.logger.error(f"Errore ritrasmissione getdata: {e}")
+
+    def _on_getdata(self, peer, ids: List[str]):
+        """Risponde a un getdata con i body richiesti (dalla memoria, altrimenti dal DB)."""
+        if not self.admission.admit_frame(peer, self._peer_ip(peer)):
+            return
+        ids = [i for i in ids[:MAX_INV_IDS] if isinstance(i, str)]
+        found, missing = self.inventory.lookup(ids)
+        from_db = self._load_event_payloads(missing) if missing else []
+        self.inventory.record_served(len(found), len(from_db))
+
+        payloads = found + from_db
+        step = GOSSIP_BATCH_MAX_EVENTS
+        for start in range(0, len(payloads), step):
+            chunk = payloads[start:start + step]
+            self._send_events(peer, [FrameSet("event", p, msg_id=p["id"]) for p in chunk])
+
+    def _load_event_payloads(self, event_ids: List[str]) -> List[dict]:
+        return get_event_payloads(event_ids)
+
+    def _send_message(self, peer, msg_type: str, payload: dict):
+        self._send_frame(peer, encode_message(msg_type, payload, encoding=self._peer_encoding(peer)))
+
+    def _send_frame(self, peer, frame: bytes):
+        """Accoda il frame sul writer del peer (non blocca)."""
+        info = self.peers.get(peer)
+        writer = info.writer if info is not None else None
+        if writer is not None and not writer.enqueue(frame):
+            self._on_send_overflow(peer)
             
\ No newline at end of file
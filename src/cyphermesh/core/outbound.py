@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+from cyphermesh.core.protocol import Deflater
+
+from cyphermesh.logger import logger
+
+# Cosa fare quando la coda di uscita di un peer è piena:
+# "drop" scarta il frame nuovo, "disconnect" chiude il peer lento
+OVERFLOW_POLICIES = ("drop", "disconnect")
+
+# Byte massimi accorpati in una singola sendall dal writer
+MAX_WRITE_BYTES = 256 * 1024
+
+
+class PeerWriter:
+    """
+    Coda di uscita limitata di un peer, svuotata da un thread dedicato.
+    Chi fa gossip accoda e torna subito: un peer con la finestra TCP piena blocca
+    solo il proprio writer, non la propagazione verso gli altri.
+    I frame già in coda vengono accorpati in un'unica sendall (compressa, se il peer
+    ha negoziato la compressione: vedi set_deflater).
+    """
+
+    def __init__(self, sock, on_error: Callable[[object], None], max_frames: int = 1000,
+                 max_bytes: int = 8 * 1024 * 1024, name: str = "peer-writer"):
+        self.sock = sock
+        self.on_error = on_error
+        self.max_frames = max(1, max_frames)
+        self.max_bytes = max(1, max_bytes)
+
+        self._frames: Deque[bytes] = deque()
+        self._queued_bytes = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._deflater: Optional[Deflater] = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.writes = 0
+        self.dropped = 0
+        self.stall_s = 0.0        # Tempo totale passato bloccati in sendall
+        self.max_stall_ms = 0.0   # sendall più lenta
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        """Ferma il writer scartando quello che è ancora in coda (non blocca)."""
+        with self._cond:
+            self._closed = True
+            self._frames.clear()
+            self._queued_bytes = 0
+            self._cond.notify()
+
+    def set_deflater(self, deflater: Deflater):
+        """Da qui in poi i frame partono compressi (anche quelli già in coda)."""
+        with self._cond:
+            self._deflater = deflater
+
+    def enqueue(self, frame: bytes) -> bool:
+        """Accoda un frame. False se la coda è piena (il frame non viene accodato) o chiusa."""
+        with self._cond:
+            if self._closed:
+                return False
+            if self._frames and (len(self._frames) >= self.max_frames
+                                 or self._queued_bytes + len(frame) > self.max_bytes):
+                self.dropped += 1
+                return False
+            self._frames.append(frame)
+            self._queued_bytes += len(frame)
+            self._cond.notify()
+        return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queue_frames": len(self._frames),
+                "queue_bytes": self._queued_bytes,
+                "frames_sent": self.frames_sent,
+                "bytes_sent": self.bytes_sent,
+                "writes": self.writes,
+                "dropped": self.dropped,
+                "stall_ms": round(self.stall_s * 1000, 1),
+                "max_stall_ms": round(self.max_stall_ms, 1),
+                "compression": self._deflater.stats() if self._deflater else None,
+            }
+
+    def _take(self):
+        with self._cond:
+            while not self._frames and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            chunk, size = [], 0
+            while self._frames and (not chunk or size + len(self._frames[0]) <= MAX_WRITE_BYTES):
+                frame = self._frames.popleft()
+                chunk.append(frame)
+                size += len(frame)
+            self._queued_bytes -= size
+            return chunk, self._deflater
+
+    def _run(self):
+        while True:
+            taken = self._take()
+            if taken is None:
+                return
+            chunk, deflater = taken
+            data = chunk[0] if len(chunk) == 1 else b"".join(chunk)
+            if deflater is not None:
+                data = deflater.wrap(data)
+            started = time.monotonic()
+            try:
+                self.sock.sendall(data)
+            except Exception as e:
+                logger.debug(f"[PEER WRITER] invio fallito: {e}")
+                self.close()
+                self.on_error(self.sock)
+                return
+            elapsed = time.monotonic() - started
+            with self._cond:
+                self.frames_sent += len(chunk)
+                self.bytes_sent += len(data)
+                self.writes += 1
+                self.stall_s += elapsed
+                self.max_stall_ms = max(self.max_stall_ms, elapsed * 1000)
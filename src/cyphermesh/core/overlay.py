@@ -0,0 +1,115 @@
+import random
+import threading
+from typing import Iterable, List, Optional, Set, Tuple
+
+Addr = Tuple[str, int]
+
+
+class PeerViews:
+    """
+    Peer sampling in stile HyParView, semplificato.
+
+    - vista attiva: i peer con cui teniamo una connessione TCP (al massimo `target_degree`
+      aperte da noi, `max_degree` contando anche quelle in ingresso);
+    - vista passiva: indirizzi noti (discovery, scambi con i peer) ma non connessi,
+      limitata a `passive_size` con rimpiazzo casuale. Quando un peer attivo cade se ne
+      promuove uno passivo, così il grado resta vicino al target senza diventare full mesh.
+    """
+
+    def __init__(self, target_degree: int = 8, max_degree: int = 0, passive_size: int = 64,
+                 rng: Optional[random.Random] = None):
+        self.target_degree = max(1, target_degree)
+        self.max_degree = max(self.target_degree, max_degree or 2 * self.target_degree)
+        self.passive_size = max(0, passive_size)
+        self.rng = rng or random.Random()
+
+        self._active: Set[Addr] = set()
+        self._passive: List[Addr] = []
+        self._lock = threading.Lock()
+
+        self.promotions = 0
+        self.rejected_incoming = 0
+
+    # --- vista attiva ---
+
+    def has_room(self, active_count: int) -> bool:
+        """Possiamo aprire un'altra connessione in uscita?"""
+        return active_count < self.target_degree
+
+    def accept_incoming(self, active_count: int) -> bool:
+        if active_count < self.max_degree:
+            return True
+        with self._lock:
+            self.rejected_incoming += 1
+        return False
+
+    def mark_active(self, addr: Addr):
+        with self._lock:
+            self._active.add(addr)
+            if addr in self._passive:
+                self._passive.remove(addr)
+
+    def mark_inactive(self, addr: Addr):
+        """Un peer attivo si è disconnesso: torna tra i candidati."""
+        with self._lock:
+            self._active.discard(addr)
+        self.add_passive(addr)
+
+    def is_active(self, addr: Addr) -> bool:
+        with self._lock:
+            return addr in self._active
+
+    # --- vista passiva ---
+
+    def add_passive(self, addr: Addr):
+        if self.passive_size == 0:
+            return
+        with self._lock:
+            if addr in self._active or addr in self._passive:
+                return
+            if len(self._passive) >= self.passive_size:
+                self._passive.pop(self.rng.randrange(len(self._passive)))
+            self._passive.append(addr)
+
+    def merge(self, addrs: Iterable[Addr], own_addrs: Iterable[Addr] = ()):
+        """Aggiunge alla vista passiva gli indirizzi ricevuti da un peer (shuffle)."""
+        own = set(own_addrs)
+        for addr in addrs:
+            if addr not in own:
+                self.add_passive(addr)
+
+    def remove_passive(self, addr: Addr):
+        with self._lock:
+            if addr in self._passive:
+                self._passive.remove(addr)
+
+    def pick_candidate(self) -> Optional[Addr]:
+        """Candidato casuale dalla vista passiva da promuovere ad attivo."""
+        with self._lock:
+            candidates = [a for a in self._passive if a not in self._active]
+            if not candidates:
+                return None
+            self.promotions += 1
+            return self.rng.choice(candidates)
+
+    def sample(self, k: int) -> List[Addr]:
+        """Campione di indirizzi (attivi e passivi) da inviare a un peer."""
+        with self._lock:
+            known = list(self._active) + self._passive
+        return self.rng.sample(known, min(k, len(known)))
+
+    def passive(self) -> List[Addr]:
+        """Indirizzi della vista passiva (candidati a sostituire i peer attivi)."""
+        with self._lock:
+            return list(self._passive)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "target_degree": self.target_degree,
+                "max_degree": self.max_degree,
+                "active_known": len(self._active),
+                "passive": len(self._passive),
+                "promotions": self.promotions,
+                "rejected_incoming": self.rejected_incoming,
+            }
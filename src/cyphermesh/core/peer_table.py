@@ -0,0 +1,197 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from cyphermesh.core.overlay import Addr
+from cyphermesh.core.protocol import ENCODING_JSON
+
+
+@dataclass(eq=False)
+class PeerInfo:
+    """Stato di una connessione: indirizzi, protocollo negoziato, contatori."""
+    conn: Any                              # socket (Node) o _AsyncPeer (AsyncNode)
+    addr: Optional[Addr]                   # Indirizzo remoto del socket
+    direction: str                         # "out" = aperta da noi, "in" = accettata
+    listen_addr: Optional[Addr] = None     # Porta di ascolto del peer, se nota
+    node_id: Optional[str] = None
+    version: Optional[int] = None          # Versione di protocollo annunciata nell'handshake
+    aliases: Set[Addr] = field(default_factory=set)   # Indirizzi di connessioni duplicate chiuse
+    state: str = "handshaking"             # "handshaking" -> "ready" dopo l'handshake
+    encoding: str = ENCODING_JSON
+    features: Set[str] = field(default_factory=set)
+    writer: Any = None                     # PeerWriter (solo Node)
+    connected_at: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.time)
+    rtt_ms: Optional[float] = None
+    frames_in: int = 0
+    events_in: int = 0
+    peers_at: float = 0.0                  # Ultimo frame "peers" accettato (monotonic)
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "addr": f"{self.addr[0]}:{self.addr[1]}" if self.addr else None,
+            "listen_addr": f"{self.listen_addr[0]}:{self.listen_addr[1]}" if self.listen_addr else None,
+            "direction": self.direction,
+            "node_id": self.node_id,
+            "version": self.version,
+            "state": self.state,
+            "encoding": self.encoding,
+            "connected_s": round(now - self.connected_at, 1),
+            "idle_s": round(now - self.last_seen, 1),
+            "rtt_ms": round(self.rtt_ms, 2) if self.rtt_ms is not None else None,
+            "frames_in": self.frames_in,
+            "events_in": self.events_in,
+        }
+
+
+class PeerTable:
+    """
+    Registro thread-safe delle connessioni attive, indicizzato per connessione,
+    per indirizzo (remoto e di ascolto) e per node_id: ricerche e rimozioni in O(1).
+    Tiene anche gli indirizzi con una connessione in corso e quelli da salvare nel DB,
+    che vengono scritti a blocchi (take_dirty) invece che a ogni connessione.
+    """
+
+    def __init__(self):
+        self._by_conn: Dict[Any, PeerInfo] = {}
+        self._by_addr: Dict[Addr, PeerInfo] = {}
+        self._by_node_id: Dict[str, PeerInfo] = {}
+        self._connecting: Set[Addr] = set()
+        self._dirty: Dict[Addr, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._by_conn)
+
+    def __contains__(self, conn) -> bool:
+        return conn in self._by_conn
+
+    def __iter__(self) -> Iterator[Any]:
+        """Itera su una copia delle connessioni: si può rimuovere durante il giro."""
+        with self._lock:
+            return iter(list(self._by_conn))
+
+    def infos(self) -> List[PeerInfo]:
+        with self._lock:
+            return list(self._by_conn.values())
+
+    # --- registrazione ---
+
+    def add(self, info: PeerInfo) -> bool:
+        with self._lock:
+            if info.conn in self._by_conn:
+                return False
+            self._by_conn[info.conn] = info
+            self._index(info)
+            if info.listen_addr:
+                self._connecting.discard(info.listen_addr)
+                self._dirty[info.listen_addr] = info.last_seen
+            return True
+
+    def remove(self, conn) -> Optional[PeerInfo]:
+        with self._lock:
+            info = self._by_conn.pop(conn, None)
+            if info is None:
+                return None
+            for addr in (info.addr, info.listen_addr, *info.aliases):
+                if addr and self._by_addr.get(addr) is info:
+                    del self._by_addr[addr]
+            if info.node_id and self._by_node_id.get(info.node_id) is info:
+                del self._by_node_id[info.node_id]
+            if info.listen_addr:
+                self._dirty[info.listen_addr] = info.last_seen
+            return info
+
+    def _index(self, info: PeerInfo):
+        """Da chiamare con il lock preso."""
+        for addr in (info.addr, info.listen_addr):
+            if addr:
+                self._by_addr[addr] = info
+        if info.node_id:
+            self._by_node_id[info.node_id] = info
+
+    def set_identity(self, conn, node_id: Optional[str] = None,
+                     listen_addr: Optional[Addr] = None) -> Optional[PeerInfo]:
+        """
+        Aggiorna node_id / indirizzo di ascolto annunciati dal peer.
+        Restituisce un'altra connessione già registrata con lo stesso node_id, se esiste.
+        """
+        with self._lock:
+            info = self._by_conn.get(conn)
+            if info is None:
+                return None
+            existing = self._by_node_id.get(node_id) if node_id else None
+            if existing is info:
+                existing = None
+            if listen_addr and not info.listen_addr:
+                info.listen_addr = listen_addr
+                self._by_addr.setdefault(listen_addr, info)
+                self._dirty[listen_addr] = info.last_seen
+            if node_id:
+                info.node_id = node_id
+                if existing is None:
+                    self._by_node_id[node_id] = info
+            return existing
+
+    def add_alias(self, conn, addr: Optional[Addr]):
+        """Un altro indirizzo dello stesso nodo: i tentativi di connessione verso addr vengono saltati."""
+        if not addr:
+            return
+        with self._lock:
+            info = self._by_conn.get(conn)
+            if info is not None:
+                info.aliases.add(addr)
+                self._by_addr[addr] = info
+
+    # --- ricerche ---
+
+    def get(self, conn) -> Optional[PeerInfo]:
+        return self._by_conn.get(conn)
+
+    def find(self, addr: Addr) -> Optional[PeerInfo]:
+        """Connessione verso/da questo indirizzo (remoto o di ascolto)."""
+        return self._by_addr.get(addr)
+
+    def by_node_id(self, node_id: str) -> Optional[PeerInfo]:
+        return self._by_node_id.get(node_id)
+
+    # --- connessioni in uscita in corso ---
+
+    def reserve(self, addr: Addr) -> bool:
+        """Prenota una connessione verso addr; False se è già connesso o in corso."""
+        with self._lock:
+            if addr in self._connecting or addr in self._by_addr:
+                return False
+            self._connecting.add(addr)
+            return True
+
+    def release(self, addr: Addr):
+        with self._lock:
+            self._connecting.discard(addr)
+
+    def connecting_count(self) -> int:
+        return len(self._connecting)
+
+    # --- persistenza a blocchi ---
+
+    def take_dirty(self) -> List[Tuple[str, int, datetime]]:
+        """Righe (ip, porta, last_seen) da scrivere nella tabella peers del DB."""
+        with self._lock:
+            for info in self._by_conn.values():
+                if info.listen_addr:
+                    self._dirty[info.listen_addr] = info.last_seen
+            dirty, self._dirty = self._dirty, {}
+        return [(host, port, datetime.fromtimestamp(ts)) for (host, port), ts in dirty.items()]
+
+    def stats(self) -> dict:
+        now = time.time()
+        infos = self.infos()
+        return {
+            "connected": len(infos),
+            "connecting": len(self._connecting),
+            "outgoing": sum(1 for i in infos if i.direction == "out"),
+            "identified": sum(1 for i in infos if i.node_id),
+            "details": [i.snapshot(now) for i in infos],
+        }
@@ -1,9 +1,74 @@
 import json
 import uuid
+import zlib
 import struct
 import socket
+from collections import deque
 from datetime import datetime
-from typing import Optional
+from typing import Deque, Dict, Iterable, List, Optional, Union
+
+from cyphermesh.config import MAX_FRAME_SIZE, RECV_BUFFER_SIZE
+from cyphermesh.core.codec import (
+    packb, unpackb, compact_event, expand_event, compact_batch, expand_batch,
+    compact_ids, expand_ids, compact_id, expand_id
+)
+
+# Header di framing: lunghezza del body come unsigned int big-endian
+HEADER_FORMAT = '>I'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Encoding del body. Il JSON resta il default e il fallback verso i nodi vecchi;
+# il binario si usa solo dopo che il peer lo ha annunciato nell'handshake.
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+SUPPORTED_ENCODINGS = (ENCODING_MSGPACK, ENCODING_JSON)
+
+# Funzionalità opzionali annunciate nell'handshake
+# Versione del protocollo annunciata nell'handshake (1 = nodi senza handshake)
+PROTOCOL_VERSION = 2
+
+FEATURE_EVENTS_BATCH = "events_batch"   # più eventi in un solo frame {"events": [...]}
+FEATURE_INV = "inv"                      # annunci di soli ID (inv) e richieste dei body (getdata)
+FEATURE_SYNC = "sync"                    # anti-entropy alla connessione (sync_digest/ids/pull/events)
+FEATURE_ZLIB = "zlib"                    # frame compressi con zlib in streaming (vedi Deflater)
+SUPPORTED_FEATURES = (FEATURE_EVENTS_BATCH, FEATURE_INV, FEATURE_SYNC, FEATURE_ZLIB)
+
+# ID massimi accettati in un singolo inv/getdata
+MAX_INV_IDS = 1000
+
+# Primo byte dei body binari: 0xC1 non è mai usato da msgpack e un body JSON inizia con '{',
+# quindi il ricevente riconosce il formato senza stato.
+BINARY_MARKER = b"\xc1"
+# Primo byte dei frame compressi (anche 0xC2 non può iniziare un body JSON o binario):
+# il body è un pezzo dello stream zlib della connessione e contiene uno o più frame interi.
+COMPRESSED_MARKER = b"\xc2"
+# Oltre questa dimensione i frame partono non compressi (il ricevente ha MAX_FRAME_SIZE)
+MAX_COMPRESS_INPUT = 1024 * 1024
+
+# Dizionario iniziale dello stream zlib: i nomi dei campi e l'intestazione PEM compaiono in
+# ogni frame, così si risparmia già sul primo. Fa parte di FEATURE_ZLIB: non va modificato.
+ZLIB_DICTIONARY = (
+    b'-----BEGIN PUBLIC KEY-----\n-----END PUBLIC KEY-----\n'
+    b'{"type": "events_batch", "id": "", "payload": {"events": [{"id": "", "source_ip": "", '
+    b'"threat_type": "", "severity": "", "timestamp": "", "reporter_pubkey": "", '
+    b'"signature": "", "valid_signature": false, "sig_scheme": "rsa-pss"}]}, "timestamp": ""}'
+)
+
+
+class FrameTooLargeError(ValueError):
+    """Il peer ha annunciato un frame più grande di MAX_FRAME_SIZE."""
+
+
+# Payload con campi compattabili (firma/chiave/ID come byte grezzi)
+_COMPACTORS = {
+    "event": (compact_event, expand_event),
+    "events_batch": (compact_batch, expand_batch),
+    "inv": (compact_ids, expand_ids),
+    "getdata": (compact_ids, expand_ids),
+    "sync_ids": (compact_ids, expand_ids),
+    "sync_pull": (compact_ids, expand_ids),
+    "sync_events": (compact_batch, expand_batch),
+}
 
 
 def generate_id() -> str:
@@ -19,61 +84,322 @@ def current_timestamp() -> str:
     return datetime.utcnow().isoformat() + "Z"
 
 
-def send_message(sock: socket.socket, msg_type: str, payload: dict = None, msg_id: str = None):
+def encode_message(msg_type: str, payload: dict = None, msg_id: str = None,
+                   encoding: str = ENCODING_JSON) -> bytes:
     """
-    Invia un messaggio con header di lunghezza (4 bytes big-endian).
-    Evita la frammentazione TCP.
+    Costruisce il frame completo (header di lunghezza 4 bytes big-endian + body).
+    Usato sia dal nodo a thread sia dal nodo asyncio, così il formato sul filo resta identico.
+    Con encoding="msgpack" il body è BINARY_MARKER + [type, id, payload, timestamp] in msgpack.
     """
     if payload is None: payload = {}
-    
-    message = {
-        "type": msg_type,
-        "id": msg_id or str(uuid.uuid4()),
-        "payload": payload,
-        "timestamp": datetime.utcnow().isoformat() + "Z"
-    }
-    
-    json_bytes = json.dumps(message).encode('utf-8')
-    
+    msg_id = msg_id or str(uuid.uuid4())
+    timestamp = datetime.utcnow().isoformat() + "Z"
+
+    if encoding == ENCODING_MSGPACK:
+        compactor = _COMPACTORS.get(msg_type)
+        if compactor:
+            payload = compactor[0](payload)
+        body = BINARY_MARKER + packb([msg_type, compact_id(msg_id), payload, timestamp])
+    else:
+        message = {
+            "type": msg_type,
+            "id": msg_id,
+            "payload": payload,
+            "timestamp": timestamp
+        }
+        body = json.dumps(message).encode('utf-8')
+
     # Pack 4 bytes: Lunghezza del messaggio (unsigned int, big-endian)
-    header = struct.pack('>I', len(json_bytes))
-    
+    header = struct.pack(HEADER_FORMAT, len(body))
+
+    return header + body
+
+
+def decode_message(body_data: bytes) -> Optional[dict]:
+    """
+    Decodifica il body di un frame (JSON o binario, riconosciuto dal primo byte).
+    Restituisce None se il body non è valido.
+    """
+    if body_data[:1] == BINARY_MARKER:
+        return _decode_binary(body_data[1:])
+    try:
+        # str(..., 'utf-8') accetta anche i memoryview restituiti da FrameReader
+        return json.loads(str(body_data, 'utf-8'))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+def _decode_binary(data: bytes) -> Optional[dict]:
+    try:
+        msg_type, msg_id, payload, timestamp = unpackb(data)
+        compactor = _COMPACTORS.get(msg_type)
+        if compactor and isinstance(payload, dict):
+            payload = compactor[1](payload)
+    except Exception:
+        # Errori di msgpack (troncato, tipi sconosciuti) o envelope malformato
+        return None
+    return {"type": msg_type, "id": expand_id(msg_id), "payload": payload, "timestamp": timestamp}
+
+
+def advertised_encodings(preferred: str = ENCODING_MSGPACK) -> List[str]:
+    """Encoding da annunciare nell'handshake, in ordine di preferenza (il JSON c'è sempre)."""
+    encodings = [preferred] if preferred in SUPPORTED_ENCODINGS else []
+    if ENCODING_JSON not in encodings:
+        encodings.append(ENCODING_JSON)
+    return encodings
+
+
+def negotiate_encoding(remote: Iterable[str], local: Iterable[str] = SUPPORTED_ENCODINGS) -> str:
+    """Primo encoding locale (in ordine di preferenza) supportato anche dal peer."""
+    remote = set(remote or ())
+    for encoding in local:
+        if encoding in remote:
+            return encoding
+    return ENCODING_JSON
+
+
+class FrameSet:
+    """
+    Un messaggio codificato al più una volta per encoding: nel gossip lo stesso evento
+    va a peer con encoding diversi, ma ciascun frame si serializza una volta sola.
+    """
+
+    def __init__(self, msg_type: str, payload: dict = None, msg_id: str = None):
+        self.msg_type = msg_type
+        self.payload = payload
+        self.msg_id = msg_id or str(uuid.uuid4())
+        self._frames: Dict[str, bytes] = {}
+
+    def get(self, encoding: str = ENCODING_JSON) -> bytes:
+        frame = self._frames.get(encoding)
+        if frame is None:
+            frame = encode_message(self.msg_type, self.payload, self.msg_id, encoding=encoding)
+            self._frames[encoding] = frame
+        return frame
+
+
+def send_message(sock: socket.socket, msg_type: str, payload: dict = None, msg_id: str = None,
+                 encoding: str = ENCODING_JSON):
+    """
+    Invia un messaggio con header di lunghezza (4 bytes big-endian).
+    Evita la frammentazione TCP.
+    """
     # Invia Header + Body
-    sock.sendall(header + json_bytes)
+    sock.sendall(encode_message(msg_type, payload, msg_id, encoding=encoding))
+
+
+class Deflater:
+    """
+    Compressione zlib in streaming per una connessione. La finestra di 32 KiB resta
+    condivisa tra i frame successivi: chiave pubblica PEM e campi ripetuti di un reporter
+    si pagano per intero una volta, poi costano pochi byte di riferimento.
+    Una sola istanza per connessione, usata da un solo writer: l'ordine dei frame conta.
+    """
+
+    def __init__(self, level: int = 6):
+        self._z = zlib.compressobj(level, zdict=ZLIB_DICTIONARY)
+        self.bytes_in = 0    # Byte dei frame originali
+        self.bytes_out = 0   # Byte dei frame compressi inviati
+
+    def wrap(self, data: bytes) -> bytes:
+        """
+        Uno o più frame già codificati -> un frame compresso. Z_SYNC_FLUSH chiude il blocco,
+        così il ricevente decodifica tutto subito senza aspettare i frame successivi.
+        """
+        if len(data) > MAX_COMPRESS_INPUT:
+            return data
+        body = COMPRESSED_MARKER + self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+        frame = struct.pack(HEADER_FORMAT, len(body)) + body
+        self.bytes_in += len(data)
+        self.bytes_out += len(frame)
+        return frame
+
+    def stats(self) -> dict:
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+        }
+
+
+class Inflater:
+    """Lato ricezione di Deflater: un frame compresso -> i frame originali, nell'ordine."""
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE):
+        self.max_output = max_frame_size
+        self._z = zlib.decompressobj(zdict=ZLIB_DICTIONARY)
+        # I frame interni passano da un FrameBuffer che non accetta altri frame compressi
+        self._frames = FrameBuffer(max_frame_size, inflate=False)
+
+    def inflate(self, body) -> List[bytes]:
+        data = self._z.decompress(body[1:], self.max_output)
+        if self._z.unconsumed_tail:
+            raise FrameTooLargeError(f"Frame compresso oltre {self.max_output} bytes")
+        self._frames.feed(data)
+        frames = []
+        while True:
+            frame = self._frames.next_frame()
+            if frame is None:
+                return frames
+            # Copia: il memoryview sul buffer interno non sopravvive al prossimo feed
+            frames.append(bytes(frame))
+
+
+class FrameBuffer:
+    """
+    Buffer di ricezione riutilizzabile che separa i frame length-prefixed.
+    I body vengono restituiti come memoryview sul buffer (nessuna copia): restano
+    validi solo fino alla lettura successiva, quindi vanno decodificati subito.
+    I frame compressi (COMPRESSED_MARKER) vengono espansi qui: chi legge vede solo
+    i frame originali, anche da peer che comprimono.
+    """
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE, buffer_size: int = RECV_BUFFER_SIZE,
+                 inflate: bool = True):
+        self.max_frame_size = max_frame_size
+        self._buf = bytearray(max(buffer_size, HEADER_SIZE))
+        self._view = memoryview(self._buf)
+        self._start = 0  # Primo byte non ancora consumato
+        self._end = 0    # Fine dei dati ricevuti
+        self.inflate = inflate
+        self._inflater: Optional[Inflater] = None
+        self._inflated: Deque[bytes] = deque()
+
+    def writable(self) -> memoryview:
+        """Spazio libero in coda al buffer, da riempire con recv_into e poi advance()."""
+        if self._end == len(self._buf):
+            self._make_room(self._end - self._start + 1)
+        return self._view[self._end:]
+
+    def advance(self, n: int):
+        self._end += n
+
+    def feed(self, data: bytes):
+        """Copia dati già letti (es. da uno StreamReader asyncio) nel buffer."""
+        if self._end + len(data) > len(self._buf):
+            self._make_room(self._end - self._start + len(data))
+        self._view[self._end:self._end + len(data)] = data
+        self._end += len(data)
+
+    def next_frame(self) -> Optional[Union[memoryview, bytes]]:
+        """Prossimo body completo nel buffer, o None se serve leggere ancora."""
+        while not self._inflated:
+            body = self._next_raw_frame()
+            if body is None or not self.inflate or body[:1] != COMPRESSED_MARKER:
+                return body
+            if self._inflater is None:
+                self._inflater = Inflater(self.max_frame_size)
+            self._inflated.extend(self._inflater.inflate(body))
+        return self._inflated.popleft()
+
+    def _next_raw_frame(self) -> Optional[memoryview]:
+        available = self._end - self._start
+        if available < HEADER_SIZE:
+            return None
+        length = struct.unpack_from(HEADER_FORMAT, self._buf, self._start)[0]
+        if length > self.max_frame_size:
+            raise FrameTooLargeError(f"Frame di {length} bytes (massimo {self.max_frame_size})")
+
+        needed = HEADER_SIZE + length
+        if available < needed:
+            # Frame parziale: ci assicuriamo che entri tutto nel buffer
+            if needed > len(self._buf) - self._start:
+                self._make_room(needed)
+            return None
+
+        body = self._view[self._start + HEADER_SIZE:self._start + needed]
+        self._start += needed
+        if self._start == self._end:
+            self._start = self._end = 0
+        return body
+
+    def _make_room(self, capacity: int):
+        """Sposta i dati non consumati in testa e, se serve, ingrandisce il buffer."""
+        pending = self._end - self._start
+        if capacity > len(self._buf):
+            buf = bytearray(max(capacity, len(self._buf) * 2))
+            buf[:pending] = self._view[self._start:self._end]
+            self._buf, self._view = buf, memoryview(buf)
+        elif self._start:
+            self._buf[:pending] = bytes(self._view[self._start:self._end])
+        self._start, self._end = 0, pending
+
+
+class FrameReader(FrameBuffer):
+    """
+    Lettore di frame per un socket bloccante: una recv_into può portare più frame,
+    che vengono poi restituiti uno alla volta senza altre syscall.
+    """
+
+    def __init__(self, sock: socket.socket, max_frame_size: int = MAX_FRAME_SIZE,
+                 buffer_size: int = RECV_BUFFER_SIZE):
+        super().__init__(max_frame_size, buffer_size)
+        self.sock = sock
+        self.bytes_received = 0
+        self.frames = 0
+        self.recv_calls = 0
+
+    def read_frame(self) -> Optional[memoryview]:
+        """
+        Body del prossimo frame. Restituisce None se la connessione è chiusa;
+        solleva FrameTooLargeError se il frame supera il limite.
+        """
+        while True:
+            body = self.next_frame()
+            if body is not None:
+                self.frames += 1
+                return body
+            try:
+                n = self.sock.recv_into(self.writable())
+            except socket.error:
+                return None
+            if not n:
+                return None
+            self.recv_calls += 1
+            self.bytes_received += n
+            self.advance(n)
+
+    def read_message(self) -> Optional[dict]:
+        body = self.read_frame()
+        if body is None:
+            return None
+        return decode_message(body)
 
 
 def receive_message(sock: socket.socket) -> Optional[dict]:
     """
     Legge esattamente un messaggio completo gestendo il framing.
-    Restituisce None se la connessione è chiusa.
+    Restituisce None se la connessione è chiusa o il frame supera MAX_FRAME_SIZE.
+    Per le connessioni di lunga durata usare FrameReader, che riusa il buffer.
     """
     # 1. Leggi i primi 4 byte (Header Lunghezza)
-    header_data = _read_n_bytes(sock, 4)
+    header_data = _read_n_bytes(sock, HEADER_SIZE)
     if not header_data:
         return None
         
-    msg_length = struct.unpack('>I', header_data)[0]
+    msg_length = struct.unpack(HEADER_FORMAT, header_data)[0]
+    if msg_length > MAX_FRAME_SIZE:
+        return None
     
     # 2. Leggi esattamente 'msg_length' bytes (Body)
     body_data = _read_n_bytes(sock, msg_length)
-    if not body_data:
+    if body_data is None:
         return None
         
-    try:
-        return json.loads(body_data.decode('utf-8'))
-    except json.JSONDecodeError:
-        return None
+    return decode_message(body_data)
 
 
-def _read_n_bytes(sock: socket.socket, n: int) -> Optional[bytes]:
-    """Helper per leggere esattamente n bytes dal socket."""
-    data = b''
-    while len(data) < n:
+def _read_n_bytes(sock: socket.socket, n: int) -> Optional[bytearray]:
+    """Helper per leggere esattamente n bytes dal socket (in un buffer preallocato)."""
+    data = bytearray(n)
+    view = memoryview(data)
+    received = 0
+    while received < n:
         try:
-            packet = sock.recv(n - len(data))
+            packet = sock.recv_into(view[received:])
             if not packet:
                 return None
-            data += packet
+            received += packet
         except socket.error:
             return None
     return data
@@ -0,0 +1,61 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe: `rate` token al secondo, al massimo `burst` accumulati.
+    consume() attende finché i token non bastano; try_consume() non blocca mai.
+    """
+
+    def __init__(self, rate: float, burst: float = 0):
+        self.rate = max(0.0, rate)
+        self.burst = max(1.0, burst or self.rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.waited_s = 0.0   # Tempo totale passato ad aspettare token
+
+    def _refill(self, now: float):
+        """Da chiamare con il lock preso."""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_consume(self, amount: float = 1) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return True
+            return False
+
+    def reserve(self, amount: float = 1) -> float:
+        """
+        Preleva `amount` token anche in debito, senza attendere: restituisce i secondi da
+        aspettare prima di usarli (0 se c'erano già). Per chi pianifica l'attesa da sé.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited_s += wait
+        return wait
+
+    def consume(self, amount: float = 1, stop: threading.Event = None) -> bool:
+        """
+        Preleva `amount` token, attendendo se necessario. Richieste più grandi del burst
+        vanno in debito, così un blocco grande passa comunque ma ritarda i successivi.
+        Restituisce False se `stop` viene segnalato durante l'attesa.
+        """
+        wait = self.reserve(amount)
+        if wait <= 0:
+            return True
+        if stop is not None:
+            return not stop.wait(wait)
+        time.sleep(wait)
+        return True
@@ -0,0 +1,224 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional
+
+
+class BloomFilter:
+    """
+    Bloom filter a dimensione fissa, calcolata da capacità attesa e tasso di falsi positivi.
+    Risponde "sicuramente assente" oppure "forse presente".
+    """
+
+    def __init__(self, capacity: int, fp_rate: float):
+        capacity = max(1, capacity)
+        fp_rate = min(max(fp_rate, 1e-9), 0.5)
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Double hashing (Kirsch-Mitzenmacher): due hash a 64 bit generano k posizioni
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        """`count` sale solo se la chiave accende almeno un bit: una chiave già presente non conta."""
+        added = False
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        for pos in self._positions(key):
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class SeenEventCache:
+    """
+    Set LRU limitato degli ID evento già visti, con Bloom filter opzionale davanti al DB.
+
+    - ID nell'LRU            -> duplicato certo, nessun accesso al DB
+    - ID assente dal Bloom   -> evento sicuramente nuovo, nessun accesso al DB
+    - altrimenti             -> si interroga il DB tramite `fallback`
+
+    Il Bloom filter ha capacità almeno doppia delle righe della tabella (vedi warm). Oltre la
+    capacità i falsi positivi crescono e ogni controllo finisce sul DB: quando è saturo il nodo
+    lo ricostruisce più grande con rebuild_bloom.
+    """
+
+    def __init__(self, size: int, bloom_capacity: int = 0, bloom_fp_rate: float = 0.001,
+                 fallback: Optional[Callable[[str], bool]] = None):
+        self.size = max(1, size)
+        self.bloom_capacity = bloom_capacity
+        self.bloom = BloomFilter(bloom_capacity, bloom_fp_rate) if bloom_capacity > 0 else None
+        self.fallback = fallback
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        # ID in verifica sul DB (caso ambiguo): chi li vede nel frattempo è un duplicato
+        self._pending = set()
+        self._lock = threading.Lock()
+        # ID registrati durante una ricostruzione del Bloom filter (None se non in corso)
+        self._rebuilding: Optional[List[str]] = None
+
+        self.hits = 0             # Duplicati trovati nell'LRU
+        self.bloom_negatives = 0  # Eventi nuovi riconosciuti dal Bloom filter
+        self.db_lookups = 0       # Casi ambigui risolti sul DB
+        self.db_hits = 0          # ... di cui già presenti nel DB
+        self.misses = 0           # Totale eventi nuovi
+        self.bloom_rebuilds = 0
+
+    def _remember(self, event_id: str, bloom: bool = True):
+        """
+        Da chiamare con il lock acquisito. `bloom=False` per gli ID che il Bloom filter
+        dà già per presenti (aggiungerli di nuovo non cambia i bit).
+        """
+        self._lru[event_id] = None
+        self._lru.move_to_end(event_id)
+        if len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+        if bloom and self.bloom is not None:
+            self.bloom.add(event_id)
+        if self._rebuilding is not None:
+            self._rebuilding.append(event_id)
+
+    def _bloom_for(self, rows: int) -> BloomFilter:
+        """Bloom filter per una tabella di `rows` righe, con spazio per altrettante nuove."""
+        return BloomFilter(max(self.bloom_capacity, rows * 2), self.bloom.fp_rate)
+
+    def warm(self, event_ids: Iterable[str], rows: int = 0):
+        """
+        Precarica la cache (es. dalla tabella events, dal più vecchio al più recente).
+        `rows` è il numero di ID in arrivo: se supera metà della capacità il Bloom filter
+        viene ridimensionato prima di riempirlo.
+        """
+        with self._lock:
+            if self.bloom is not None and rows * 2 > self.bloom.capacity:
+                self.bloom = self._bloom_for(rows)
+            for event_id in event_ids:
+                self._remember(event_id)
+
+    @property
+    def bloom_saturated(self) -> bool:
+        bloom = self.bloom
+        return bloom is not None and bloom.count >= bloom.capacity and self._rebuilding is None
+
+    def rebuild_bloom(self, event_ids: Iterable[str], rows: int):
+        """
+        Sostituisce il Bloom filter con uno nuovo dimensionato su `rows`, riempito con `event_ids`
+        (tutti gli ID della tabella) fuori dal lock. Gli ID registrati nel frattempo e quelli
+        nell'LRU (anche non ancora scritti dal writer) finiscono anche nel nuovo filtro.
+        """
+        with self._lock:
+            if self.bloom is None or self._rebuilding is not None:
+                return
+            bloom = self._bloom_for(rows)
+            self._rebuilding = []
+        try:
+            for event_id in event_ids:
+                bloom.add(event_id)
+        except Exception:
+            with self._lock:
+                self._rebuilding = None
+            raise
+        with self._lock:
+            for event_id in self._rebuilding:
+                bloom.add(event_id)
+            for event_id in self._lru:
+                bloom.add(event_id)
+            self.bloom = bloom
+            self._rebuilding = None
+            self.bloom_rebuilds += 1
+
+    def add(self, event_id: str):
+        with self._lock:
+            self._remember(event_id)
+
+    def forget(self, event_id: str):
+        """
+        L'ID torna sconosciuto (es. evento scartato prima della verifica). Il Bloom filter
+        non permette rimozioni: la prossima volta che arriva decide il DB.
+        """
+        with self._lock:
+            self._lru.pop(event_id, None)
+
+    def contains(self, event_id: str) -> bool:
+        """Come check_and_add ma senza registrare l'ID (es. per decidere se chiederlo a un peer)."""
+        with self._lock:
+            if event_id in self._lru or event_id in self._pending:
+                return True
+            if self.bloom is not None and event_id not in self.bloom:
+                return False
+        return bool(self.fallback and self.fallback(event_id))
+
+    def check_and_add(self, event_id: str) -> bool:
+        """
+        Restituisce True se l'evento è già stato visto, altrimenti lo registra e restituisce False.
+        Nel caso ambiguo l'ID resta prenotato durante la query sul DB: un secondo peer che
+        consegna lo stesso evento nel frattempo lo trova già visto (il writer è asincrono,
+        la riga potrebbe non esserci ancora e l'evento verrebbe verificato due volte).
+        """
+        with self._lock:
+            if event_id in self._lru:
+                self._lru.move_to_end(event_id)
+                self.hits += 1
+                return True
+            if event_id in self._pending:
+                self.hits += 1
+                return True
+            if self.bloom is not None and event_id not in self.bloom:
+                self.bloom_negatives += 1
+                self.misses += 1
+                self._remember(event_id)
+                return False
+            self._pending.add(event_id)
+
+        # Caso ambiguo: la query sul DB avviene fuori dal lock
+        try:
+            exists = bool(self.fallback is not None and self.fallback(event_id))
+        except Exception:
+            with self._lock:
+                self._pending.discard(event_id)
+            raise
+
+        with self._lock:
+            self._pending.discard(event_id)
+            self.db_lookups += 1
+            # Registrato da add() durante la query (es. evento locale): lo conta come visto
+            if not exists and event_id in self._lru:
+                exists = True
+            if exists:
+                self.db_hits += 1
+            else:
+                self.misses += 1
+            self._remember(event_id, bloom=False)
+        return exists
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.db_hits
+            return {
+                "size": len(self._lru),
+                "max_size": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bloom_negatives": self.bloom_negatives,
+                "db_lookups": self.db_lookups,
+                "db_hits": self.db_hits,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bloom_items": self.bloom.count if self.bloom is not None else 0,
+                "bloom_capacity": self.bloom.capacity if self.bloom is not None else 0,
+                "bloom_rebuilds": self.bloom_rebuilds,
+            }
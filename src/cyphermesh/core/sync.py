@@ -0,0 +1,343 @@
+import hashlib
+import heapq
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cyphermesh.core.batching import estimate_size
+from cyphermesh.core.protocol import MAX_INV_IDS
+from cyphermesh.core.ratelimit import TokenBucket
+from cyphermesh.db.events import (
+    iter_event_ids_since, get_event_ids_with_prefix, get_known_event_ids, get_event_payloads
+)
+from cyphermesh.models import TIMESTAMP_FORMAT
+from cyphermesh.logger import logger
+
+# I bucket sono ore: il prefisso "YYYY-MM-DD HH" del timestamp dell'evento
+BUCKET_PREFIX_LEN = 13
+# Il digest locale viene ricalcolato al massimo ogni DIGEST_TTL_S secondi
+DIGEST_TTL_S = 10.0
+MAX_DIGEST_BUCKETS = 24 * 366
+# Un ID già chiesto a un peer non viene richiesto ad altri per SYNC_REQUEST_TIMEOUT_S secondi
+# (lo streaming è limitato in banda: la risposta può arrivare con calma)
+SYNC_REQUEST_TIMEOUT_S = 120.0
+
+_STOP = object()
+
+
+class SyncOrigin:
+    """
+    Contesto degli eventi arrivati via anti-entropy: vengono verificati e salvati come
+    gli altri, ma non rilanciati nel gossip (i vicini li hanno già o li sincronizzano da soli).
+    """
+    __slots__ = ("peer",)
+
+    def __init__(self, peer):
+        self.peer = peer
+
+
+def id_hash(event_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(event_id.encode(), digest_size=8).digest(), "big")
+
+
+def build_digest(rows) -> Dict[str, Tuple[int, int]]:
+    """
+    Da coppie (timestamp, id) a {bucket: (numero eventi, XOR degli hash degli ID)}.
+    Lo XOR non dipende dall'ordine: due nodi con gli stessi eventi hanno lo stesso digest.
+    """
+    digest: Dict[str, List[int]] = {}
+    for timestamp, event_id in rows:
+        entry = digest.setdefault(timestamp[:BUCKET_PREFIX_LEN], [0, 0])
+        entry[0] += 1
+        entry[1] ^= id_hash(event_id)
+    return {bucket: (count, xor) for bucket, (count, xor) in digest.items()}
+
+
+class AntiEntropy:
+    """
+    Sincronizzazione degli eventi persi (riavvio, ingresso tardivo) alla connessione di un peer.
+
+    1. ognuno manda all'altro `sync_digest`: per ogni ora della finestra, conteggio e hash degli ID;
+    2. chi riceve un digest confronta i bucket e, per quelli diversi, manda i propri ID (`sync_ids`);
+    3. chi riceve gli ID chiede solo quelli che non ha (`sync_pull`, a blocchi di MAX_INV_IDS);
+    4. i body partono in streaming (`sync_events`) a blocchi di `chunk_events`, limitati a
+       `rate_bytes` al secondo in totale, così il trasferimento non affama il gossip live,
+       e a `peer_rate_bytes` per peer, così un solo peer non consuma la banda di tutti.
+
+    Di ogni connessione si accetta un solo digest (ognuno costa una scansione della finestra).
+    Tutto il lavoro (DB compreso) gira su un solo thread, fuori dai thread di lettura dei socket:
+    un blocco che deve aspettare la banda del suo peer viene rimandato, intanto si servono gli altri.
+    """
+
+    def __init__(self, send: Callable[[Any, str, dict], None], is_connected: Callable[[Any], bool],
+                 window_days: float = 7, chunk_events: int = 100, rate_bytes: float = 256 * 1024,
+                 peer_rate_bytes: float = 128 * 1024, max_jobs: int = 1000):
+        self.send = send
+        self.is_connected = is_connected
+        self.window_seconds = max(0.0, window_days) * 86400
+        self.chunk_events = max(1, chunk_events)
+        self.bucket = TokenBucket(rate_bytes, burst=rate_bytes)
+        self.peer_rate_bytes = peer_rate_bytes
+
+        self._jobs: queue.Queue = queue.Queue(maxsize=max_jobs)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._digest: Optional[Dict[str, Tuple[int, int]]] = None
+        self._digest_at = 0.0
+        # ID chiesti con sync_pull -> (scadenza, peer a cui li abbiamo chiesti)
+        self._requested: Dict[str, Tuple[float, Any]] = {}
+        # Stato per connessione: digest già ricevuto, banda per i sync_pull
+        self._digested = set()
+        self._peer_buckets: Dict[Any, TokenBucket] = {}
+        # Job rimandati (istante, progressivo, funzione, argomenti): solo il thread di lavoro li tocca
+        self._delayed: List[Tuple[float, int, Callable, tuple]] = []
+        self._seq = itertools.count()
+
+        self.sessions = 0
+        self.buckets_differing = 0
+        self.ids_offered = 0
+        self.ids_pulled = 0
+        self.events_served = 0
+        self.bytes_served = 0
+        self.dropped_jobs = 0
+        self.digests_ignored = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="anti-entropy", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        try:
+            self._jobs.put_nowait(_STOP)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    # --- API per il nodo (chiamate dai thread di rete, non bloccano) ---
+
+    def start_session(self, peer):
+        """Peer appena connesso (handshake completato): gli mandiamo il nostro digest."""
+        if self.enabled:
+            self._submit(self._send_digest, peer)
+
+    def on_digest(self, peer, payload):
+        """Il digest di un peer: solo il primo della connessione, gli altri si ignorano."""
+        with self._lock:
+            if peer in self._digested:
+                self.digests_ignored += 1
+                return
+            self._digested.add(peer)
+        self._submit(self._compare_digest, peer, payload)
+
+    def on_ids(self, peer, ids):
+        self._submit(self._pull_missing, peer, ids)
+
+    def on_pull(self, peer, ids):
+        self._submit(self._serve, peer, ids)
+
+    def forget_peer(self, peer):
+        """Connessione chiusa: via il suo stato (una nuova connessione riparte da capo)."""
+        with self._lock:
+            self._digested.discard(peer)
+            self._peer_buckets.pop(peer, None)
+
+    def claim(self, peer, event_id: str) -> bool:
+        """
+        True (una volta sola) se l'evento è tra quelli chiesti a `peer` con sync_pull e la
+        richiesta non è scaduta. Solo questi saltano l'ammissione: un sync_events non richiesto
+        è traffico come un altro.
+        """
+        with self._lock:
+            entry = self._requested.get(event_id)
+            if entry is None or entry[1] is not peer or entry[0] < time.monotonic():
+                return False
+            del self._requested[event_id]
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "window_days": self.window_seconds / 86400,
+                "pending_jobs": self._jobs.qsize(),
+                "sessions": self.sessions,
+                "buckets_differing": self.buckets_differing,
+                "ids_offered": self.ids_offered,
+                "ids_pulled": self.ids_pulled,
+                "events_served": self.events_served,
+                "bytes_served": self.bytes_served,
+                "throttled_s": round(self.bucket.waited_s, 3),
+                "dropped_jobs": self.dropped_jobs,
+                "digests_ignored": self.digests_ignored,
+                "errors": self.errors,
+            }
+
+    # --- INTERNI ---
+
+    def _submit(self, func, *args):
+        try:
+            self._jobs.put_nowait((func, args))
+        except queue.Full:
+            with self._lock:
+                self.dropped_jobs += 1
+
+    def _later(self, delay: float, func, *args):
+        """Da chiamare dal thread di lavoro: esegue il job tra `delay` secondi."""
+        heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), func, args))
+
+    def _run(self):
+        while not self._stop.is_set():
+            while self._delayed and self._delayed[0][0] <= time.monotonic():
+                _, _, func, args = heapq.heappop(self._delayed)
+                self._execute(func, args)
+            timeout = max(0.0, self._delayed[0][0] - time.monotonic()) if self._delayed else None
+            try:
+                job = self._jobs.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if job is _STOP:
+                return
+            self._execute(*job)
+
+    def _execute(self, func, args):
+        try:
+            func(*args)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.debug(f"[ANTI-ENTROPY] {func.__name__} fallito: {e}")
+
+    def _since(self) -> str:
+        return time.strftime(TIMESTAMP_FORMAT, time.localtime(time.time() - self.window_seconds))
+
+    def local_digest(self) -> Dict[str, Tuple[int, int]]:
+        now = time.monotonic()
+        if self._digest is None or now - self._digest_at > DIGEST_TTL_S:
+            self._digest = self._load_digest(self._since())
+            self._digest_at = now
+        return self._digest
+
+    def _load_digest(self, since: str) -> Dict[str, Tuple[int, int]]:
+        return build_digest(iter_event_ids_since(since))
+
+    def _send_digest(self, peer):
+        digest = self.local_digest()
+        buckets = [[bucket, count, f"{xor:016x}"] for bucket, (count, xor) in sorted(digest.items())]
+        self.send(peer, "sync_digest", {"since": self._since(), "buckets": buckets})
+        with self._lock:
+            self.sessions += 1
+
+    def _compare_digest(self, peer, payload):
+        """Per i bucket in cui il peer differisce da noi gli mandiamo i nostri ID."""
+        if not isinstance(payload, dict):
+            return
+        remote = {}
+        for entry in (payload.get("buckets") or [])[:MAX_DIGEST_BUCKETS]:
+            if isinstance(entry, list) and len(entry) == 3 and isinstance(entry[0], str):
+                try:
+                    remote[entry[0]] = (int(entry[1]), int(entry[2], 16))
+                except (TypeError, ValueError):
+                    continue
+        since = payload.get("since")
+        since = since if isinstance(since, str) else self._since()
+
+        differing = [bucket for bucket, summary in sorted(self.local_digest().items())
+                     if bucket >= since[:BUCKET_PREFIX_LEN] and remote.get(bucket) != summary]
+        with self._lock:
+            self.buckets_differing += len(differing)
+
+        pending: List[str] = []
+        for bucket in differing:
+            pending.extend(self._load_bucket_ids(bucket))
+            while len(pending) >= MAX_INV_IDS:
+                self._offer(peer, pending[:MAX_INV_IDS])
+                pending = pending[MAX_INV_IDS:]
+        if pending:
+            self._offer(peer, pending)
+
+    def _load_bucket_ids(self, bucket: str) -> List[str]:
+        return get_event_ids_with_prefix(bucket)
+
+    def _offer(self, peer, ids: List[str]):
+        self.send(peer, "sync_ids", {"ids": ids})
+        with self._lock:
+            self.ids_offered += len(ids)
+
+    def _pull_missing(self, peer, ids):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._requested) > 100_000:
+                self._requested = {i: entry for i, entry in self._requested.items() if entry[0] > now}
+            ids = [i for i in ids[:MAX_INV_IDS]
+                   if isinstance(i, str) and self._requested.get(i, (0, None))[0] <= now]
+        known = self._known_ids(ids)
+        missing = [i for i in ids if i not in known]
+        deadline = now + SYNC_REQUEST_TIMEOUT_S
+        with self._lock:
+            for i in missing:
+                self._requested[i] = (deadline, peer)
+        if missing:
+            self.send(peer, "sync_pull", {"ids": missing})
+            with self._lock:
+                self.ids_pulled += len(missing)
+
+    def _known_ids(self, ids: List[str]) -> set:
+        return get_known_event_ids(ids)
+
+    def _load_payloads(self, ids: List[str]) -> List[dict]:
+        return get_event_payloads(ids)
+
+    def _peer_bucket(self, peer) -> TokenBucket:
+        with self._lock:
+            bucket = self._peer_buckets.get(peer)
+            if bucket is None:
+                rate = self.peer_rate_bytes
+                bucket = self._peer_buckets[peer] = TokenBucket(rate, burst=rate)
+            return bucket
+
+    def _serve(self, peer, ids):
+        """
+        Streaming dei body richiesti, un blocco per job: il resto torna in coda dietro ai
+        job degli altri peer. Il blocco parte quando la banda del peer e quella totale lo permettono.
+        """
+        ids = [i for i in ids[:MAX_INV_IDS] if isinstance(i, str)]
+        while ids:
+            if self._stop.is_set() or not self.is_connected(peer):
+                return
+            chunk, ids = ids[:self.chunk_events], ids[self.chunk_events:]
+            events = self._load_payloads(chunk)
+            if not events:
+                continue
+            size = sum(estimate_size(e) for e in events)
+            wait = self._peer_bucket(peer).reserve(size)
+            if wait > 0:
+                self._later(wait, self._send_chunk, peer, events, size, ids)
+            else:
+                self._send_chunk(peer, events, size, ids)
+            return
+
+    def _send_chunk(self, peer, events: List[dict], size: int, rest: List[str]):
+        if self._stop.is_set() or not self.is_connected(peer):
+            return
+        if not self.bucket.consume(size, stop=self._stop):
+            return
+        self.send(peer, "sync_events", {"events": events})
+        with self._lock:
+            self.events_served += len(events)
+            self.bytes_served += size
+        if rest:
+            self._submit(self._serve, peer, rest)
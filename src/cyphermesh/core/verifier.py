@@ -0,0 +1,224 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from cyphermesh.crypto import verify_signature
+from cyphermesh.models import ThreatEvent
+
+# Sentinella per fermare i thread dello stage
+_STOP = object()
+
+
+def _verify_batch(items: List[Tuple[str, str, str, Optional[str]]]) -> List[bool]:
+    """
+    Verifica un batch di (payload, firma, pubkey PEM, schema).
+    Funzione di modulo così può girare anche in un ProcessPoolExecutor.
+    """
+    return [
+        bool(signature and pubkey) and verify_signature(payload, signature, pubkey, scheme=scheme)
+        for payload, signature, pubkey, scheme in items
+    ]
+
+
+class VerificationPool:
+    """
+    Stage di verifica delle firme.
+
+    Gli eventi entrano in una coda limitata (submit blocca quando è piena: backpressure
+    verso chi legge dai socket), un dispatcher li raggruppa in batch e li manda al pool
+    di thread o processi, un thread di consegna riceve i risultati e chiama `on_verified`
+    nello stesso ordine di arrivo. Se un worker fallisce gli eventi del batch non sono
+    né validi né invalidi: vanno a `on_unverified` (il pool rotto viene ricreato).
+    """
+
+    def __init__(self, on_verified: Callable[[ThreatEvent, bool, Any], None],
+                 workers: int = 4, mode: str = "thread",
+                 batch_size: int = 64, max_pending: int = 10_000,
+                 on_unverified: Optional[Callable[[ThreatEvent, Any], None]] = None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Modalità di verifica non valida: {mode}")
+        self.on_verified = on_verified
+        self.on_unverified = on_unverified
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.batch_size = max(1, batch_size)
+
+        self._incoming: queue.Queue = queue.Queue(maxsize=max_pending)
+        # Batch inviati al pool, in ordine di invio (limitato per non accumulare futures)
+        self._in_flight: queue.Queue = queue.Queue(maxsize=self.workers * 2)
+        self._executor: Optional[Executor] = None
+        self._broken = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.verified = 0
+        self.invalid = 0
+        self.batches = 0
+        self.errors = 0
+        self.unverified = 0        # Eventi scartati perché il worker è fallito
+        self.restarts = 0
+        self.latency_ms = 0.0      # Media mobile esponenziale submit -> consegna
+        self.latency_ms_max = 0.0
+        self.blocked_submits = 0   # Submit che hanno trovato la coda piena
+
+    def start(self):
+        if self._executor is not None:
+            return
+        self._executor = self._new_executor()
+        self._broken.clear()
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, name="verify-dispatch", daemon=True),
+            threading.Thread(target=self._delivery_loop, name="verify-delivery", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Consegna gli eventi già accodati e ferma lo stage."""
+        if self._executor is None:
+            return
+        self._incoming.put(_STOP)
+        for t in self._threads:
+            t.join(timeout)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def _new_executor(self) -> Executor:
+        if self.mode == "process":
+            # "spawn": i worker non ereditano socket e thread del nodo (con fork
+            # un worker orfano terrebbe occupata la porta TCP)
+            return ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="verify")
+
+    def _replace_executor(self):
+        """Un pool rotto (es. processo worker terminato) fallisce ogni batch: lo si ricrea."""
+        old, self._executor = self._executor, self._new_executor()
+        self._broken.clear()
+        with self._lock:
+            self.restarts += 1
+        old.shutdown(wait=False)
+
+    def submit(self, event: ThreatEvent, context: Any = None):
+        """Accoda un evento da verificare. Blocca se la coda è piena."""
+        item = (event, context, time.monotonic())
+        try:
+            self._incoming.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.blocked_submits += 1
+            self._incoming.put(item)
+        with self._lock:
+            self.submitted += 1
+
+    def _dispatch_loop(self):
+        while True:
+            first = self._incoming.get()
+            if first is _STOP:
+                self._in_flight.put(_STOP)
+                return
+
+            # Raccoglie quello che è già in coda, fino a batch_size
+            batch = [first]
+            stop_after = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._incoming.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop_after = True
+                    break
+                batch.append(item)
+
+            work = [
+                (event.get_canonical_payload(), event.signature, event.reporter_pubkey, event.sig_scheme)
+                for event, _, _ in batch
+            ]
+            if self._broken.is_set():
+                self._replace_executor()
+            try:
+                future = self._executor.submit(_verify_batch, work)
+            except BrokenExecutor:
+                self._replace_executor()
+                future = self._executor.submit(_verify_batch, work)
+            self._in_flight.put((batch, future))
+
+            if stop_after:
+                self._in_flight.put(_STOP)
+                return
+
+    def _delivery_loop(self):
+        while True:
+            entry = self._in_flight.get()
+            if entry is _STOP:
+                return
+            batch, future = entry
+            try:
+                results = future.result()
+            except Exception as e:
+                # Worker fallito (es. processo terminato): le firme non sono state verificate,
+                # quindi niente salvataggio né penalità per i reporter
+                with self._lock:
+                    self.errors += 1
+                    self.unverified += len(batch)
+                    self.batches += 1
+                if isinstance(e, BrokenExecutor):
+                    self._broken.set()
+                self._deliver_unverified(batch)
+                continue
+
+            now = time.monotonic()
+            for (event, context, submitted_at), is_valid in zip(batch, results):
+                event.valid_signature = is_valid
+                self._record(is_valid, (now - submitted_at) * 1000)
+                try:
+                    self.on_verified(event, is_valid, context)
+                except Exception:
+                    with self._lock:
+                        self.errors += 1
+            with self._lock:
+                self.batches += 1
+
+    def _deliver_unverified(self, batch: List):
+        if self.on_unverified is None:
+            return
+        for event, context, _ in batch:
+            try:
+                self.on_unverified(event, context)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+
+    def _record(self, is_valid: bool, latency_ms: float):
+        with self._lock:
+            self.verified += 1
+            if not is_valid:
+                self.invalid += 1
+            self.latency_ms = latency_ms if self.verified == 1 else 0.9 * self.latency_ms + 0.1 * latency_ms
+            self.latency_ms_max = max(self.latency_ms_max, latency_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "workers": self.workers,
+                "queue_depth": self._incoming.qsize(),
+                "in_flight_batches": self._in_flight.qsize(),
+                "submitted": self.submitted,
+                "verified": self.verified,
+                "invalid": self.invalid,
+                "batches": self.batches,
+                "avg_batch": round(self.verified / self.batches, 2) if self.batches else 0.0,
+                "blocked_submits": self.blocked_submits,
+                "errors": self.errors,
+                "unverified": self.unverified,
+                "restarts": self.restarts,
+                "latency_ms": round(self.latency_ms, 3),
+                "latency_ms_max": round(self.latency_ms_max, 3),
+            }
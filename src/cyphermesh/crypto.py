@@ -1,22 +1,128 @@
 from cryptography.hazmat.primitives import serialization, hashes
-from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.hazmat.primitives.asymmetric import padding, rsa, ed25519
 import base64
+import hashlib
 import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Union
 from cyphermesh.config import *
-from pathlib import Path
 from cyphermesh.logger import logger
 
+# RSA-PSS parameters are immutable: build them once instead of per call
+_PSS_PADDING = padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+_PSS_HASH = hashes.SHA256()
+
+# Signature schemes carried in ThreatEvent.sig_scheme
+SCHEME_RSA_PSS = "rsa-pss-sha256"
+SCHEME_ED25519 = "ed25519"
+
+# Key type (CYPHER_KEY_TYPE / cyphermesh-reset --key-type) -> signature scheme
+KEY_TYPES = {
+    "rsa": SCHEME_RSA_PSS,
+    "ed25519": SCHEME_ED25519,
+}
+
+
+def scheme_for_key(key) -> Optional[str]:
+    """Return the signature scheme matching a private or public key object."""
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return SCHEME_ED25519
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return SCHEME_RSA_PSS
+    return None
+
+
+def _sign_raw(private_key, data: bytes) -> bytes:
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        return private_key.sign(data)
+    return private_key.sign(data, _PSS_PADDING, _PSS_HASH)
+
+
+def _verify_raw(public_key, signature: bytes, data: bytes):
+    """Raise InvalidSignature if `signature` does not match; the scheme follows the key type."""
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        public_key.verify(signature, data)
+    else:
+        public_key.verify(signature, data, _PSS_PADDING, _PSS_HASH)
+
+
+def pubkey_fingerprint(pubkey_pem: Union[str, bytes]) -> str:
+    """Return the SHA-256 hex fingerprint of a PEM-encoded public key."""
+    if isinstance(pubkey_pem, str):
+        pubkey_pem = pubkey_pem.encode()
+    return hashlib.sha256(pubkey_pem).hexdigest()
+
+
+class PublicKeyCache:
+    """
+    Thread-safe LRU cache of parsed public key objects, indexed by PEM fingerprint.
+    A small set of reporters sends most events, so this skips PEM parsing on the hot path.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pubkey_pem: Union[str, bytes]):
+        """Return the parsed key for `pubkey_pem`, loading and caching it on a miss."""
+        if isinstance(pubkey_pem, str):
+            pubkey_pem = pubkey_pem.encode()
+        fingerprint = hashlib.sha256(pubkey_pem).hexdigest()
+
+        with self._lock:
+            key = self._keys.get(fingerprint)
+            if key is not None:
+                self._keys.move_to_end(fingerprint)
+                self.hits += 1
+                return key
+            self.misses += 1
+
+        # Parsing happens outside the lock; invalid keys raise and are not cached
+        key = serialization.load_pem_public_key(pubkey_pem)
+        if self.max_size > 0:
+            with self._lock:
+                self._keys[fingerprint] = key
+                if len(self._keys) > self.max_size:
+                    self._keys.popitem(last=False)
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._keys),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+PUBKEY_CACHE = PublicKeyCache(PUBKEY_CACHE_SIZE)
+
 
 def ensure_keys_exist():
     if not (os.path.exists(PRIVATE_KEY_PATH) and os.path.exists(PUBLIC_KEY_PATH)):
-        logger.info("[*] RSA keys not found. Generating...")
+        logger.info(f"[*] Keys not found. Generating ({KEY_TYPE})...")
         generate_keys()
         logger.info("[✓] Keys generated in 'keys/'.")
 
 
-def generate_keys():
-    """Generate a couple of RSA keys and saves them in ~/.cyphermesh/keys/"""
-    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+def generate_keys(key_type: str = KEY_TYPE):
+    """Generate a key pair ("rsa" or "ed25519") and saves it in ~/.cyphermesh/keys/"""
+    if key_type not in KEY_TYPES:
+        raise ValueError(f"Unsupported key type: {key_type}")
+    if key_type == "ed25519":
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    KEY_DIR.mkdir(parents=True, exist_ok=True)
     with open(PRIVATE_KEY_PATH, "wb") as f:
         f.write(private_key.private_bytes(
             encoding=serialization.Encoding.PEM,
@@ -29,6 +135,9 @@ def generate_keys():
             encoding=serialization.Encoding.PEM,
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         ))
+    # A running identity must pick up the new key pair on next use
+    if _identity is not None:
+        _identity.reload()
 
 
 def load_private_key():
@@ -43,27 +152,132 @@ def load_public_key():
         return serialization.load_pem_public_key(f.read())
 
 
+class NodeIdentity:
+    """
+    Key material of this node, read from disk once and kept in memory.
+    Loading is lazy and guarded by a lock; signing with the loaded key is thread-safe.
+    """
+
+    def __init__(self):
+        # Reentrant: key generation inside _load() calls reload() on this identity
+        self._lock = threading.RLock()
+        self._private_key = None
+        self._public_pem: Optional[str] = None
+        self._scheme: Optional[str] = None
+        self._public_key = None
+
+    def _load(self):
+        with self._lock:
+            if self._private_key is None:
+                ensure_keys_exist()
+                private_key = load_private_key()
+                with open(PUBLIC_KEY_PATH, "rb") as f:
+                    self._public_pem = f.read().decode('utf-8')
+                self._scheme = scheme_for_key(private_key)
+                self._public_key = private_key.public_key()
+                self._private_key = private_key
+        return self._private_key
+
+    def reload(self):
+        """Drop cached key material; it is read again from disk on next use."""
+        with self._lock:
+            self._private_key = None
+            self._public_pem = None
+            self._scheme = None
+            self._public_key = None
+
+    @property
+    def private_key(self):
+        return self._private_key or self._load()
+
+    @property
+    def public_key(self):
+        if self._public_key is None:
+            self._load()
+        return self._public_key
+
+    @property
+    def public_pem(self) -> str:
+        if self._public_pem is None:
+            self._load()
+        return self._public_pem
+
+    @property
+    def scheme(self) -> str:
+        """Signature scheme of the loaded key (SCHEME_RSA_PSS or SCHEME_ED25519)."""
+        if self._scheme is None:
+            self._load()
+        return self._scheme
+
+    @property
+    def fingerprint(self) -> str:
+        return pubkey_fingerprint(self.public_pem)
+
+    def sign(self, data: str) -> str:
+        """Sign `data` and return the signature encoded in base64."""
+        return base64.b64encode(_sign_raw(self.private_key, data.encode())).decode()
+
+    def sign_many(self, payloads: Iterable[str]) -> List[str]:
+        """Sign a batch of payloads with a single key lookup; signatures keep input order."""
+        private_key = self.private_key
+        b64encode = base64.b64encode
+        return [b64encode(_sign_raw(private_key, data.encode())).decode() for data in payloads]
+
+    def verify_many(self, payloads: Iterable[str], signatures: Iterable[Optional[str]]) -> List[bool]:
+        """
+        Check signatures that claim to be made with this node's key.
+        The public key is derived once from the loaded private key, so no PEM parsing or
+        cache lookup happens per signature.
+        """
+        public_key = self.public_key
+        results = []
+        for data, signature in zip(payloads, signatures):
+            try:
+                _verify_raw(public_key, base64.b64decode(signature), data.encode())
+                results.append(True)
+            except Exception:
+                results.append(False)
+        return results
+
+
+_identity: Optional[NodeIdentity] = None
+_identity_lock = threading.Lock()
+
+
+def get_identity() -> NodeIdentity:
+    """Return the process-wide identity of this node."""
+    global _identity
+    if _identity is None:
+        with _identity_lock:
+            if _identity is None:
+                _identity = NodeIdentity()
+    return _identity
+
+
 def sign_data(data: str) -> str:
     """Sign provided data using private key and return signature encoded in base64."""
-    private_key = load_private_key()
-    signature = private_key.sign(
-        data.encode(),
-        padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
-        hashes.SHA256()
-    )
-    return base64.b64encode(signature).decode()
+    return get_identity().sign(data)
 
 
-def verify_signature(data: str, signature: str, pubkey_pem: bytes) -> bool:
-    """Verify data signature using public key provided in PEM format."""
+def verify_signature(data: str, signature: str, pubkey_pem: Union[str, bytes],
+                     key_cache: Optional[PublicKeyCache] = PUBKEY_CACHE,
+                     scheme: Optional[str] = None) -> bool:
+    """
+    Verify data signature using public key provided in PEM format.
+    Parsed keys are reused through `key_cache` (pass None to always parse the PEM).
+    The scheme follows the key type; if `scheme` is given it must match the key.
+    """
     try:
-        pubkey = serialization.load_pem_public_key(pubkey_pem)
-        pubkey.verify(
-            base64.b64decode(signature),
-            data.encode(),
-            padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
-            hashes.SHA256()
-        )
+        if key_cache is not None:
+            pubkey = key_cache.get(pubkey_pem)
+        else:
+            if isinstance(pubkey_pem, str):
+                pubkey_pem = pubkey_pem.encode()
+            pubkey = serialization.load_pem_public_key(pubkey_pem)
+        key_scheme = scheme_for_key(pubkey)
+        if scheme is not None and scheme != key_scheme:
+            return False
+        _verify_raw(pubkey, base64.b64decode(signature), data.encode())
         return True
     except Exception:
         return False
@@ -71,10 +285,14 @@ def verify_signature(data: str, signature: str, pubkey_pem: bytes) -> bool:
 # --- QUESTA È LA FUNZIONE CHE MANCAVA ---
 def load_own_pubkey_str() -> str:
     """
-    Helper function: legge la chiave pubblica dal disco e la restituisce come stringa.
+    Helper function: restituisce la chiave pubblica del nodo come stringa.
     Usata da models.py per popolare il campo 'reporter_pubkey'.
+    La chiave viene letta dal disco una sola volta (vedi NodeIdentity).
     """
-    ensure_keys_exist() # Assicuriamoci che esistano prima di leggere
-    with open(PUBLIC_KEY_PATH, "rb") as f:
-        return f.read().decode('utf-8')
+    return get_identity().public_pem
+
+
+def load_own_scheme() -> str:
+    """Signature scheme used by this node's key pair."""
+    return get_identity().scheme
     
\ No newline at end of file
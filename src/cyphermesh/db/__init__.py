@@ -2,14 +2,36 @@ from .core import init_db
 
 from .peers import (
     add_or_update_peer,
+    save_peers,
     get_all_peers,
     remove_node
 )
 
 from .events import (
     save_event,
+    save_events,
+    event_exists,
+    get_event_payloads,
+    get_event_ids_with_prefix,
+    get_known_event_ids,
+    iter_event_ids_since,
+    iter_event_ids,
     update_reputation,
     get_reputation,
     get_reputations,
     get_events,
 )
+
+from .reputation import ReputationStore, load_reputations
+
+from .writer import EventWriter
+
+from .query import (
+    EventFilter,
+    Page,
+    query_events,
+    count_events,
+    top_values,
+    top_source_ips,
+    counts_by_bucket,
+)
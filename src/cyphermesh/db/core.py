@@ -1,80 +1,191 @@
 import sqlite3
-from pathlib import Path
+import queue
+import socket
+import threading
 from contextlib import contextmanager
 from cyphermesh.logger import logger
 from cyphermesh.config import *
-import os
+from cyphermesh.db.migrations import apply_migrations
 
 def init_db():
     """
-    Inizializza il database, crea le tabelle e abilita WAL mode.
-    Da chiamare all'avvio dell'applicazione.
+    Inizializza il database, abilita WAL mode e porta lo schema all'ultima versione
+    (vedi db.migrations). Da chiamare all'avvio dell'applicazione.
     """
     try:
-        with get_db_connection() as conn:
+        conn = get_db_connection()
+        try:
             # Abilita Write-Ahead Logging per migliore concorrenza
             conn.execute("PRAGMA journal_mode=WAL;")
-
-            # Tabella Peers
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS peers (
-                    ip TEXT NOT NULL,
-                    port INTEGER NOT NULL,
-                    last_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (ip, port)
-                )
-            """)
-
-            # Tabella Eventi
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS events (
-                    id TEXT PRIMARY KEY,
-                    source_ip TEXT,
-                    threat_type TEXT,
-                    severity TEXT,
-                    timestamp TEXT,
-                    reporter_pubkey TEXT,
-                    signature TEXT,
-                    valid_signature INTEGER
-                )
-            """)
-
-            # Tabella Reputazione
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS reputation (
-                    pubkey TEXT PRIMARY KEY,
-                    score INTEGER DEFAULT 0
-                )
-            """)
-            logger.info("[DB] Database inizializzato (WAL mode enabled).")
+            version = apply_migrations(conn)
+        finally:
+            conn.close()
+        logger.info(f"[DB] Database inizializzato (WAL mode enabled, schema v{version}).")
     except Exception as e:
         logger.error(f"[DB INIT ERROR] {e}")
 
 
+# Prefisso IPv4-mapped (::ffff:0:0/96): IPv4 e IPv6 condividono lo stesso spazio di chiavi
+_IPV4_MAPPED_PREFIX = b"\x00" * 10 + b"\xff\xff"
+
+
+def ip_key(ip):
+    """
+    Chiave binaria di un IP, ordinata come gli indirizzi: 16 byte, IPv4 come ::ffff:a.b.c.d.
+    Una CIDR diventa un intervallo di chiavi (vedi db.query), servito dall'indice su ip_key.
+    Restituisce None se il testo non è un indirizzo IP.
+    """
+    if not isinstance(ip, str):
+        return None
+    try:
+        return _IPV4_MAPPED_PREFIX + socket.inet_pton(socket.AF_INET, ip)
+    except OSError:
+        pass
+    try:
+        return socket.inet_pton(socket.AF_INET6, ip)
+    except OSError:
+        return None
+
+
 def get_db_connection():
     """
-    Restituisce una connessione configurata con timeout alto e Row factory.
+    Restituisce una nuova connessione configurata con timeout alto e Row factory.
+    Le PRAGMA di tuning vengono applicate qui, una volta per connessione.
     """
-    # timeout=30.0 significa che aspetterà fino a 30 secondi se il file è
-    # bloccato prima di lanciare un errore.
-    conn = sqlite3.connect(str(DB_PATH), timeout=30.0)
+    # busy_timeout: aspetta fino a DB_BUSY_TIMEOUT_MS se il file è bloccato
+    # prima di lanciare un errore. check_same_thread=False perché le connessioni
+    # del pool passano da un thread all'altro (mai in uso da due thread insieme).
+    conn = sqlite3.connect(
+        str(DB_PATH),
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_STATEMENT_CACHE,
+        check_same_thread=False,
+    )
 
     # Permette di accedere alle colonne per nome (row['ip'])
     conn.row_factory = sqlite3.Row
+    # ip_key() anche in SQL (backfill della migrazione 5, query manuali)
+    conn.create_function("ip_key", 1, ip_key, deterministic=True)
+
+    conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)};")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS};")
+    conn.execute(f"PRAGMA cache_size={int(DB_CACHE_SIZE)};")
+    conn.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE)};")
+    conn.execute(f"PRAGMA temp_store={DB_TEMP_STORE};")
     return conn
 
 
+class ConnectionPool:
+    """
+    Pool limitato di connessioni a lunga vita.
+    Evita connect + setup a ogni query e mantiene calda la cache degli statement preparati.
+    Se il pool è esaurito si aspetta al massimo `timeout` secondi, poi la query fallisce
+    (una connessione mai restituita non blocca per sempre tutti gli altri thread).
+    """
+
+    def __init__(self, size: int, timeout: float = 30.0):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        # Connessioni in uso, e quelle da chiudere al rilascio perché in uso durante close_all
+        self._in_use = set()
+        self._retired = set()
+        self._lock = threading.Lock()
+        self.timeouts = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        conn = self._take()
+        with self._lock:
+            self._in_use.add(conn)
+        return conn
+
+    def _take(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return get_db_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        # Pool esaurito: si aspetta che un altro thread restituisca una connessione
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise sqlite3.OperationalError(
+                f"Nessuna connessione libera nel pool dopo {self.timeout:g}s ({self.size} in uso)"
+            )
+
+    def release(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._in_use.discard(conn)
+            retired = conn in self._retired
+            self._retired.discard(conn)
+        if retired:
+            self._close(conn)
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close_all(self):
+        """
+        Chiude le connessioni inattive; quelle in uso vengono chiuse quando sono rilasciate.
+        Il pool resta utilizzabile: le richieste successive aprono connessioni nuove.
+        """
+        with self._lock:
+            self._retired.update(self._in_use)
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+
+    def _close(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size, "created": self._created, "idle": self._idle.qsize(),
+                    "in_use": len(self._in_use), "timeouts": self.timeouts}
+
+
+_pool = ConnectionPool(DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT_S)
+
+
+def get_pool() -> ConnectionPool:
+    return _pool
+
+
 @contextmanager
 def db_cursor(commit=False):
     """
-    Helper per gestire apertura/chiusura e commit automatici.
+    Helper per gestire commit automatici su una connessione presa dal pool.
     Uso:
     with db_cursor(commit=True) as cur:
         cur.execute(...)
     """
-    conn = get_db_connection()
+    conn = _pool.acquire()
+    cur = conn.cursor()
     try:
-        yield conn.cursor()
+        yield cur
         if commit:
             conn.commit()
     except Exception as e:
@@ -83,4 +194,5 @@ def db_cursor(commit=False):
         logger.error(f"[DB QUERY ERROR] {e}")
         raise e
     finally:
-        conn.close()
+        cur.close()
+        _pool.release(conn)
@@ -1,6 +1,51 @@
-from cyphermesh.db.core import db_cursor
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from cyphermesh.db.core import db_cursor, ip_key
 from cyphermesh.models import ThreatEvent
 
+INSERT_EVENT_SQL = """
+    INSERT OR IGNORE INTO events (
+        id, source_ip, threat_type, severity, timestamp,
+        reporter_pubkey, signature, valid_signature, ip_key, received_at
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def event_row(event: ThreatEvent, received_at: Optional[float] = None) -> tuple:
+    """
+    Tupla dei parametri di INSERT_EVENT_SQL per un evento. `received_at` (secondi epoch,
+    default adesso) è l'istante in cui lo salva questo nodo: la retention si basa su quello,
+    non sul timestamp scelto dal reporter.
+    """
+    return (
+        event.id,
+        event.source_ip,
+        event.threat_type,
+        event.severity,
+        event.timestamp,
+        event.reporter_pubkey,
+        event.signature,
+        int(event.valid_signature), # SQLite non ha bool nativo
+        ip_key(event.source_ip),
+        received_at or time.time(),
+    )
+
+
+def insert_events(cur, events: Iterable[ThreatEvent]):
+    """Inserisce più eventi con un solo executemany sul cursore (transazione del chiamante)."""
+    now = time.time()
+    cur.executemany(INSERT_EVENT_SQL, [event_row(e, now) for e in events])
+
+
+def apply_reputation_deltas(cur, deltas: Dict[str, int]):
+    """Applica delta di reputazione già aggregati per pubkey (transazione del chiamante)."""
+    items = [(pubkey, delta) for pubkey, delta in deltas.items() if delta]
+    cur.executemany("INSERT OR IGNORE INTO reputation (pubkey, score) VALUES (?, 0)",
+                    [(pubkey,) for pubkey, _ in items])
+    cur.executemany("UPDATE reputation SET score = score + ? WHERE pubkey = ?",
+                    [(delta, pubkey) for pubkey, delta in items])
+
 
 def save_event(event: ThreatEvent):
     """
@@ -8,22 +53,92 @@ def save_event(event: ThreatEvent):
     La proprietà valid_signature deve essere già stata settata.
     """
     with db_cursor(commit=True) as cur:
-        cur.execute("""
-        INSERT OR IGNORE INTO events (
-            id, source_ip, threat_type, severity, timestamp,
-            reporter_pubkey, signature, valid_signature
+        cur.execute(INSERT_EVENT_SQL, event_row(event))
+
+
+def save_events(events: Iterable[ThreatEvent]):
+    """Salva un blocco di eventi in un'unica transazione."""
+    with db_cursor(commit=True) as cur:
+        insert_events(cur, events)
+
+
+def event_exists(event_id: str) -> bool:
+    """Controlla nel DB se un evento esiste già."""
+    with db_cursor(commit=False) as cur:
+        cur.execute("SELECT 1 FROM events WHERE id = ?", (event_id,))
+        return cur.fetchone() is not None
+
+
+def iter_event_ids(batch_size: int = 10_000):
+    """
+    Restituisce gli ID di tutti gli eventi in ordine di inserimento (dal più vecchio),
+    leggendoli a blocchi per non caricare tutta la tabella in memoria.
+    """
+    with db_cursor(commit=False) as cur:
+        cur.execute("SELECT id FROM events ORDER BY rowid")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row["id"]
+
+
+def get_event_payloads(event_ids: Iterable[str]) -> List[dict]:
+    """
+    Eventi validi con gli ID richiesti, nel formato di rete (ThreatEvent.to_json).
+    Usato per rispondere ai getdata quando l'evento non è più in memoria.
+    """
+    event_ids = list(event_ids)
+    if not event_ids:
+        return []
+    placeholders = ",".join("?" * len(event_ids))
+    with db_cursor(commit=False) as cur:
+        cur.execute(f"""
+            SELECT id, source_ip, threat_type, severity, timestamp, reporter_pubkey, signature
+            FROM events
+            WHERE id IN ({placeholders}) AND valid_signature = 1
+        """, event_ids)
+        return [dict(row) for row in cur.fetchall()]
+
+
+def iter_event_ids_since(since: str, batch_size: int = 10_000) -> Iterator[Tuple[str, str]]:
+    """Coppie (timestamp, id) degli eventi validi con timestamp >= since, a blocchi."""
+    with db_cursor(commit=False) as cur:
+        cur.execute(
+            "SELECT timestamp, id FROM events WHERE timestamp >= ? AND valid_signature = 1",
+            (since,)
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            event.id,
-            event.source_ip,
-            event.threat_type,
-            event.severity,
-            event.timestamp,
-            event.reporter_pubkey,
-            event.signature,
-            int(event.valid_signature) # SQLite non ha bool nativo
-        ))
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row["timestamp"], row["id"]
+
+
+def get_event_ids_with_prefix(prefix: str) -> List[str]:
+    """
+    ID degli eventi validi il cui timestamp inizia con `prefix` (es. "2024-05-01 13" = un'ora).
+    Il range [prefix, prefix + "~") sfrutta l'indice su timestamp.
+    """
+    with db_cursor(commit=False) as cur:
+        cur.execute(
+            "SELECT id FROM events WHERE timestamp >= ? AND timestamp < ? AND valid_signature = 1",
+            (prefix, prefix + "~")
+        )
+        return [row["id"] for row in cur.fetchall()]
+
+
+def get_known_event_ids(event_ids: Iterable[str]) -> Set[str]:
+    """Sottoinsieme degli ID già presenti nel DB (validi o no)."""
+    event_ids = list(event_ids)
+    if not event_ids:
+        return set()
+    placeholders = ",".join("?" * len(event_ids))
+    with db_cursor(commit=False) as cur:
+        cur.execute(f"SELECT id FROM events WHERE id IN ({placeholders})", event_ids)
+        return {row["id"] for row in cur.fetchall()}
 
 
 def update_reputation(pubkey: str, delta: int):
@@ -0,0 +1,172 @@
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from cyphermesh.logger import logger
+
+# Oltre questa dimensione la migrazione 3 non lancia il VACUUM all'avvio (vedi enable_incremental_vacuum)
+AUTO_VACUUM_MAX_BYTES = 64 * 1024 * 1024
+
+# TIMESTAMP_FORMAT (models) come pattern GLOB di SQLite
+TIMESTAMP_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]"
+
+
+@dataclass
+class Migration:
+    """
+    Un passo dello schema. La versione corrente è salvata in PRAGMA user_version.
+    `transactional=False` per i comandi che SQLite non accetta in una transazione (es. VACUUM).
+    `run`, se presente, viene chiamata con la connessione dopo gli statement.
+    """
+    version: int
+    description: str
+    statements: List[str]
+    transactional: bool = True
+    run: Optional[Callable[[sqlite3.Connection], None]] = None
+
+
+def database_bytes(conn: sqlite3.Connection) -> int:
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection):
+    """
+    Passa il DB ad auto_vacuum incrementale (la retention poi libera spazio con
+    PRAGMA incremental_vacuum). Il cambio vale solo dopo un VACUUM completo, che riscrive
+    il file: blocca il DB per tutta la durata e chiede temporaneamente il doppio dello spazio.
+    """
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def _maybe_enable_incremental_vacuum(conn: sqlite3.Connection):
+    """Migrazione 3: VACUUM all'avvio solo sui DB piccoli, sugli altri lo si lancia a mano."""
+    size = database_bytes(conn)
+    if size <= AUTO_VACUUM_MAX_BYTES:
+        enable_incremental_vacuum(conn)
+        return
+    logger.warning(
+        f"[DB] auto_vacuum incrementale non attivato: il DB è di {size / 2**20:.0f} MiB e il VACUUM "
+        f"bloccherebbe l'avvio. Lancia cyphermesh-vacuum a nodo fermo (serve altrettanto spazio libero)."
+    )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "schema iniziale", [
+        """
+        CREATE TABLE IF NOT EXISTS peers (
+            ip TEXT NOT NULL,
+            port INTEGER NOT NULL,
+            last_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (ip, port)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS events (
+            id TEXT PRIMARY KEY,
+            source_ip TEXT,
+            threat_type TEXT,
+            severity TEXT,
+            timestamp TEXT,
+            reporter_pubkey TEXT,
+            signature TEXT,
+            valid_signature INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS reputation (
+            pubkey TEXT PRIMARY KEY,
+            score INTEGER DEFAULT 0
+        )
+        """,
+    ]),
+    Migration(2, "indici su events", [
+        "CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_events_source_ip ON events (source_ip)",
+        "CREATE INDEX IF NOT EXISTS idx_events_reporter ON events (reporter_pubkey)",
+        "CREATE INDEX IF NOT EXISTS idx_events_threat_type ON events (threat_type)",
+    ]),
+    # auto_vacuum cambia solo dopo un VACUUM completo: su un DB piccolo lo paghiamo qui una
+    # volta sola, su uno grande si lancia a mano (cyphermesh-vacuum). Poi la retention libera
+    # spazio con PRAGMA incremental_vacuum.
+    Migration(3, "auto_vacuum incrementale", [], transactional=False,
+              run=_maybe_enable_incremental_vacuum),
+    # Istante dell'ultimo aggiornamento: il decadimento della reputazione si calcola da qui
+    Migration(4, "reputazione con decadimento", [
+        "ALTER TABLE reputation ADD COLUMN updated_at REAL",
+    ]),
+    # Indici per db.query: ogni filtro ha un indice composto che finisce con timestamp, così
+    # filtro + ordinamento per data (paginazione keyset) sono un solo range scan. L'indice su
+    # timestamp copre anche IP (testo e ip_key), tipo e severità: gli aggregati su una finestra
+    # di tempo non leggono la tabella. ip_key (db.core.ip_key) rende le CIDR un intervallo di chiavi.
+    Migration(5, "indici per filtri e aggregati", [
+        "ALTER TABLE events ADD COLUMN ip_key BLOB",
+        "UPDATE events SET ip_key = ip_key(source_ip)",
+        "DROP INDEX IF EXISTS idx_events_timestamp",
+        "DROP INDEX IF EXISTS idx_events_source_ip",
+        "DROP INDEX IF EXISTS idx_events_reporter",
+        "DROP INDEX IF EXISTS idx_events_threat_type",
+        "CREATE INDEX idx_events_time ON events (timestamp, source_ip, threat_type, severity, ip_key)",
+        "CREATE INDEX idx_events_ip_time ON events (ip_key, timestamp)",
+        "CREATE INDEX idx_events_type_time ON events (threat_type, timestamp)",
+        "CREATE INDEX idx_events_severity_time ON events (severity, timestamp)",
+        "CREATE INDEX idx_events_reporter_time ON events (reporter_pubkey, timestamp)",
+    ]),
+    # Istante di ricezione locale (secondi epoch): il timestamp lo sceglie il reporter, la
+    # retention no. Le righe esistenti partono dal loro timestamp (ora locale), mai nel futuro.
+    Migration(6, "istante di ricezione degli eventi", [
+        "ALTER TABLE events ADD COLUMN received_at REAL",
+        """
+        UPDATE events SET received_at = MIN(
+            COALESCE(CAST(strftime('%s', timestamp, 'utc') AS REAL), CAST(strftime('%s', 'now') AS REAL)),
+            CAST(strftime('%s', 'now') AS REAL)
+        )
+        """,
+        "CREATE INDEX idx_events_received ON events (received_at)",
+    ]),
+    # Gli aggregati e i bucket dell'anti-entropy leggono il prefisso del timestamp: le righe
+    # salvate prima della validazione in ingresso (ThreatEvent.from_dict) con un timestamp
+    # fuori formato non sono recuperabili (è firmato) e oggi verrebbero rifiutate: si eliminano
+    Migration(7, "eventi con timestamp non valido", [
+        f"DELETE FROM events WHERE timestamp IS NULL OR NOT timestamp GLOB '{TIMESTAMP_GLOB}'",
+    ]),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """Applica in ordine le migrazioni mancanti. Restituisce la versione finale dello schema."""
+    current = get_schema_version(conn)
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+
+        logger.info(f"[DB] Migrazione {migration.version}: {migration.description}")
+        if migration.transactional:
+            # BEGIN esplicito: il modulo sqlite3 non apre transazioni implicite per il DDL
+            conn.execute("BEGIN")
+            try:
+                for statement in migration.statements:
+                    conn.execute(statement)
+                if migration.run is not None:
+                    migration.run(conn)
+                conn.execute(f"PRAGMA user_version={migration.version}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        else:
+            if conn.in_transaction:
+                conn.commit()
+            for statement in migration.statements:
+                conn.execute(statement)
+            if migration.run is not None:
+                migration.run(conn)
+            conn.execute(f"PRAGMA user_version={migration.version}")
+        current = migration.version
+    return current
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Iterable, Tuple
 from cyphermesh.db.core import db_cursor
 
 
@@ -14,6 +15,19 @@ def add_or_update_peer(ip: str, port: int):
             DO UPDATE SET last_seen = ?
         """, (ip, port, datetime.now(), datetime.now()))
 
+def save_peers(rows: Iterable[Tuple[str, int, datetime]]):
+    """Upsert di più peer (ip, porta, last_seen) in una sola transazione."""
+    rows = list(rows)
+    if not rows:
+        return
+    with db_cursor(commit=True) as cur:
+        cur.executemany("""
+            INSERT INTO peers (ip, port, last_seen)
+            VALUES (?, ?, ?)
+            ON CONFLICT(ip, port)
+            DO UPDATE SET last_seen = excluded.last_seen
+        """, rows)
+
 def remove_node(ip: str, port: int):
     with db_cursor(commit=True) as cur:
         cur.execute("DELETE FROM peers WHERE ip = ? AND port = ?", (ip, port))
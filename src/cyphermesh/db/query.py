@@ -0,0 +1,203 @@
+import base64
+import ipaddress
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple, Union
+
+from cyphermesh.db.core import db_cursor, ip_key
+
+# Stesso formato di ThreatEvent: il confronto tra stringhe rispetta l'ordine temporale
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Intervalli degli aggregati -> lunghezza del prefisso del timestamp ("2025-04-16 14:30:00")
+BUCKETS = {
+    "minute": 16,
+    "hour": 13,
+    "day": 10,
+    "month": 7,
+}
+
+# Colonne per cui si possono raggruppare i conteggi
+GROUP_COLUMNS = ("source_ip", "threat_type", "severity")
+
+EVENT_COLUMNS = "id, source_ip, threat_type, severity, timestamp, reporter_pubkey, signature, valid_signature"
+
+MAX_PAGE_SIZE = 1000
+
+# Oltre questa ampiezza, una CIDR insieme a una finestra di tempo si cerca per tempo
+# (indice coprente su timestamp) invece che per intervallo di ip_key: SQLite non stima
+# quante righe cadono nell'intervallo e sceglierebbe ip_key anche per un /8 molto segnalato
+WIDE_NETWORK_ADDRESSES = 2 ** 16
+
+Values = Union[str, Sequence[str]]
+Timestamp = Union[str, datetime]
+
+
+@dataclass
+class EventFilter:
+    """
+    Filtri sugli eventi; i campi a None non filtrano. threat_type e severity accettano
+    anche una lista di valori. source_ip può essere un indirizzo o una CIDR ("10.0.0.0/8").
+    since è incluso, until escluso (stringhe nel formato del timestamp o datetime).
+    """
+    source_ip: Optional[str] = None
+    threat_type: Optional[Values] = None
+    severity: Optional[Values] = None
+    reporter: Optional[str] = None          # chiave pubblica PEM del reporter
+    since: Optional[Timestamp] = None
+    until: Optional[Timestamp] = None
+    valid_only: bool = False
+
+    def where(self) -> Tuple[str, list]:
+        """Clausola WHERE (senza la parola chiave, "1" se vuota) e parametri."""
+        clauses, params = [], []
+        if self.source_ip:
+            network = ipaddress.ip_network(self.source_ip.strip(), strict=False)
+            low, high = _network_keys(network)
+            if low == high:
+                clauses.append("ip_key = ?")
+                params.append(low)
+            else:
+                # "+ip_key" esclude l'indice su ip_key per questa condizione
+                wide = network.num_addresses > WIDE_NETWORK_ADDRESSES and self.since is not None
+                clauses.append(f"{'+' if wide else ''}ip_key BETWEEN ? AND ?")
+                params.extend((low, high))
+        for column, value in (("threat_type", self.threat_type), ("severity", self.severity)):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+        if self.reporter:
+            clauses.append("reporter_pubkey = ?")
+            params.append(self.reporter)
+        if self.since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(_timestamp(self.since))
+        if self.until is not None:
+            clauses.append("timestamp < ?")
+            params.append(_timestamp(self.until))
+        if self.valid_only:
+            clauses.append("valid_signature = 1")
+        return " AND ".join(clauses) or "1", params
+
+
+@dataclass
+class Page:
+    """Una pagina di risultati; `cursor` va passato alla richiesta successiva (None = finite)."""
+    events: List[dict]
+    cursor: Optional[str]
+
+
+def ip_range(value: str) -> Tuple[bytes, bytes]:
+    """Prima e ultima chiave (db.core.ip_key) di un indirizzo o di una CIDR."""
+    return _network_keys(ipaddress.ip_network(value.strip(), strict=False))
+
+
+def _network_keys(network) -> Tuple[bytes, bytes]:
+    return ip_key(str(network.network_address)), ip_key(str(network.broadcast_address))
+
+
+def _timestamp(value: Timestamp) -> str:
+    return value.strftime(TIMESTAMP_FORMAT) if isinstance(value, datetime) else str(value)
+
+
+def encode_cursor(received_at: float, rowid: int) -> str:
+    return base64.urlsafe_b64encode(f"{received_at!r}|{rowid}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        received_at, rowid = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return float(received_at), int(rowid)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Cursore non valido: {cursor!r}")
+
+
+def query_events(flt: Optional[EventFilter] = None, limit: int = 100,
+                 cursor: Optional[str] = None) -> Page:
+    """
+    Eventi dal più recente, una pagina alla volta (paginazione keyset su received_at, rowid):
+    l'ordine è quello di arrivo al nodo, non il timestamp scelto dal reporter, e ogni pagina
+    costa un range scan sull'indice, anche in fondo a milioni di righe.
+    """
+    where, params = (flt or EventFilter()).where()
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        where += " AND (received_at, rowid) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+    with db_cursor(commit=False) as cur:
+        cur.execute(f"""
+            SELECT rowid, received_at, {EVENT_COLUMNS}
+            FROM events
+            WHERE {where}
+            ORDER BY received_at DESC, rowid DESC
+            LIMIT ?
+        """, params + [limit + 1])
+        rows = cur.fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]["received_at"], rows[-1]["rowid"]) if more else None
+    events = []
+    for row in rows:
+        event = dict(row)
+        event.pop("rowid")
+        event.pop("received_at")
+        event["valid_signature"] = bool(event["valid_signature"])
+        events.append(event)
+    return Page(events, next_cursor)
+
+
+def count_events(flt: Optional[EventFilter] = None) -> int:
+    where, params = (flt or EventFilter()).where()
+    with db_cursor(commit=False) as cur:
+        cur.execute(f"SELECT COUNT(*) FROM events WHERE {where}", params)
+        return cur.fetchone()[0]
+
+
+def top_values(column: str = "source_ip", flt: Optional[EventFilter] = None,
+               limit: int = 10) -> List[Tuple[str, int]]:
+    """I valori più segnalati di una colonna (es. gli IP più riportati), con il conteggio."""
+    if column not in GROUP_COLUMNS:
+        raise ValueError(f"Colonna non raggruppabile: {column}")
+    where, params = (flt or EventFilter()).where()
+    with db_cursor(commit=False) as cur:
+        cur.execute(f"""
+            SELECT {column} AS value, COUNT(*) AS n
+            FROM events
+            WHERE {where}
+            GROUP BY {column}
+            ORDER BY n DESC, value
+            LIMIT ?
+        """, params + [max(1, limit)])
+        return [(row["value"], row["n"]) for row in cur.fetchall()]
+
+
+def top_source_ips(flt: Optional[EventFilter] = None, limit: int = 10) -> List[Tuple[str, int]]:
+    return top_values("source_ip", flt, limit)
+
+
+def counts_by_bucket(flt: Optional[EventFilter] = None, bucket: str = "hour",
+                     group_by: Optional[str] = None) -> List[tuple]:
+    """
+    Conteggi per intervallo di tempo ("minute", "hour", "day", "month"), in ordine di tempo:
+    righe (bucket, n) oppure, con group_by, (bucket, valore, n). Il bucket è il prefisso
+    del timestamp ("2025-04-16 14" per un'ora), quindi il raggruppamento segue l'indice.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Intervallo non valido: {bucket}")
+    if group_by is not None and group_by not in GROUP_COLUMNS:
+        raise ValueError(f"Colonna non raggruppabile: {group_by}")
+    where, params = (flt or EventFilter()).where()
+    key = f"substr(timestamp, 1, {BUCKETS[bucket]})"
+    columns = f"{key} AS bucket" + (f", {group_by} AS value" if group_by else "")
+    group = "bucket" + (", value" if group_by else "")
+    with db_cursor(commit=False) as cur:
+        cur.execute(f"""
+            SELECT {columns}, COUNT(*) AS n
+            FROM events
+            WHERE {where}
+            GROUP BY {group}
+            ORDER BY {group}
+        """, params)
+        return [tuple(row) for row in cur.fetchall()]
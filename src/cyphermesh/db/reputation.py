@@ -0,0 +1,225 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cyphermesh.db.core import db_cursor
+from cyphermesh.logger import logger
+
+# (pubkey, punteggio, istante dell'ultimo aggiornamento in secondi epoch)
+ScoreRow = Tuple[str, float, float]
+
+# Punteggi decaduti sotto questa soglia (in valore assoluto) valgono zero: si tolgono dalla memoria
+NEGLIGIBLE_SCORE = 0.01
+
+
+def load_reputations(limit: Optional[int] = None) -> Dict[str, Tuple[float, Optional[float]]]:
+    """I punteggi salvati, al massimo `limit` (i più recenti): {pubkey: (score, updated_at)}."""
+    with db_cursor(commit=False) as cur:
+        cur.execute("SELECT pubkey, score, updated_at FROM reputation "
+                    "ORDER BY updated_at DESC LIMIT ?", (-1 if limit is None else limit,))
+        return {r["pubkey"]: (r["score"] or 0, r["updated_at"]) for r in cur.fetchall()}
+
+
+def load_reputation(pubkey: str) -> Optional[Tuple[float, Optional[float]]]:
+    """Il punteggio salvato di una chiave, (score, updated_at), o None."""
+    with db_cursor(commit=False) as cur:
+        cur.execute("SELECT score, updated_at FROM reputation WHERE pubkey = ?", (pubkey,))
+        row = cur.fetchone()
+        return (row["score"] or 0, row["updated_at"]) if row else None
+
+
+def save_reputation_scores(cur, rows: List[ScoreRow]):
+    """Upsert dei punteggi assoluti (transazione del chiamante, es. EventWriter)."""
+    cur.executemany("""
+        INSERT INTO reputation (pubkey, score, updated_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(pubkey)
+        DO UPDATE SET score = excluded.score, updated_at = excluded.updated_at
+    """, rows)
+
+
+class ReputationStore:
+    """
+    Reputazione dei reporter tenuta in memoria, con scrittura differita su SQLite.
+
+    Il controllo sul percorso caldo (score) e gli aggiornamenti (apply) non toccano il DB:
+    ogni `flush_interval_s` secondi i punteggi cambiati vengono passati a `save`, che li
+    accoda al writer unico. Con `half_life_s` > 0 i punteggi decadono verso zero
+    (dimezzandosi ogni half_life_s): il decadimento si calcola alla lettura dall'istante
+    dell'ultimo aggiornamento, quindi non serve riscrivere la tabella.
+
+    In memoria restano al massimo `max_entries` chiavi, in ordine LRU: chiavi nuove costano poco
+    a chi attacca, e senza limite la tabella crescerebbe per sempre. A ogni giro del flush si
+    tolgono i punteggi decaduti a zero e, oltre il limite, le chiavi usate meno di recente già
+    scritte su SQLite. Una chiave tolta vale zero per score() finché apply() non la ricarica dal DB.
+    """
+
+    def __init__(self, save: Callable[[List[ScoreRow]], None], half_life_s: float = 0,
+                 flush_interval_s: float = 5.0, max_entries: int = 100_000,
+                 load: Callable[[Optional[int]], Dict[str, Tuple[float, Optional[float]]]] = load_reputations,
+                 load_one: Callable[[str], Optional[Tuple[float, Optional[float]]]] = load_reputation):
+        self.save = save
+        self.load = load
+        self.load_one = load_one
+        self.half_life_s = max(0.0, half_life_s)
+        self.flush_interval = max(0.1, flush_interval_s)
+        self.max_entries = max(1, max_entries)
+
+        self._scores: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.updates = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.evicted = 0
+        self.reloaded = 0
+        self.errors = 0
+
+    def start(self):
+        """Carica i punteggi dal DB e avvia il flush periodico."""
+        if self._thread is not None:
+            return
+        now = time.time()
+        loaded = self.load(self.max_entries)
+        with self._lock:
+            for pubkey, (score, updated_at) in loaded.items():
+                # Righe precedenti al decadimento: il conteggio parte da ora
+                self._scores.setdefault(pubkey, (float(score), updated_at or now))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="reputation-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Ferma il thread e consegna al writer gli ultimi punteggi cambiati."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    # --- API ---
+
+    def score(self, pubkey: str) -> float:
+        now = time.time()
+        with self._lock:
+            entry = self._scores.get(pubkey)
+            if entry is None:
+                return 0.0
+            self._scores.move_to_end(pubkey)
+            return self._decayed(entry, now)
+
+    def apply(self, pubkey: str, delta: float) -> float:
+        """
+        Somma un delta al punteggio (già decaduto) in modo atomico; restituisce il nuovo valore.
+        Una chiave non in memoria riparte dal punteggio salvato, se c'è (lettura sul DB).
+        """
+        with self._lock:
+            cold = pubkey not in self._scores
+        stored = self._load_cold(pubkey) if cold else None
+        now = time.time()
+        with self._lock:
+            entry = self._scores.get(pubkey)
+            if entry is None and stored is not None:
+                entry = (float(stored[0]), stored[1] or now)
+                self.reloaded += 1
+            score = (self._decayed(entry, now) if entry else 0.0) + delta
+            self._scores[pubkey] = (score, now)
+            self._scores.move_to_end(pubkey)
+            self._dirty.add(pubkey)
+            self.updates += 1
+            return score
+
+    def flush(self) -> int:
+        """Passa a `save` i punteggi cambiati dall'ultimo flush. Restituisce le righe scritte."""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            rows = [(pubkey, round(self._scores[pubkey][0], 3), self._scores[pubkey][1])
+                    for pubkey in self._dirty]
+            self._dirty = set()
+        try:
+            self.save(rows)
+        except Exception as e:
+            # Rimettiamo le chiavi tra quelle da scrivere: ci riprova il prossimo flush
+            with self._lock:
+                self._dirty.update(pubkey for pubkey, _, _ in rows)
+                self.errors += 1
+            logger.error(f"[REPUTATION] flush fallito: {e}")
+            return 0
+        with self._lock:
+            self.flushes += 1
+            self.rows_flushed += len(rows)
+        return len(rows)
+
+    def retry(self, pubkeys: List[str]):
+        """Punteggi che il writer non è riuscito a scrivere: tornano da scrivere al prossimo flush."""
+        with self._lock:
+            self._dirty.update(pubkey for pubkey in pubkeys if pubkey in self._scores)
+            self.errors += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "reporters": len(self._scores),
+                "max_reporters": self.max_entries,
+                "dirty": len(self._dirty),
+                "half_life_s": self.half_life_s,
+                "updates": self.updates,
+                "flushes": self.flushes,
+                "rows_flushed": self.rows_flushed,
+                "evicted": self.evicted,
+                "reloaded": self.reloaded,
+                "errors": self.errors,
+            }
+
+    # --- INTERNI ---
+
+    def _decayed(self, entry: Tuple[float, float], now: float) -> float:
+        score, updated_at = entry
+        if self.half_life_s <= 0 or now <= updated_at:
+            return score
+        return score * 0.5 ** ((now - updated_at) / self.half_life_s)
+
+    def _load_cold(self, pubkey: str) -> Optional[Tuple[float, Optional[float]]]:
+        try:
+            return self.load_one(pubkey)
+        except Exception as e:
+            logger.error(f"[REPUTATION] lettura di {pubkey[:10]}... fallita: {e}")
+            return None
+
+    def evict(self) -> int:
+        """
+        Toglie dalla memoria i punteggi decaduti a zero e, oltre max_entries, le chiavi meno
+        recenti. Solo quelle già passate al writer da almeno un flush (non dirty): il loro
+        valore è su SQLite e apply() lo ritrova. Restituisce le chiavi tolte.
+        """
+        now = time.time()
+        removed = 0
+        with self._lock:
+            if self.half_life_s > 0:
+                for pubkey in [k for k, entry in self._scores.items()
+                               if k not in self._dirty and abs(self._decayed(entry, now)) < NEGLIGIBLE_SCORE]:
+                    del self._scores[pubkey]
+                    removed += 1
+            excess = len(self._scores) - self.max_entries
+            if excess > 0:
+                for pubkey in list(self._scores):
+                    if excess <= 0:
+                        break
+                    if pubkey in self._dirty:
+                        continue
+                    del self._scores[pubkey]
+                    removed += 1
+                    excess -= 1
+            self.evicted += removed
+        return removed
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            # Prima di flush: le chiavi non dirty sono state consegnate al writer un giro fa
+            self.evict()
+            self.flush()
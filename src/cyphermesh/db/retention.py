@@ -0,0 +1,142 @@
+import threading
+import time
+from typing import Optional
+
+from cyphermesh.config import ARCHIVE_DB_PATH
+from cyphermesh.db.core import get_db_connection
+from cyphermesh.logger import logger
+from cyphermesh.models import TIMESTAMP_FORMAT
+
+RETENTION_MODES = ("delete", "archive")
+
+
+class RetentionJob:
+    """
+    Job in background che elimina (o sposta in un DB di archivio) gli eventi ricevuti da più
+    del TTL (colonna received_at, assegnata dal nodo: il timestamp del reporter non conta), a blocchi per non tenere a lungo il lock di scrittura, e poi restituisce
+    le pagine libere al filesystem con PRAGMA incremental_vacuum.
+    """
+
+    def __init__(self, ttl_seconds: float, interval_seconds: float = 3600, mode: str = "delete",
+                 batch_size: int = 5000, vacuum_pages: int = 1000):
+        if mode not in RETENTION_MODES:
+            raise ValueError(f"Modalità di retention non valida: {mode}")
+        self.ttl_seconds = ttl_seconds
+        self.interval_seconds = interval_seconds
+        self.mode = mode
+        self.batch_size = max(1, batch_size)
+        self.vacuum_pages = vacuum_pages
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.runs = 0
+        self.deleted = 0
+        self.archived = 0
+        self.last_run_ms = 0.0
+        self.errors = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.error(f"[DB RETENTION ERROR] {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def cutoff(self, now: Optional[float] = None) -> float:
+        """Istante (secondi epoch) prima del quale un evento ricevuto è scaduto."""
+        return (now or time.time()) - self.ttl_seconds
+
+    def run_once(self, now: Optional[float] = None) -> int:
+        """Esegue un passaggio di retention. Restituisce il numero di eventi rimossi."""
+        started = time.monotonic()
+        cutoff = self.cutoff(now)
+        removed = 0
+
+        conn = get_db_connection()
+        try:
+            columns = None
+            if self.mode == "archive":
+                columns = self._attach_archive(conn)
+
+            while not self._stop.is_set():
+                # Blocchi piccoli: il writer del nodo non resta in attesa a lungo
+                conn.execute("BEGIN IMMEDIATE")
+                rowids = [r[0] for r in conn.execute(
+                    "SELECT rowid FROM events WHERE received_at < ? LIMIT ?", (cutoff, self.batch_size)
+                )]
+                if not rowids:
+                    conn.rollback()
+                    break
+                placeholders = ",".join("?" * len(rowids))
+                if self.mode == "archive":
+                    conn.execute(
+                        f"INSERT OR IGNORE INTO archive.events ({columns}) SELECT {columns} "
+                        f"FROM main.events WHERE rowid IN ({placeholders})", rowids
+                    )
+                conn.execute(f"DELETE FROM events WHERE rowid IN ({placeholders})", rowids)
+                conn.commit()
+                removed += len(rowids)
+
+            if removed and self.vacuum_pages > 0:
+                conn.execute(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})").fetchall()
+        finally:
+            conn.close()
+
+        with self._lock:
+            self.runs += 1
+            if self.mode == "archive":
+                self.archived += removed
+            self.deleted += removed
+            self.last_run_ms = (time.monotonic() - started) * 1000
+        if removed:
+            received = time.strftime(TIMESTAMP_FORMAT, time.localtime(cutoff))
+            logger.info(f"[DB] Retention: {removed} eventi ricevuti prima di {received} "
+                        f"{'archiviati' if self.mode == 'archive' else 'eliminati'}.")
+        return removed
+
+    def _attach_archive(self, conn) -> str:
+        """
+        Collega il DB di archivio e ne allinea la tabella events allo schema corrente.
+        Restituisce l'elenco delle colonne da copiare.
+        """
+        conn.execute("ATTACH DATABASE ? AS archive", (str(ARCHIVE_DB_PATH),))
+        conn.execute("CREATE TABLE IF NOT EXISTS archive.events AS SELECT * FROM main.events WHERE 0")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_archive_events_id ON events (id)")
+        main_cols = [r[1] for r in conn.execute("PRAGMA main.table_info(events)")]
+        archive_cols = {r[1] for r in conn.execute("PRAGMA archive.table_info(events)")}
+        for col in main_cols:
+            if col not in archive_cols:
+                conn.execute(f"ALTER TABLE archive.events ADD COLUMN {col}")
+        conn.commit()
+        return ", ".join(main_cols)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "ttl_seconds": self.ttl_seconds,
+                "runs": self.runs,
+                "deleted": self.deleted,
+                "archived": self.archived,
+                "errors": self.errors,
+                "last_run_ms": round(self.last_run_ms, 3),
+            }
@@ -0,0 +1,252 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cyphermesh.db.core import get_db_connection
+from cyphermesh.db.events import insert_events, apply_reputation_deltas
+from cyphermesh.db.reputation import save_reputation_scores, ScoreRow
+from cyphermesh.logger import logger
+from cyphermesh.models import ThreatEvent
+
+# Modalità di durabilità -> PRAGMA synchronous della connessione di scrittura.
+# In WAL: "normal" non perde dati se crasha il processo (solo su power loss),
+# "full" fa fsync a ogni group commit, "off" lascia il flush al sistema operativo.
+DURABILITY_MODES = {
+    "off": "OFF",
+    "normal": "NORMAL",
+    "full": "FULL",
+}
+
+_STOP = object()
+
+
+class EventWriter:
+    """
+    Thread di scrittura unico per eventi e reputazione.
+    Le richieste finiscono in una coda in memoria e vengono scritte in un'unica
+    transazione (group commit) ogni `batch_size` righe o `flush_interval_ms` millisecondi.
+    Se il group commit fallisce, il batch si riscrive una riga alla volta e si perde solo
+    la riga che fallisce: `on_events_failed` riceve gli eventi non scritti e
+    `on_scores_failed` le pubkey dei punteggi non scritti (da riaccodare).
+    """
+
+    def __init__(self, batch_size: int = 500, flush_interval_ms: int = 50,
+                 durability: str = "normal", max_queue: int = 100_000,
+                 on_events_failed: Optional[Callable[[List[ThreatEvent]], None]] = None,
+                 on_scores_failed: Optional[Callable[[List[str]], None]] = None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Modalità di durabilità non valida: {durability}")
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0, flush_interval_ms) / 1000
+        self.durability = durability
+        self.on_events_failed = on_events_failed
+        self.on_scores_failed = on_scores_failed
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.events_written = 0
+        self.reputation_updates = 0
+        self.commits = 0
+        self.errors = 0
+        self.rows_failed = 0
+        self.last_commit_ms = 0.0
+
+    # --- API ---
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        """Scrive tutto ciò che è in coda e ferma il thread (hook di shutdown del nodo)."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def save_event(self, event: ThreatEvent):
+        """Accoda un evento (valid_signature deve essere già settato)."""
+        if self._thread is None:
+            raise RuntimeError("EventWriter non avviato")
+        self._queue.put(("event", event))
+
+    def update_reputation(self, pubkey: str, delta: int):
+        """Accoda un delta di reputazione; i delta dello stesso batch vengono sommati."""
+        if self._thread is None:
+            raise RuntimeError("EventWriter non avviato")
+        self._queue.put(("reputation", pubkey, delta))
+
+    def save_reputations(self, rows: List[ScoreRow]):
+        """Accoda punteggi assoluti (pubkey, score, updated_at), es. dal ReputationStore."""
+        if self._thread is None:
+            raise RuntimeError("EventWriter non avviato")
+        self._queue.put(("reputation_scores", rows))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Attende che tutto ciò che è stato accodato finora sia committato."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "durability": self.durability,
+                "queue_depth": self._queue.qsize(),
+                "events_written": self.events_written,
+                "reputation_updates": self.reputation_updates,
+                "commits": self.commits,
+                "rows_per_commit": round(
+                    (self.events_written + self.reputation_updates) / self.commits, 2
+                ) if self.commits else 0.0,
+                "errors": self.errors,
+                "rows_failed": self.rows_failed,
+                "last_commit_ms": round(self.last_commit_ms, 3),
+            }
+
+    # --- THREAD ---
+
+    def _run(self):
+        conn = get_db_connection()
+        conn.execute(f"PRAGMA synchronous={DURABILITY_MODES[self.durability]};")
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                batch = [item]
+                deadline = time.monotonic() + self.flush_interval
+
+                # Raccoglie fino a batch_size elementi o fino allo scadere della finestra
+                while len(batch) < self.batch_size and batch[-1] is not _STOP and batch[-1][0] != "flush":
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+
+                stopping = self._commit(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit(self, conn, batch: List) -> bool:
+        """Scrive un batch in una transazione. Restituisce True se è arrivato lo stop."""
+        events: List[ThreatEvent] = []
+        deltas = defaultdict(int)
+        scores: Dict[str, ScoreRow] = {}
+        waiters: List[threading.Event] = []
+        stopping = _STOP in batch
+
+        # Allo stop svuota anche quello che è rimasto in coda
+        if stopping:
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+        for item in batch:
+            if item is _STOP:
+                continue
+            kind = item[0]
+            if kind == "event":
+                events.append(item[1])
+            elif kind == "reputation":
+                deltas[item[1]] += item[2]
+            elif kind == "reputation_scores":
+                # Vale l'ultimo punteggio accodato per ciascuna chiave
+                scores.update((row[0], row) for row in item[1])
+            elif kind == "flush":
+                waiters.append(item[1])
+
+        if events or deltas or scores:
+            started = time.monotonic()
+            score_rows = list(scores.values())
+            try:
+                cur = conn.cursor()
+                insert_events(cur, events)
+                apply_reputation_deltas(cur, deltas)
+                save_reputation_scores(cur, score_rows)
+                conn.commit()
+                failed_events, failed_scores = [], []
+            except Exception as e:
+                conn.rollback()
+                with self._lock:
+                    self.errors += 1
+                logger.warning(f"[DB WRITER] Group commit fallito ({e}): riscrivo il batch riga per riga")
+                failed_events, failed_scores = self._commit_rows(conn, events, deltas, score_rows)
+            with self._lock:
+                self.events_written += len(events) - len(failed_events)
+                self.reputation_updates += len(deltas) + len(score_rows) - len(failed_scores)
+                self.rows_failed += len(failed_events) + len(failed_scores)
+                self.commits += 1
+                self.last_commit_ms = (time.monotonic() - started) * 1000
+            self._report_failures(failed_events, failed_scores)
+
+        for waiter in waiters:
+            waiter.set()
+        return stopping
+
+    def _commit_rows(self, conn, events: List[ThreatEvent], deltas: Dict[str, int],
+                     score_rows: List[ScoreRow]) -> Tuple[List[ThreatEvent], List[ScoreRow]]:
+        """
+        Riscrive un batch dopo un group commit fallito: sempre una transazione, ma ogni riga
+        nel suo savepoint. Restituisce gli eventi e i punteggi che non è stato possibile scrivere.
+        """
+        failed_events: List[ThreatEvent] = []
+        failed_scores: List[ScoreRow] = []
+        try:
+            cur = conn.cursor()
+            cur.execute("BEGIN")
+            for event in events:
+                if not self._write_row(cur, insert_events, [event]):
+                    failed_events.append(event)
+            for pubkey, delta in deltas.items():
+                if not self._write_row(cur, apply_reputation_deltas, {pubkey: delta}):
+                    logger.error(f"[DB WRITER ERROR] Delta di reputazione perso per {pubkey[:10]}...")
+            for row in score_rows:
+                if not self._write_row(cur, save_reputation_scores, [row]):
+                    failed_scores.append(row)
+            conn.commit()
+        except Exception as e:
+            # Fallisce la transazione stessa (es. disco pieno): non è scritto niente
+            conn.rollback()
+            logger.error(f"[DB WRITER ERROR] {e} ({len(events)} eventi persi)")
+            return list(events), list(score_rows)
+        if failed_events:
+            logger.error(f"[DB WRITER ERROR] {len(failed_events)} eventi scartati su {len(events)}")
+        return failed_events, failed_scores
+
+    @staticmethod
+    def _write_row(cur, write, rows) -> bool:
+        """Scrive una riga nel suo savepoint; se fallisce la annulla senza toccare le altre."""
+        cur.execute("SAVEPOINT writer_row")
+        try:
+            write(cur, rows)
+            return True
+        except Exception:
+            cur.execute("ROLLBACK TO writer_row")
+            return False
+        finally:
+            cur.execute("RELEASE writer_row")
+
+    def _report_failures(self, events: List[ThreatEvent], score_rows: List[ScoreRow]):
+        """Avvisa il nodo delle righe perse (eventi da dimenticare, punteggi da riaccodare)."""
+        for callback, items in ((self.on_events_failed, events),
+                                (self.on_scores_failed, [row[0] for row in score_rows])):
+            if callback is None or not items:
+                continue
+            try:
+                callback(items)
+            except Exception as e:
+                logger.error(f"[DB WRITER ERROR] Notifica righe fallite: {e}")
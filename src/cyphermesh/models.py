@@ -1,10 +1,18 @@
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
+from datetime import datetime
 from typing import Optional
 import json
+import re
 import time
 import hashlib
 # Importiamo le primitive crypto esistenti
-from cyphermesh.crypto import sign_data, verify_signature, load_own_pubkey_str
+from cyphermesh.crypto import sign_data, verify_signature, load_own_pubkey_str, load_own_scheme
+
+# Formato del timestamp (ora locale del reporter): il confronto tra stringhe rispetta l'ordine temporale
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Quanto un timestamp può stare nel futuro: copre i fusi orari (fino a +14h) e gli orologi sfasati
+MAX_FUTURE_SKEW_S = 86400
+_TIMESTAMP_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})", re.ASCII)
 
 @dataclass
 class ThreatEvent:
@@ -16,25 +24,35 @@ class ThreatEvent:
     reporter_pubkey: str
     signature: Optional[str] = None
     valid_signature: bool = False
+    # Schema di firma (crypto.SCHEME_*). None = evento legacy, lo schema si ricava dal tipo di chiave
+    sig_scheme: Optional[str] = None
 
     def to_json(self) -> dict:
         """Restituisce il dict pulito (senza campi interni python-only)."""
-        d = asdict(self)
+        # Campi tutti scalari: basta una copia superficiale (asdict fa un deepcopy per campo)
+        d = {name: getattr(self, name) for name in _FIELD_NAMES}
         # Rimuoviamo il flag di validità locale, non si trasmette in rete
         d.pop('valid_signature', None)
+        # Gli eventi legacy restano identici sul filo
+        if d.get('sig_scheme') is None:
+            d.pop('sig_scheme', None)
         return d
 
     def get_canonical_payload(self) -> str:
         """
         Crea la stringa JSON canonica per la firma (senza il campo signature).
+        Anche sig_scheme resta fuori: i nodi che non lo conoscono continuano a validare
+        gli eventi RSA, e lo schema è comunque vincolato al tipo di reporter_pubkey.
         """
         data = self.to_json()
         data.pop('signature', None) # La firma non firma se stessa
+        data.pop('sig_scheme', None)
         return json.dumps(data, sort_keys=True)
 
     def sign(self):
         """Calcola e applica la firma all'oggetto corrente."""
         payload = self.get_canonical_payload()
+        self.sig_scheme = load_own_scheme()
         self.signature = sign_data(payload)
     
     def verify(self) -> bool:
@@ -43,12 +61,13 @@ class ThreatEvent:
             return False
         
         payload = self.get_canonical_payload()
-        # Usa la funzione crypto esistente convertendo la key in bytes
+        # La chiave PEM passa così com'è: la cache la indicizza per fingerprint
         try:
             is_valid = verify_signature(
                 data=payload, 
                 signature=self.signature, 
-                pubkey_pem=self.reporter_pubkey.encode()
+                pubkey_pem=self.reporter_pubkey,
+                scheme=self.sig_scheme
             )
             self.valid_signature = is_valid
             return is_valid
@@ -58,28 +77,43 @@ class ThreatEvent:
     @classmethod
     def create_new(cls, source_ip: str, threat_type: str, severity: str):
         """Factory method per creare un nuovo evento da zero (uso locale)."""
+        instance = cls.build(source_ip, threat_type, severity)
+        # Firma automatica alla creazione
+        instance.sign()
+        return instance
+
+    @classmethod
+    def build(cls, source_ip: str, threat_type: str, severity: str,
+              timestamp: Optional[str] = None, reporter_pubkey: Optional[str] = None):
+        """
+        Evento locale non ancora firmato, con l'ID calcolato dal contenuto.
+        Chi firma molti eventi insieme (cyphermesh-ingest) poi assegna signature e sig_scheme.
+        """
         # Carica la chiave pubblica dell'utente
-        pub_key = load_own_pubkey_str()
+        pub_key = reporter_pubkey or load_own_pubkey_str()
         
         # Struttura temporanea per calcolare l'ID
         temp_data = {
             "source_ip": source_ip,
             "threat_type": threat_type,
             "severity": severity,
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), # O ISO format
+            "timestamp": timestamp or time.strftime(TIMESTAMP_FORMAT),
             "reporter_pubkey": pub_key
         }
-        # Calcolo ID deterministico (hash del contenuto base)
-        temp_json = json.dumps(temp_data, sort_keys=True)
-        event_id = hashlib.sha256(temp_json.encode()).hexdigest()
-
-        instance = cls(
-            id=event_id,
+        return cls(
+            id=_content_id(temp_data),
             **temp_data
         )
-        # Firma automatica alla creazione
-        instance.sign()
-        return instance
+
+    def content_id(self) -> str:
+        """ID atteso per il contenuto dell'evento (lo stesso calcolato da build)."""
+        return _content_id({
+            "source_ip": self.source_ip,
+            "threat_type": self.threat_type,
+            "severity": self.severity,
+            "timestamp": self.timestamp,
+            "reporter_pubkey": self.reporter_pubkey,
+        })
 
     @classmethod
     def from_dict(cls, data: dict):
@@ -87,5 +121,43 @@ class ThreatEvent:
         # Filtra chiavi sconosciute per evitare crash
         valid_keys = cls.__annotations__.keys()
         clean_data = {k: v for k, v in data.items() if k in valid_keys}
+        # Dal peer arriva JSON qualsiasi: un campo non stringa (lista, numero) finirebbe
+        # nel writer e farebbe fallire il bind dell'intero group commit
+        for name in _TEXT_FIELDS:
+            if not isinstance(clean_data.get(name), str):
+                raise ValueError(f"Campo evento non valido: {name}")
+        for name in _OPTIONAL_TEXT_FIELDS:
+            if clean_data.get(name) is not None and not isinstance(clean_data[name], str):
+                raise ValueError(f"Campo evento non valido: {name}")
+        # Il timestamp finisce negli aggregati e nei bucket dell'anti-entropy: solo nel formato atteso
+        if not valid_timestamp(clean_data["timestamp"]):
+            raise ValueError(f"Timestamp evento non valido: {clean_data['timestamp'][:32]!r}")
+        # Il flag di validità è locale: lo decide la verifica, mai il mittente
+        clean_data["valid_signature"] = False
         return cls(**clean_data)
-    
\ No newline at end of file
+    
+
+
+def valid_timestamp(value: str, now: Optional[float] = None) -> bool:
+    """True se `value` è nel formato TIMESTAMP_FORMAT (con gli zeri) e non troppo nel futuro."""
+    match = _TIMESTAMP_RE.fullmatch(value)
+    if match is None:
+        return False
+    try:
+        datetime(*map(int, match.groups()))
+    except ValueError:
+        return False
+    # Stesso formato: il confronto tra stringhe basta
+    return value <= time.strftime(TIMESTAMP_FORMAT, time.localtime((now or time.time()) + MAX_FUTURE_SKEW_S))
+
+
+def _content_id(data: dict) -> str:
+    # Calcolo ID deterministico (hash del contenuto base)
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+_FIELD_NAMES = tuple(f.name for f in fields(ThreatEvent))
+
+# Campi obbligatori e facoltativi di tipo stringa (validati in from_dict)
+_TEXT_FIELDS = ("id", "source_ip", "threat_type", "severity", "timestamp", "reporter_pubkey")
+_OPTIONAL_TEXT_FIELDS = ("signature", "sig_scheme")
@@ -1,5 +1,7 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, jsonify
 from cyphermesh.db import init_db, get_events, get_reputations
+from cyphermesh.config import CONTROL_SOCKET
+from cyphermesh.core.control import ControlClient, ControlError, control_available
 import logging
 
 # Configura logger per Flask
@@ -16,13 +18,43 @@ try:
 except Exception as e:
     print(f" [WEB] Errore init DB: {e}")
 
+
+def node_call(msg_type, payload=None):
+    """Richiesta al nodo in esecuzione sul socket di controllo; None se il nodo non risponde."""
+    if not control_available(CONTROL_SOCKET):
+        return None
+    try:
+        with ControlClient(CONTROL_SOCKET, timeout=5) as client:
+            return client.call(msg_type, payload)
+    except (OSError, ControlError):
+        return None
+
+
 @app.route("/")
 def index():
     # Qui leggiamo solo i dati
     events = get_events()
     reps = get_reputations()
-    return render_template("index.html", events=events, reps=reps)
+    # Stato live dal nodo (None se il nodo non è in esecuzione)
+    status = node_call("peers")
+    return render_template("index.html", events=events, reps=reps, status=status)
+
+
+@app.route("/api/peers")
+def api_peers():
+    return _node_response(node_call("peers"))
+
+
+@app.route("/api/metrics")
+def api_metrics():
+    return _node_response(node_call("metrics"))
+
+
+def _node_response(result):
+    if result is None:
+        return jsonify({"error": "nodo non raggiungibile"}), 503
+    return jsonify(result)
+
 
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5000)
-    
\ No newline at end of file